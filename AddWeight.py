@@ -4,6 +4,7 @@ import os
 from Utilities.Utilities import ConcatenateListElements
 import pandas as pd
 from itertools import zip_longest
+import BinaryDeformability
 
      
 
@@ -75,11 +76,30 @@ results = [('Mass1.2', 'Lambda'),
            ('Mass2', 'DensCentral'),
            ('Mass1.4', 'R')]
 check_eos = ['NoData', 'ViolateFrom', 'ViolateCausality']
+# (lower, upper) bound of every result for an EOS to be reasonable. Bounds are exclusive
+reasonable_range = {('Mass1.4', 'Lambda'): (-500, 13000),
+                    ('MaxMass', 'Mass'): (2.17, np.inf),
+                    ('Mass1.4', 'R'): (-np.inf, 20)}
+
+def Reasonable(values, margin=None, ignore_nan=False):
+  """
+  Whether values, a dict (or DataFrame) of results keyed as reasonable_range, are within every range
+  margin is an optional dict of the same keys that widens each range by that amount on both sides
+  nan is never reasonable, unless ignore_nan is set, in which case it is within every range (e.g. an unknown estimate)
+  """
+  reasonable = True
+  for key, (lower, upper) in reasonable_range.items():
+    width = 0 if margin is None else margin.get(key, 0)
+    within = (values[key] > lower - width) & (values[key] < upper + width)
+    if ignore_nan:
+      within = within | np.isnan(values[key])
+    reasonable = reasonable & within
+  return reasonable
 
 def Summarize(args):
   #new_df = pd.concat([args[0][features], args[1][results], args[2][check_eos]], axis=1, sort=False)
   new_df = pd.concat([args[1][results], args[2][check_eos]], axis=1, sort=False)
-  reasonable = (new_df[('Mass1.4', 'Lambda')] < 13000) & (new_df[('Mass1.4', 'Lambda')] > -500) & (new_df[('MaxMass', 'Mass')] > 2.17) & (new_df[('Mass1.4', 'R')] < 20)
+  reasonable = Reasonable(new_df)
   #reasonable = (new_df[('Mass1.4', 'Lambda')] > 0) 
   prior_weight = pd.Series(GetWeight(new_df), index=new_df.index)
   posterior_weight = GetDeformabilityWeight(new_df)*prior_weight
@@ -91,7 +111,10 @@ def Summarize(args):
                       causality], axis=1) 
   result.columns = ['Reasonable', 'PriorWeight', 'PosteriorWeight', 'Causality']
   result.index = new_df.index
-  return result
+  # lambda tilde of GW170817 over mass ratios, interpolated from all stored masses
+  lambda_tilde = BinaryDeformability.BinaryLambdaTilde(args[1])
+  lambda_tilde.index = new_df.index
+  return pd.concat([result, lambda_tilde], axis=1)
 
 class AnalyzeGenData:
 
@@ -110,6 +133,8 @@ class AnalyzeGenData:
             weight.append('main', result, min_itemsize=30)
           weight.get_storer('main').attrs.prior_mean = new_mean
           weight.get_storer('main').attrs.prior_sd = new_sd
+          weight.get_storer('main').attrs.chirp_mass = BinaryDeformability.GW170817ChirpMass
+          weight.get_storer('main').attrs.mass_ratios = BinaryDeformability.DefaultMassRatios
       else:
         raise RuntimeError('Cannot find weight files with gen_weight_file disabled. It cannot generate or read weight files. Abort')
            
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+"""
+Binary tidal deformability Lambda tilde of EOS from their stored results, without solving TOV again
+Lambda(M) of every EOS is interpolated from the stored (Mass, Lambda) of all target masses and the maximum mass
+All EOS of a result table are handled at once as array operations, so millions of them only take a few chunks
+"""
+
+# source frame chirp mass (solar mass) of GW170817, PRX 9, 011001 (2019)
+GW170817ChirpMass = 1.186
+# mass ratios m2/m1 within the low spin posterior of GW170817
+DefaultMassRatios = np.linspace(0.7, 1., 7)
+
+
+def ComponentMasses(chirp_mass, q):
+    """
+    Masses m1 >= m2 of a binary with chirp mass and mass ratio q = m2/m1 <= 1
+    """
+    q = np.asarray(q, dtype=np.float64)
+    m1 = chirp_mass*np.power(1 + q, 0.2)*np.power(q, -0.6)
+    return m1, q*m1
+
+def LambdaTilde(m1, m2, lambda1, lambda2):
+    """
+    Mass weighted tidal deformability of a binary, which is what the leading tidal phase of GW measures
+    """
+    total = m1 + m2
+    return 16./13.*((m1 + 12*m2)*np.power(m1, 4)*lambda1 + (m2 + 12*m1)*np.power(m2, 4)*lambda2)/np.power(total, 5)
+
+def MassLambdaNodes(result):
+    """
+    Stored (Mass, Lambda) of every NS in result, the table of TOV results with columns (title, quantity)
+    Return arrays of mass and lambda with one row per EOS, ascending in mass. Missing NS are nan and placed last
+    """
+    titles = [title for title in result.columns.get_level_values(0).unique()
+              if (title, 'Mass') in result.columns and (title, 'Lambda') in result.columns]
+    mass = np.stack([result[(title, 'Mass')].values for title in titles], axis=1).astype(np.float64)
+    tidal_lambda = np.stack([result[(title, 'Lambda')].values for title in titles], axis=1).astype(np.float64)
+    invalid = ~(np.isfinite(mass) & np.isfinite(tidal_lambda) & (tidal_lambda > 0))
+    mass[invalid] = np.nan
+    tidal_lambda[invalid] = np.nan
+    order = np.argsort(mass, axis=1)
+    mass = np.take_along_axis(mass, order, axis=1)
+    tidal_lambda = np.take_along_axis(tidal_lambda, order, axis=1)
+    # NS of the same mass (e.g. a target equal to the maximum mass) are one node
+    while True:
+        duplicate = np.zeros(mass.shape, dtype=bool)
+        duplicate[:, 1:] = np.diff(mass, axis=1) <= 1e-9*mass[:, 1:]
+        if not np.any(duplicate):
+            break
+        mass[duplicate] = np.nan
+        tidal_lambda[duplicate] = np.nan
+        order = np.argsort(mass, axis=1)
+        mass = np.take_along_axis(mass, order, axis=1)
+        tidal_lambda = np.take_along_axis(tidal_lambda, order, axis=1)
+    return mass, tidal_lambda
+
+def MonotoneInterpolate(x, y, x_new):
+    """
+    Monotone piecewise cubic (PCHIP, same as scipy.interpolate.PchipInterpolator) of every row of x and y at x_new
+    Rows are ascending in x with nan nodes placed last. x_new is shared by all rows
+    Return array of shape (rows, len(x_new)). It is nan outside the nodes of a row or if a row has less than 2 nodes
+    """
+    x_new = np.asarray(x_new, dtype=np.float64)
+    rows, size = x.shape
+    num_nodes = np.sum(np.isfinite(x), axis=1)
+    if size < 2:
+        return np.full((rows, len(x_new)), np.nan)
+    h = np.diff(x, axis=1)
+    slope = np.diff(y, axis=1)/h
+    derivative = np.full(x.shape, np.nan)
+    # harmonic mean of neighbouring slopes, weighted by interval lengths. Zero at extrema
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w1 = 2*h[:, 1:] + h[:, :-1]
+        w2 = h[:, 1:] + 2*h[:, :-1]
+        interior = (w1 + w2)/(w1/slope[:, :-1] + w2/slope[:, 1:])
+    derivative[:, 1:-1] = np.where(slope[:, :-1]*slope[:, 1:] > 0, interior, 0)
+
+    def EdgeDerivative(h0, h1, slope0, slope1):
+        # one sided three point estimate, limited such that the end interval stays monotone
+        d = ((2*h0 + h1)*slope0 - h0*slope1)/(h0 + h1)
+        d = np.where(np.sign(d) != np.sign(slope0), 0, d)
+        return np.where((np.sign(slope0) != np.sign(slope1)) & (np.abs(d) > 3*np.abs(slope0)), 3*slope0, d)
+
+    rows_index = np.arange(rows)
+    last = np.clip(num_nodes - 1, 1, size - 1)
+    # rows with only 2 nodes are linear
+    two_nodes = num_nodes == 2
+    if size > 2:
+        with np.errstate(invalid='ignore'):
+            derivative[:, 0] = EdgeDerivative(h[:, 0], h[:, 1], slope[:, 0], slope[:, 1])
+            derivative[rows_index, last] = EdgeDerivative(h[rows_index, last - 1], h[rows_index, np.maximum(last - 2, 0)],
+                                                          slope[rows_index, last - 1], slope[rows_index, np.maximum(last - 2, 0)])
+    derivative[two_nodes, 0] = slope[two_nodes, 0]
+    derivative[two_nodes, 1] = slope[two_nodes, 0]
+
+    # interval of every query. Comparison with nan nodes is False, so only valid nodes are counted
+    with np.errstate(invalid='ignore'):
+        index = np.sum(x[:, :, np.newaxis] <= x_new, axis=1) - 1
+    inside = (index >= 0) & (x_new <= x[rows_index, last][:, np.newaxis]) & (num_nodes >= 2)[:, np.newaxis]
+    index = np.clip(index, 0, last[:, np.newaxis] - 1)
+    x0, x1 = np.take_along_axis(x, index, axis=1), np.take_along_axis(x, index + 1, axis=1)
+    y0, y1 = np.take_along_axis(y, index, axis=1), np.take_along_axis(y, index + 1, axis=1)
+    d0, d1 = np.take_along_axis(derivative, index, axis=1), np.take_along_axis(derivative, index + 1, axis=1)
+    step = x1 - x0
+    t = (x_new - x0)/step
+    t2, t3 = t*t, t*t*t
+    value = (2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*step*d0 + (-2*t3 + 3*t2)*y1 + (t3 - t2)*step*d1
+    return np.where(inside, value, np.nan)
+
+def BinaryLambdaTilde(result, chirp_mass=GW170817ChirpMass, mass_ratios=DefaultMassRatios):
+    """
+    Lambda tilde of binaries with chirp_mass and every mass ratio, for all EOS of result, the table of TOV results
+    log(Lambda) is interpolated monotonically in mass. Binaries with a NS heavier than the maximum mass are nan
+    Return DataFrame with the index of result and a column LambdaTilde(q=...) for every mass ratio
+    """
+    m1, m2 = ComponentMasses(chirp_mass, mass_ratios)
+    mass, tidal_lambda = MassLambdaNodes(result)
+    log_lambda = MonotoneInterpolate(mass, np.log(tidal_lambda), np.concatenate([m1, m2]))
+    lambda1, lambda2 = np.exp(log_lambda[:, :len(m1)]), np.exp(log_lambda[:, len(m1):])
+    return pd.DataFrame(LambdaTilde(m1, m2, lambda1, lambda2), index=result.index,
+                        columns=['LambdaTilde(q=%g)' % q for q in mass_ratios])
@@ -28,31 +28,22 @@ SurfacePressure = 1e-8
 """
 Print the selected EOS into a file for the tidallove script to run
 """
-def MRCurvesForModel(name_and_eos, pressure):
+def MRCurvesForModel(name_and_eos, pc_min=1.):
     loader = EOSLoader('Results/test.csv.h5')
     eos, list_tran_density = loader.GetNSEOS(name_and_eos)
 
-    radius = []
-    mass = []
     with wrapper.TidalLoveWrapper(eos) as tidal_love:
         tidal_love.density_checkpoint = list_tran_density
-        for pc in pressure:
-            try:
-                result = tidal_love.Calculate(pc=pc)
-                m, r = result.mass, result.Radius
-                if r > 5:
-                    mass.append(m)
-                    radius.append(r)
-            except RuntimeError as error:
-                radius.append(np.nan)
-                mass.append(np.nan)
-    return mass, radius
+        # central pressure is refined where the curve bends, up to the maximum mass
+        results = [result for result in tidal_love.MRCurve(pc_min=pc_min) if result.Radius > 5]
+    return [result.mass for result in results], [result.Radius for result in results]
 
 def FindIntersection(all_results, mass):
     designated_radius = []
     for result in all_results:
-        idx = (np.abs(np.array(result[0]) - mass)).argmin()
-        designated_radius.append(result[1][idx])
+        # curves are sparse where they are straight, so radius is interpolated instead of taken from the nearest point
+        # mass increases along the curve up to the maximum mass
+        designated_radius.append(np.interp(mass, result[0], result[1]))
     return min(designated_radius), max(designated_radius)
 
 if __name__ == '__main__':
@@ -61,11 +52,11 @@ if __name__ == '__main__':
     #df = pd.concat([df, LoadSkyrmeFile('Results/ABrownNewNoPolyTrope.csv')])
 
     #pressure = np.concatenate((np.linspace(2, 500, 50), np.linspace(500, 5000, 100)), axis=None)
-    pressure = np.logspace(np.log(1.), np.log(1000), num=50, base=np.exp(1))
+    pc_min = 1.
     labelq = r'*w.den'
     labelu = r'*v.den'
-    q_arglist = [(i, pressure) for i, (name, row) in enumerate(loader.Backbone_kwargs.iterrows()) if name[-1] == 'w']
-    u_arglist = [(i, pressure) for i, (name, row) in enumerate(loader.Backbone_kwargs.iterrows()) if name[-1] == 'v']
+    q_arglist = [(i, pc_min) for i, (name, row) in enumerate(loader.Backbone_kwargs.iterrows()) if name[-1] == 'w']
+    u_arglist = [(i, pc_min) for i, (name, row) in enumerate(loader.Backbone_kwargs.iterrows()) if name[-1] == 'v']
       
     with Pool(processes=10) as pool:
          q_result = pool.starmap(MRCurvesForModel, q_arglist)
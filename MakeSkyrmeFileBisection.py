@@ -14,15 +14,18 @@ import scipy.optimize as opt
 import logging
 from multiprocessing_logging import install_mp_handler, MultiProcessingHandler
 import configargparse   
+import numbers
 from mpi4py import MPI
 from collections import namedtuple
 
 from Utilities.Utilities import FlattenListElements, ConcatenateListElements, DataIO
 import Utilities.ConsolePrinter as cp
 import TidalLove.TidalLoveWrapper as wrapper
+import TidalLove.WarmStart as WarmStart
+import AddWeight
 from Utilities.Constants import *
 from Utilities.MasterSlave import MasterSlave
-from Utilities.EOSCreator import EOSCreator, SummarizeSkyrme
+from Utilities.EOSCreator import EOSCreator, SummarizeSkyrme, EnergyDensitySensitivity
 #from SelectPressure import AddPressure
 
 p = configargparse.get_argument_parser()
@@ -32,9 +35,18 @@ if len(p._default_config_files) == 0:
 p.add_argument('--PBar', dest='PBar', action='store_true', help="Enable if you don't need to display everything during calculation, just a progress bar")
 p.add_argument('-tg', "--TargetMass", type=float, nargs='+', help="Target mass of the neutron star.")
 p.add_argument("-mm", "--MaxMassRequested", type=float, help="Maximum Mass to be achieved for EOS in unit of solar mass")
+p.add_argument("-nt", "--NumThreads", type=int, default=1, help="Number of threads used to integrate central pressures of one EOS concurrently")
+p.add_argument("-sn", "--Sensitivity", nargs='+', help="Parameters of nuclear EOS for which derivatives of mass, radius and lambda are calculated")
+p.add_argument("-ws", "--WarmStartSize", type=int, default=0, help="Number of solved EOS per worker from which central pressures of similar EOS are guessed (0, the default, disables it). Results then depend on the EOS solved before by the same worker within solver tolerance, so they are not reproducible with a different number of workers")
+p.add_argument('--PreScreen', dest='PreScreen', action='store_true', help="Enable to skip solving EOS whose rough maximum mass, radius and lambda are far from the reasonable range of AddWeight")
+p.add_argument("-ep", "--EnvelopePressure", type=float, default=0, help="Pressure (MeV/fm3) below which the crust is interpolated from an envelope computed once per worker instead of integrated. Results are approximate (0, the default, integrates the whole star)")
 
 
 OuterCrustDensity = 0.3e-3
+# estimates of TidalLoveWrapper.PreScreen must be this far outside of AddWeight.reasonable_range for EOS to be skipped
+PreScreenMargin = {('MaxMass', 'Mass'): 0.05, 
+                   ('Mass1.4', 'Lambda'): 2600, 
+                   ('Mass1.4', 'R'): 1.}
 
 def GenerateMetaDataFrame(filename='EOSComparsion.csv', size=100000, iter=0):
     df = pd.read_csv(filename)
@@ -73,7 +85,9 @@ def LoadSkyrmeFile(filename):
 
 def CheckCausality(eos, rho_max):
     try:
-        rho = np.concatenate([np.logspace(np.log(1e-9), np.log(3.76e-4), 100, base=np.exp(1)), np.linspace(3.77e-4, rho_max, 900)])
+        # reuse densities of the grid sampled for the TOV solver
+        rho, _, _ = eos.GetGrid()
+        rho = np.append(rho[(rho >= 1e-9) & (rho < rho_max)], rho_max)
         sound = np.array(eos.GetSpeedOfSound(rho, 0))
     except Exception as error:
         logger.exception('Causality cannot be determined')
@@ -131,7 +145,8 @@ def dUrca(eos_creator, density):
 """
 Print the selected EOS into a file for the tidallove script to run
 """
-def CalculateModel(name_and_eos, EOSType, TargetMass, MaxMassRequested, Transform_kwargs):
+def CalculateModel(name_and_eos, EOSType, TargetMass, MaxMassRequested, Transform_kwargs, Sensitivity=None, NumThreads=1, WarmStartSize=0, 
+                   EnvelopePressure=0, PreScreen=False):
     name = name_and_eos[0]
     Backbone_kwargs = name_and_eos[1]
     eos_creator = EOSCreator()
@@ -158,23 +173,40 @@ def CalculateModel(name_and_eos, EOSType, TargetMass, MaxMassRequested, Transfor
         1.4 solar mass and 2.0 solar mass calculation
         """
     
-        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+        with wrapper.TidalLoveWrapper(eos, num_threads=NumThreads, envelope_pressure=EnvelopePressure if EnvelopePressure > 0 else None) as tidal_love:
             tidal_love.density_checkpoint = list_tran_density
-            logger.debug('Finding maximum mass for EOS %s', name)
-            MaxMassResult = tidal_love.FindMaxMass()
-            result['MaxMass'] = MaxMassResult
-
-            if result['MaxMass'].mass >= MaxMassRequested: 
-                logger.debug('Finding NS of required mass %s because maximum possible mass for EOS %s is larger than required' % 
-                             (MaxMassRequested, name))
-                TidalResult = tidal_love.FindMass(mass=MaxMassRequested)
+            logger.debug('Finding maximum mass and NS of all target masses for EOS %s', name)
+            # NS heavier than the maximum mass are returned as nan
+            masses = [MaxMassRequested] + list(TargetMass)
+            # central pressures of the nearest EOS solved by this worker narrow down the search
+            pc_guess = None
+            if WarmStartSize > 0:
+                names = [key for key, value in Backbone_kwargs.items() if isinstance(value, numbers.Number)]
+                warm_start = WarmStart.SharedIndex(names, len(masses) + 1, WarmStartSize)
+                pc_guess = warm_start.Guess(Backbone_kwargs)
+            eos_check_result['PreScreened'] = False
+            if PreScreen:
+                # rough estimates from a few probes, which are reused by FindMassFamily without warm start
+                # nan estimates (e.g. probes do not bracket 1.4 solar mass) are left to the full solution
+                estimate = tidal_love.PreScreen()
+                eos_check_result['PreScreened'] = not AddWeight.Reasonable({('MaxMass', 'Mass'): estimate.MaxMass, 
+                                                                            ('Mass1.4', 'Lambda'): estimate.Lambda, 
+                                                                            ('Mass1.4', 'R'): estimate.Radius}, 
+                                                                           PreScreenMargin, ignore_nan=True)
+            if eos_check_result['PreScreened']:
+                logger.debug('EOS %s is skipped with rough maximum mass %g, radius %g and lambda %g' % (name, *estimate[:3]))
+                # work of the probes is assigned to the maximum mass
+                MaxMassResult = tidal_love.NanResult()
+                TidalResults = [wrapper.TidalLoveResult(len(tidal_love.density_checkpoint)) for mass in masses]
             else:
-                TidalResult = wrapper.TidalLoveResult(len(list_tran_density))
-            result['Mass%g' % MaxMassRequested] = TidalResult
-
-            for tg in TargetMass:
-                logger.debug('Finding NS with mass %g for %s' % (tg, name))
-                TidalResult = tidal_love.FindMass(mass=tg)
+                MaxMassResult, TidalResults = tidal_love.FindMassFamily(masses, pc_guess=pc_guess)
+            eos_check_result['WarmStart'] = pc_guess is not None
+            if WarmStartSize > 0 and not eos_check_result['PreScreened']:
+                warm_start.Add(Backbone_kwargs, [result.PCentral for result in [MaxMassResult] + TidalResults], 
+                               tidal_love.num_integrations, warm=pc_guess is not None)
+                logger.debug('Warm starts saved %.0f integrations in %d EOS' % (warm_start.SavedIntegrations(), warm_start.warm[0]))
+            result['MaxMass'] = MaxMassResult
+            for tg, TidalResult in zip(masses, TidalResults):
                 result['Mass%g' % tg] = TidalResult
 
             if all(value.IsNan() for title, value in result.items()):
@@ -183,8 +215,25 @@ def CalculateModel(name_and_eos, EOSType, TargetMass, MaxMassRequested, Transfor
             else:
                  eos_check_result['NoData'] = False
 
+            if Sensitivity:
+                logger.debug('Calculating derivatives with respect to %s for EOS %s' % (', '.join(Sensitivity), name))
+                try:
+                    perturbations = EnergyDensitySensitivity(tidal_love, EOSType, Backbone_kwargs, Transform_kwargs, Sensitivity)
+                    for title, value in result.items():
+                        tidal_love.Sensitivity(value, perturbations, fixed_mass=(title != 'MaxMass'))
+                except Exception:
+                    logger.exception('Derivatives cannot be calculated for EOS %s' % name)
+                    # same columns as other EOS such that rows can be appended to one table
+                    for value in result.values():
+                        value.Sensitivity = {parameter: (np.nan, np.nan, np.nan) for parameter in Sensitivity}
+
+            # skipped EOS are checked up to the centre of their heaviest probe instead of the maximum mass
+            rho_max = result['MaxMass'].DensCentral
+            if eos_check_result['PreScreened']:
+                rho_max = tidal_love.DensityFromPressure(estimate.PCentral)
+
         logger.debug('Causality checking for EOS %s' % name)
-        eos_check_result = {**eos_check_result, **CheckCausality(eos, result['MaxMass'].DensCentral)}
+        eos_check_result = {**eos_check_result, **CheckCausality(eos, rho_max)}
 
     # expand all results are dict
     for title, value in result.items():
@@ -200,7 +249,8 @@ def CalculateModel(name_and_eos, EOSType, TargetMass, MaxMassRequested, Transfor
 
 
 
-def CalculatePolarizability(df, mslave, Output, EOSType, TargetMass, MaxMassRequested, **Transform_kwargs): 
+def CalculatePolarizability(df, mslave, Output, EOSType, TargetMass, MaxMassRequested, Sensitivity=None, NumThreads=1, WarmStartSize=0, 
+                            EnvelopePressure=0, PreScreen=False, **Transform_kwargs): 
     total = df.shape[0]
 
     """
@@ -218,7 +268,12 @@ def CalculatePolarizability(df, mslave, Output, EOSType, TargetMass, MaxMassRequ
                                               EOSType=EOSType,
                                               TargetMass=TargetMass, 
                                               MaxMassRequested=MaxMassRequested,
-                                              Transform_kwargs=Transform_kwargs),
+                                              Transform_kwargs=Transform_kwargs,
+                                              Sensitivity=Sensitivity,
+                                              NumThreads=NumThreads,
+                                              WarmStartSize=WarmStartSize,
+                                              EnvelopePressure=EnvelopePressure,
+                                              PreScreen=PreScreen),
                                        name_list,
                                        chunk_size=1000), 
                             total=total, 
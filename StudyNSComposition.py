@@ -24,27 +24,13 @@ def PressureComposition(ax, eos, trans_dens, eos_name, filename):
 
     start = time.time()
     max_pressure = row['PCentral']
-    max_density = opt.newton(lambda rho: eos.GetPressure(rho, 0) - max_pressure, x0=0.16)
-    min_density = opt.newton(lambda rho: eos.GetPressure(rho, 0) - 1e-8, x0=1e-5)
 
     with TidalLoveWrapper(eos) as tlove:
-        tlove.density_checkpoint = np.linspace(min_density, max_density, 200).tolist()
         result = tlove.FindMass(1.4)
-        mass = result['Checkpoint_mass']
-        radius = result['Checkpoint_radius']
-        pressure = tlove.checkpoint
+        profile = tlove.Profile(result.PCentral)
 
-    density = []
-    for pre in pressure:
-        try:
-            if pre < 5:
-                density.append(opt.newton(lambda rho: eos.GetPressure(rho, 0) - pre, x0=pre, maxiter=100))
-            else:
-                density.append(opt.newton(lambda rho: eos.GetPressure(rho, 0) - pre, x0=5*0.16, maxiter=100))
-        except Exception as error:
-            density.append(0)
-
-    data = pd.DataFrame.from_dict({'mass':mass, 'radius':radius, 'pressure':pressure, 'density':density})
+    data = pd.DataFrame.from_dict({key: profile[key] for key in ['mass', 'radius', 'pressure', 'density']})
+    data['density'] = data['density'].fillna(0)
     color = ['r', 'b', 'g', 'orange', 'b', 'pink']
     labels = ['', 'Crustal EOS', 'Electron gas', 'Skyrme'] + ['']*(len(trans_dens) - 4)
     data = data[data['pressure'] > 1e-9]
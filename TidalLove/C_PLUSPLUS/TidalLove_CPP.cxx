@@ -1,4 +1,6 @@
 #include <tuple>
+#include <algorithm>
+#include <cmath>
 #include <stdexcept>
 #include <iomanip>
 #include <sstream>
@@ -6,14 +8,71 @@
 #include <string>
 #include <iostream>
 #include <vector>
+#include <limits>
+#include <chrono>
+#include <map>
+#include <memory>
 #include <boost/python/numpy.hpp>
 #include <boost/scoped_array.hpp>
+#include <boost/shared_ptr.hpp>
 #include <boost/numeric/odeint.hpp>
 #include "spline.h"
 
 typedef std::vector<double> state_type;
 typedef boost::numeric::odeint::runge_kutta_cash_karp54<state_type> error_stepper_type;
-typedef tk::spline SEOS;
+
+class PiecewiseSpline
+{
+    /*
+    Cubic splines joined at breakpoints, where the EOS is only continuous and its derivatives may jump
+    A single spline through a kink rings around it, while every segment here is smooth up to its ends
+    Knots on a breakpoint belong to the segments on both sides. Without breakpoints it is a single tk::spline
+    */
+public:
+    void set_points(const std::vector<double>& t_x, const std::vector<double>& t_y, 
+                    const std::vector<double>& t_breakpoints = std::vector<double>())
+    {
+        breakpoints_.clear();
+        segments_.clear();
+        int begin = 0, n = t_x.size();
+        for(double breakpoint : t_breakpoints)
+        {
+            // knot closest to the breakpoint ends the segment. A cubic spline needs at least 3 knots on each side
+            int end = std::lower_bound(t_x.begin(), t_x.end(), breakpoint) - t_x.begin();
+            if(end > 0 && end < n && breakpoint - t_x[end - 1] < t_x[end] - breakpoint)
+                --end;
+            if(end - begin < 2 || n - 1 - end < 2)
+                continue;
+            AddSegment(t_x, t_y, begin, end);
+            breakpoints_.push_back(t_x[end]);
+            begin = end;
+        }
+        AddSegment(t_x, t_y, begin, n - 1);
+    };
+
+    double operator()(double t_x) const { return segments_[Segment(t_x)](t_x); };
+    double deriv(int t_order, double t_x) const { return segments_[Segment(t_x)].deriv(t_order, t_x); };
+    // knots at which segments join in ascending order
+    const std::vector<double>& breakpoints() const { return breakpoints_; };
+private:
+    void AddSegment(const std::vector<double>& t_x, const std::vector<double>& t_y, int t_begin, int t_end)
+    {
+        segments_.emplace_back();
+        segments_.back().set_points(std::vector<double>(t_x.begin() + t_begin, t_x.begin() + t_end + 1), 
+                                    std::vector<double>(t_y.begin() + t_begin, t_y.begin() + t_end + 1));
+    };
+
+    int Segment(double t_x) const
+    {
+        // breakpoint itself belongs to the segment above it
+        return std::upper_bound(breakpoints_.begin(), breakpoints_.end(), t_x) - breakpoints_.begin();
+    };
+
+    std::vector<double> breakpoints_;
+    std::vector<tk::spline> segments_;
+};
+
+typedef PiecewiseSpline SEOS;
 
 const double MEVFM3 = 1.60217646e32;    // in J/m3 --> a converter from (MeV/fm3)
 const double TOPA = 4.4173085e36;    // Pressure units in Pascal
@@ -23,7 +82,139 @@ const double G = 6.67408e-11;        // gravitational constant
 const double MODOT = 1.989e30;        // Mass of sun in kg
 const double C = 299792458.;        // speed of light in m/s
 
-SEOS EOSFromFile(const std::string& t_filename)
+class EnthalpyEOS
+{
+    /*
+    Pseudo-enthalpy h = int dP/(E + P) of an EOS spline, see Lindblom, ApJ 398, 569 (1992)
+    h is tabulated on the knots of the spline with h = 0 at the first knot
+    pressure as a function of h uses cubic Hermite interpolation as dP/dh = E + P is known on every knot
+    Only the spline supplied at construction can be used with this table
+    */
+public:
+    EnthalpyEOS() {};
+    EnthalpyEOS(const SEOS& t_eos, const std::vector<double>& t_pressure) : pressure_(t_pressure)
+    {
+        enthalpy_.push_back(0);
+        for(int i = 0; i < int(pressure_.size()); ++i)
+        {
+            slope_.push_back(t_eos(pressure_[i]) + pressure_[i]);
+            if(i > 0)
+                enthalpy_.push_back(enthalpy_.back() + Integrate(t_eos, pressure_[i - 1], pressure_[i]));
+        }
+    };
+
+    double enthalpy(const SEOS& t_eos, double t_pressure) const
+    {
+        // spline is extrapolated beyond the table
+        int i = std::upper_bound(pressure_.begin(), pressure_.end(), t_pressure) - pressure_.begin() - 1;
+        i = std::min(std::max(i, 0), int(pressure_.size()) - 1);
+        return enthalpy_[i] + Integrate(t_eos, pressure_[i], t_pressure);
+    };
+
+    double pressure(double t_enthalpy) const
+    {
+        int n = enthalpy_.size();
+        // extrapolate linearly beyond the table
+        if(t_enthalpy <= enthalpy_[0])
+            return pressure_[0] + (t_enthalpy - enthalpy_[0])*slope_[0];
+        if(t_enthalpy >= enthalpy_[n - 1])
+            return pressure_[n - 1] + (t_enthalpy - enthalpy_[n - 1])*slope_[n - 1];
+        int i = std::upper_bound(enthalpy_.begin(), enthalpy_.end(), t_enthalpy) - enthalpy_.begin() - 1;
+        double dh = enthalpy_[i + 1] - enthalpy_[i];
+        double t = (t_enthalpy - enthalpy_[i])/dh;
+        double t2 = t*t, t3 = t2*t;
+        return (2*t3 - 3*t2 + 1)*pressure_[i] + (t3 - 2*t2 + t)*dh*slope_[i] 
+               + (-2*t3 + 3*t2)*pressure_[i + 1] + (t3 - t2)*dh*slope_[i + 1];
+    };
+private:
+    double Integrate(const SEOS& t_eos, double t_lower, double t_upper) const
+    {
+        // 3 points Gauss-Legendre quadrature of dP/(E + P)
+        const double node = sqrt(0.6);
+        double mid = 0.5*(t_lower + t_upper);
+        double half = 0.5*(t_upper - t_lower);
+        double sum = 0;
+        for(auto point : {std::make_pair(-node, 5./9.), std::make_pair(0., 8./9.), std::make_pair(node, 5./9.)})
+        {
+            double P = mid + point.first*half;
+            sum += point.second/(t_eos(P) + P);
+        }
+        return half*sum;
+    };
+
+    std::vector<double> pressure_, enthalpy_, slope_;
+};
+
+class EOSTable
+{
+    /*
+    Unit converted and monotonicity filtered EOS
+    The spline is built once and can be reused for any number of integrations
+    t_breakpoints are pressures (MeV/fm3) where segments of the EOS join. The spline is split there
+    */
+public:
+    EOSTable(const double* t_energy_density, 
+             const double* t_pressure, 
+             int t_size,
+             double t_max_energy = std::numeric_limits<double>::infinity(),
+             std::vector<double> t_breakpoints = std::vector<double>())
+    {
+        std::vector<double> energy_density, pressure;
+        for(int i = 0; i < t_size; ++i)
+        {
+            double edensity = t_energy_density[i];
+            double pres = t_pressure[i];
+            if(std::isnan(edensity) || std::isnan(pres) || edensity > t_max_energy)
+                continue;
+            // make sure that pressure is increasing 
+            if(pressure.empty() || pres*MEVFM3/TOPA > pressure.back())
+            {
+                energy_density_.push_back(edensity);
+                pressure_.push_back(pres);
+                energy_density.push_back(edensity*MEVFM3/TOJM3);
+                pressure.push_back(pres*MEVFM3/TOPA);
+            }
+        }
+        std::sort(t_breakpoints.begin(), t_breakpoints.end());
+        for(auto& breakpoint : t_breakpoints)
+            breakpoint *= MEVFM3/TOPA;
+        spline_.set_points(pressure, energy_density, t_breakpoints);
+        enthalpy_ = EnthalpyEOS(spline_, pressure);
+    };
+
+    const SEOS& spline() const { return spline_; };
+    const EnthalpyEOS& enthalpy() const { return enthalpy_; };
+    // filtered table in MeV/fm3. Enough to rebuild the same EOSTable
+    const std::vector<double>& energy_density() const { return energy_density_; };
+    const std::vector<double>& pressure() const { return pressure_; };
+    // breakpoints that are used by the spline in MeV/fm3
+    std::vector<double> breakpoints() const 
+    { 
+        std::vector<double> breakpoints;
+        for(auto breakpoint : spline_.breakpoints())
+            breakpoints.push_back(breakpoint/MEVFM3*TOPA);
+        return breakpoints;
+    };
+    int size() const { return pressure_.size(); };
+private:
+    std::vector<double> energy_density_, pressure_;
+    SEOS spline_;
+    EnthalpyEOS enthalpy_;
+};
+
+SEOS EOSFromArray(const double* t_energy_density, 
+                  const double* t_pressure, 
+                  int t_size,
+                  double t_max_energy)
+{
+    /*
+    Input: energy density and pressure in MeV/fm3, number of entries and the maximum energy density at which EOS is valid
+    Return: spline of energy density as a function of pressure in geometric unit
+    */
+    return EOSTable(t_energy_density, t_pressure, t_size, t_max_energy).spline();
+}
+
+SEOS EOSFromFile(const std::string& t_filename, double t_max_energy = std::numeric_limits<double>::infinity())
 {
     std::ifstream file(t_filename.c_str());
     assert(file.is_open());
@@ -34,7 +225,6 @@ SEOS EOSFromFile(const std::string& t_filename)
 
     // only get the first 2 column
     std::vector<double> energy_density, pressure;
-    bool first_line = true;
     while(std::getline(file, line))
     {
         std::stringstream ss(line);
@@ -44,26 +234,11 @@ SEOS EOSFromFile(const std::string& t_filename)
             std::cerr << " Cannot read line " << line << "\n";
             continue;
         }
-    if(!first_line)
-        {
-        if(pres*MEVFM3/TOPA > pressure.back())
-        {
-                energy_density.push_back(edensity*MEVFM3/TOJM3);
-                pressure.push_back(pres*MEVFM3/TOPA);
-        }
-        }
-        else
-        {
-            energy_density.push_back(edensity*MEVFM3/TOJM3);
-            pressure.push_back(pres*MEVFM3/TOPA);
-            first_line = false;
-        }
-        
+        energy_density.push_back(edensity);
+        pressure.push_back(pres);
     }
 
-    SEOS s;
-    s.set_points(pressure, energy_density);
-    return s;
+    return EOSFromArray(energy_density.data(), pressure.data(), energy_density.size(), t_max_energy);
 }
 
 class MaxCompact
@@ -85,17 +260,38 @@ private:
     double epsilon_;
 };
 
+struct WorkCounter
+{
+    /*
+    Work done by one integration
+    Cash-Karp evaluates the right hand side 6 times for every attempted step, accepted or not
+    */
+    long rhs_evaluations = 0;
+    long accepted_steps = 0;
+    double time = 0; // wall time in seconds
+
+    long rejected_steps() const
+    {
+        return std::max(rhs_evaluations/6 - accepted_steps, 0L);
+    };
+};
+
 template<class EOS>
 class TOV_eq
 {
 private:
     // EOS need to be able to map pressure to energy
-    EOS eos_;
+    // only a reference is kept so the spline is not copied for every integration
+    const EOS& eos_;
+    // odeint copies the system, so the counter is held by pointer
+    WorkCounter* work_;
 public:
-    TOV_eq(const EOS& t_eos) : eos_(t_eos) {};
+    TOV_eq(const EOS& t_eos, WorkCounter* t_work = nullptr) : eos_(t_eos), work_(t_work) {};
     
     void operator() ( const state_type &x, state_type &dxdt, const double r)
     {
+        if(work_)
+            ++work_->rhs_evaluations;
         double P = x[0];
         double M = x[1];
         double E = eos_(P);
@@ -114,8 +310,17 @@ public:
         double y = x[2];
         dxdt[2] = - (y*y + y*F_r +r*r*Q_r)/r;    
 
+        // frame dragging (Hartle 1967) as x = d ln(omega)/d ln(r), which is 0 at the centre
+        double z = x[3];
+        dxdt[3] = -z*(z + 3)/r + r*r*(E + P)*(z + 4)/(r - 2*M);
+        // pseudo-enthalpy relative to the centre, dh/dr = (dP/dr)/(E + P)
+        double h = x[4];
+        dxdt[4] = -(M + r*r*r*P)/(r*(r - 2.*M));
+        // rest mass density is (E + P)exp(-h) up to a constant, which is fixed at the surface in GetBaryonMass
+        dxdt[5] = r*r*(E + P)*exp(-h)/sqrt(1 - 2*M/r);
+
         if(P < 0)
-            dxdt[0] = dxdt[1] = dxdt[2] = 0;
+            std::fill(dxdt.begin(), dxdt.end(), 0);
     };
 
     double GetK2(const state_type &x, const double R)
@@ -132,16 +337,222 @@ public:
         double part4 = 3*(1 - Rs_R)*(1 - Rs_R)*(2 - yR + (yR - 1)*Rs_R)*log(1 - Rs_R);
         return part1/(part2 + part3 + part4);
     }
+
+    static double GetMomentOfInertia(const state_type &x, const double R)
+    {
+        // I = J/Omega with J = R^4 omega'(R)/6 and Omega = omega(R) + 2J/R^3
+        // Return: moment of inertia in solar mass km^2
+        double z = x[3];
+        return R*R*R*z/(6 + 2*z)*TOKM*TOKM;
+    }
+
+    static double GetBaryonMass(const state_type &x)
+    {
+        // baryon mass is taken as the chemical potential at the surface, such that rest mass density there is E + P
+        // Return: baryonic mass in solar mass
+        return x[5]*exp(x[4]);
+    }
+};
+
+// relative change of pressure at which integration starts away from the centre
+const double CENTRAL_PRESSURE_DROP = 1e-3;
+
+template<class EOS>
+double CentralRadius(const EOS& t_eos, double t_Pc)
+{
+    // radius at which pressure has dropped by CENTRAL_PRESSURE_DROP according to CentralSeries
+    double Ec = t_eos(t_Pc);
+    return sqrt(6*CENTRAL_PRESSURE_DROP*t_Pc/((Ec + t_Pc)*(Ec + 3*t_Pc)));
+}
+
+template<class EOS>
+state_type CentralSeries(const EOS& t_eos, double t_Pc, double t_r)
+{
+    /*
+    Taylor expansion of the state of TOV_eq about the centre, second order beyond the central value of every variable
+    Terms neglected are smaller by another factor of (Pc - P)/Pc
+    */
+    double Ec = t_eos(t_Pc);
+    double E1 = t_eos.deriv(1, t_Pc);
+    double r2 = t_r*t_r, r3 = r2*t_r;
+    double P2 = -(Ec + t_Pc)*(Ec + 3*t_Pc)/6.;
+    return state_type{t_Pc + P2*r2,                                      // P
+                      Ec*r3/3. + E1*P2*r3*r2/5.,                         // M
+                      2 - (Ec/3. + 11*t_Pc + (Ec + t_Pc)*E1)*r2/7.,      // y
+                      4*(Ec + t_Pc)*r2/5.,                               // x = dln(omega)/dln(r)
+                      -(Ec + 3*t_Pc)*r2/6.,                              // h
+                      (Ec + t_Pc)*r3/3.};                                // B
+}
+
+template<class EOS>
+class TOV_enthalpy_eq
+{
+    /*
+    Same TOV and tidal equations as TOV_eq with pseudo-enthalpy as the independent variable
+    state is (r, M, y, x, h_s, B) and dx/dh = dx/dr * dr/dh with dr/dh = 1/(dh/dr) = -r(r - 2M)/(M + r^3 P)
+    h_s is the enthalpy of the surface and is constant, such that GetBaryonMass of TOV_eq applies to this state as well
+    */
+private:
+    const EOS& eos_;
+    const EnthalpyEOS& enthalpy_;
+    WorkCounter* work_;
+public:
+    TOV_enthalpy_eq(const EOS& t_eos, const EnthalpyEOS& t_enthalpy, WorkCounter* t_work = nullptr) : eos_(t_eos), enthalpy_(t_enthalpy), work_(t_work) {};
+
+    void operator() ( const state_type &x, state_type &dxdt, const double h)
+    {
+        if(work_)
+            ++work_->rhs_evaluations;
+        double r = x[0];
+        double M = x[1];
+        double y = x[2];
+        double P = enthalpy_.pressure(h);
+        double E = eos_(P);
+        double r3 = r*r*r;
+        double drdh = -r*(r - 2.*M)/(M + r3*P);
+        dxdt[0] = drdh;
+        dxdt[1] = r*r*E*drdh;
+
+        double F_r = (r - r3*(E - P))/(r - 2*M);
+        double Q_r_part1 = r*(5*E + 9*P + (E + P)*eos_.deriv(1, P) - 6./(r*r))/(r - 2*M);
+        double Q_r_part2 = (M + r3*P)/(r*r*(1 - 2*M/r));
+        double Q_r = Q_r_part1 - 4*Q_r_part2*Q_r_part2;
+        dxdt[2] = - (y*y + y*F_r + r*r*Q_r)/r*drdh;
+
+        double z = x[3];
+        dxdt[3] = (-z*(z + 3)/r + r*r*(E + P)*(z + 4)/(r - 2*M))*drdh;
+        dxdt[4] = 0;
+        dxdt[5] = r*r*(E + P)*exp(-h)/sqrt(1 - 2*M/r)*drdh;
+    };
+};
+
+template<class EOS>
+class TOV_sensitivity_eq
+{
+    /*
+    TOV equation and tidal y(r) of TOV_eq together with their forward sensitivities (variational equations)
+    state is (log(P), M, y) followed by (dlog(P), dM, dy) of every direction
+    log(P) keeps pressure and its sensitivity accurate relative to themselves all the way to the surface, which moves with the perturbation
+    direction 0 is log of central pressure. Direction k > 0 perturbs energy density of the EOS by perturbations[k - 1](P)
+    */
+private:
+    const EOS& eos_;
+    const std::vector<SEOS>& perturbations_;
+public:
+    TOV_sensitivity_eq(const EOS& t_eos, const std::vector<SEOS>& t_perturbations) : eos_(t_eos), perturbations_(t_perturbations) {};
+
+    void operator() ( const state_type &x, state_type &dxdt, const double r)
+    {
+        double P = exp(x[0]);
+        double M = x[1];
+        double y = x[2];
+        double E = eos_(P);
+        double E1 = eos_.deriv(1, P);
+        double E2 = eos_.deriv(2, P);
+        double r2 = r*r, r3 = r2*r;
+        double A = E + P;
+        double B = M + r3*P;
+        double D = r - 2*M;
+
+        // same equations as TOV_eq
+        double F_r = (r - r3*(E - P))/D;
+        double N = 5*E + 9*P + A*E1 - 6./r2;
+        double Q_r_part1 = r*N/D;
+        double Q_r_part2 = B/(r*D);
+        double Q_r = Q_r_part1 - 4*Q_r_part2*Q_r_part2;
+        double dPdr = -A*B/(r*D);
+        dxdt[0] = dPdr/P;
+        dxdt[1] = r2*E;
+        dxdt[2] = -(y*y + y*F_r + r2*Q_r)/r;
+
+        // derivatives with respect to P and M, where E follows the EOS
+        double dP_dP = -((E1 + 1)*B + A*r3)/(r*D);
+        double dP_dM = -A*(D + 2*B)/(r*D*D);
+        double dM_dP = r2*E1;
+        double F_P = -r3*(E1 - 1)/D;
+        double F_M = 2*F_r/D;
+        double Q_P = r*(5*E1 + 9 + (E1 + 1)*E1 + A*E2)/D - 8*Q_r_part2*r2/D;
+        double Q_M = 2*Q_r_part1/D - 8*Q_r_part2*(D + 2*B)/(r*D*D);
+        double dy_dP = -(y*F_P + r2*Q_P)/r;
+        double dy_dM = -(y*F_M + r2*Q_M)/r;
+        double dy_dy = -(2*y + F_r)/r;
+        // derivatives with respect to E and dE/dP at fixed P
+        double dP_dE = -B/(r*D);
+        double dM_dE = r2;
+        double dy_dE = -(y*(-r3/D) + r2*r*(5 + E1)/D)/r;
+        double dy_dE1 = -r2*A/D;
+
+        for(int i = 0; i <= int(perturbations_.size()); ++i)
+        {
+            int j = 3*(i + 1);
+            // dlog(P) = dP/P
+            double sP = P*x[j], sM = x[j + 1], sy = x[j + 2];
+            double dsP = dP_dP*sP + dP_dM*sM;
+            dxdt[j + 1] = dM_dP*sP;
+            dxdt[j + 2] = dy_dP*sP + dy_dM*sM + dy_dy*sy;
+            if(i > 0)
+            {
+                double dE = perturbations_[i - 1](P);
+                double dE1 = perturbations_[i - 1].deriv(1, P);
+                dsP += dP_dE*dE;
+                dxdt[j + 1] += dM_dE*dE;
+                dxdt[j + 2] += dy_dE*dE + dy_dE1*dE1;
+            }
+            dxdt[j] = (dsP - dPdr*x[j])/P;
+        }
+    };
 };
 
+double Hermite(double t_t, double t_h, double t_y0, double t_y1, double t_d0, double t_d1)
+{
+    // cubic Hermite interpolation at fraction t of an interval of length h, with values y and derivatives d at both ends
+    double t2 = t_t*t_t, t3 = t2*t_t;
+    return (2*t3 - 3*t2 + 1)*t_y0 + (t3 - 2*t2 + t_t)*t_h*t_d0 + (-2*t3 + 3*t2)*t_y1 + (t3 - t2)*t_h*t_d1;
+}
+
+double HermiteCrossing(double t_h, double t_y0, double t_y1, double t_d0, double t_d1, double t_target)
+{
+    /*
+    Fraction of the interval at which the Hermite interpolant reaches t_target, with t_y0 > t_target >= t_y1
+    Newton iterations are kept inside the bracket by bisection
+    */
+    double lower = 0, upper = 1;
+    double t = (t_y0 - t_target)/(t_y0 - t_y1);
+    for(int i = 0; i < 20; ++i)
+    {
+        double f = Hermite(t, t_h, t_y0, t_y1, t_d0, t_d1) - t_target;
+        if(std::abs(f) <= 1e-12*std::abs(t_y0 - t_y1))
+            break;
+        if(f > 0)
+            lower = t;
+        else
+            upper = t;
+        double t2 = t*t;
+        double dfdt = (6*t2 - 6*t)*t_y0 + (3*t2 - 4*t + 1)*t_h*t_d0 + (-6*t2 + 6*t)*t_y1 + (3*t2 - 2*t)*t_h*t_d1;
+        double next = (dfdt != 0)? t - f/dfdt : lower;
+        t = (next > lower && next < upper)? next : 0.5*(lower + upper);
+    }
+    return t;
+}
+
+template<class System>
 struct CheckpointState
 {
+    /*
+    Stops integration at the surface and records mass and radius where pressure crosses every checkpoint
+    Crossings are located within the step by Hermite interpolation of pressure and mass, 
+    with derivatives from t_system at both ends of the step
+    */
 public:
-    CheckpointState(const std::vector<double>& t_checkpoint_pressure, 
+    CheckpointState(System t_system,
+                    const std::vector<double>& t_checkpoint_pressure, 
                     std::vector<double>& t_mass, 
                     std::vector<double>& t_radius,
                     double &t_R,
-                    bool t_verbose = false) : checkpoint_pressure_(t_checkpoint_pressure),
+                    double t_surface_pressure = 1e-15,
+                    bool t_verbose = false) : system_(t_system),
+                                              checkpoint_pressure_(t_checkpoint_pressure),
+                                              surface_pressure_(t_surface_pressure),
                                               checkpoint_index(0),
                                               mass_(t_mass),
                                               radius_(t_radius),
@@ -159,20 +570,43 @@ public:
                       << std::setw(10) << P << " M: " 
                       << std::setw(10) << state[1] << " y: " 
                       << std::setw(10) << state[2] << "\n";
-        if(P < 1e-15)
+        if(P < surface_pressure_)
             throw std::invalid_argument("Pressure is now negative");
 
-        if(checkpoint_index < checkpoint_pressure_.size())
-            if(P < checkpoint_pressure_[checkpoint_index])
+        // checkpoints above the starting pressure are recorded at the starting point
+        while(previous_state_.empty() && checkpoint_index < checkpoint_pressure_.size() && P < checkpoint_pressure_[checkpoint_index])
+        {
+            mass_.push_back(state[1]);
+            radius_.push_back(R);
+            ++checkpoint_index;
+        }
+
+        if(checkpoint_index < checkpoint_pressure_.size() && P < checkpoint_pressure_[checkpoint_index])
+        {
+            state_type rate(state.size()), previous_rate(state.size());
+            system_(state, rate, r);
+            system_(previous_state_, previous_rate, previous_r_);
+            double h = r - previous_r_;
+            // a step can cross more than one checkpoint
+            while(checkpoint_index < checkpoint_pressure_.size() && P < checkpoint_pressure_[checkpoint_index])
             {
-                mass_.push_back(state[1]);
-                radius_.push_back(R);
+                double target = checkpoint_pressure_[checkpoint_index]*MEVFM3/TOPA;
+                double t = HermiteCrossing(h, previous_state_[0], state[0], previous_rate[0], rate[0], target);
+                mass_.push_back(Hermite(t, h, previous_state_[1], state[1], previous_rate[1], rate[1]));
+                radius_.push_back((previous_r_ + t*h)*TOKM);
                 ++checkpoint_index;
             }
+        }
+        previous_state_ = state;
+        previous_r_ = r;
     }
 
 private:
+    System system_;
+    state_type previous_state_;
+    double previous_r_;
     std::vector<double> checkpoint_pressure_;
+    double surface_pressure_;
     int checkpoint_index;
     std::vector<double>& mass_;
     std::vector<double>& radius_;
@@ -223,14 +657,31 @@ private:
 };
 
 typedef std::vector<double> list;
+// mass, radius, lambda, mass in checkpoints, radius in checkpoints, moment of inertia, baryonic mass, solver work
+typedef std::tuple<double, double, double, list, list, double, double, WorkCounter> result_type;
 
 // wrappers needed to convert numpy to and from python
 namespace p = boost::python;
 namespace np = boost::python::numpy;
 
-list wrap_from_ndarray(np::ndarray const & array)
+class ReleaseGIL
+{
+    /*
+    Let other python threads run while this object is alive
+    No python object may be touched in the meantime
+    */
+public:
+    ReleaseGIL() : state_(PyEval_SaveThread()) {};
+    ~ReleaseGIL() { PyEval_RestoreThread(state_); };
+    ReleaseGIL(const ReleaseGIL&) = delete;
+    ReleaseGIL& operator=(const ReleaseGIL&) = delete;
+private:
+    PyThreadState* state_;
+};
+
+void check_ndarray(np::ndarray const & array, np::dtype const & t_dtype = np::dtype::get_builtin<double>())
 {
-    if (array.get_dtype() != np::dtype::get_builtin<double>()) 
+    if (array.get_dtype() != t_dtype) 
     {
         PyErr_SetString(PyExc_TypeError, "Incorrect array data type");
         p::throw_error_already_set();
@@ -240,6 +691,11 @@ list wrap_from_ndarray(np::ndarray const & array)
         PyErr_SetString(PyExc_TypeError, "Incorrect number of dimensions");
         p::throw_error_already_set();
     }
+}
+
+list wrap_from_ndarray(np::ndarray const & array)
+{
+    check_ndarray(array);
 
     list result;
     int rows = array.shape(0);
@@ -249,6 +705,19 @@ list wrap_from_ndarray(np::ndarray const & array)
     return result;
 }
 
+const double* wrap_view_ndarray(np::ndarray const & array)
+{
+    // read numpy buffer directly without copying
+    // array must be contiguous for the pointer to be meaningful
+    check_ndarray(array);
+    if (!(array.get_flags() & np::ndarray::C_CONTIGUOUS))
+    {
+        PyErr_SetString(PyExc_ValueError, "Array must be C contiguous");
+        p::throw_error_already_set();
+    }
+    return reinterpret_cast<const double*>(array.get_data());
+}
+
 np::ndarray wrap_to_ndarray(const list& t_list)
 {
     Py_intptr_t shape[1] = {t_list.size() };
@@ -257,112 +726,1598 @@ np::ndarray wrap_to_ndarray(const list& t_list)
     return result;
 }
 
-std::tuple<double, double, double, list, list> TidalLove_individual(const std::string& t_EOS_filename,
-                                                                    double t_pc,
-                                                                    std::vector<double> t_checkpoints,
-                                                                    double t_abs_err = 1.0e-5,
-                                                                    double t_rel_err = 1.0e-5,
-                                                                    double t_init_step = 1.0e-6)
+std::vector<int64_t> wrap_from_index_ndarray(np::ndarray const & array)
 {
-    /*
-    Input: filename of the EOS, central pressure, number of checkpoints pressure, the checkpoint array
-    Return: mass, radius, lambda, mass in checkpoins and radius in checkpoints
-    */
-
-    state_type state{t_pc*MEVFM3/TOPA, 0, 2}; // initial y is always 2
-    auto eos = EOSFromFile(t_EOS_filename);
-    TOV_eq<SEOS> tov(eos);
-
-    list mass, radius;
-    double R;
-    CheckpointState observer(t_checkpoints, mass, radius, R);
-
-    try
+    // indices and offsets are passed as contiguous int64 arrays
+    check_ndarray(array, np::dtype::get_builtin<int64_t>());
+    if (!(array.get_flags() & np::ndarray::C_CONTIGUOUS))
     {
-        using namespace boost::numeric::odeint;
-        integrate_adaptive( make_controlled<error_stepper_type>( t_abs_err , t_rel_err ) , 
-                            tov , 
-                            state , 
-                            1e-5 ,    // initial radius (cannot be 0 as it is singular there 
-                            200.0 ,   // final radius (anything that is ridicuously large will work. This will break when surface is reached
-                            t_init_step,  // initial step size (for reference only. It will be adaptively changed
-                            observer );
+        PyErr_SetString(PyExc_ValueError, "Array must be C contiguous");
+        p::throw_error_already_set();
     }
-    catch( const std::invalid_argument& e)
-    {}
-
-
-    double r = R/TOKM;
-    double k2 = tov.GetK2(state, r);
-    double lambda = 2*k2*pow(r*TOKM*1e3, 5)/(3*G);
-    double dimlambda = lambda/pow(G, 4)/pow(state[1]*MODOT, 5)*pow(C, 10);
-
-    return std::make_tuple(state[1], R, dimlambda, mass, radius);
+    const int64_t* data = reinterpret_cast<const int64_t*>(array.get_data());
+    return std::vector<int64_t>(data, data + array.shape(0));
 }
 
-std::tuple<list, list, list, list> TidalLove_analysis(const std::string& t_EOS_filename,
-                                                double t_pc)
+np::ndarray wrap_to_index_ndarray(const std::vector<int64_t>& t_list)
 {
-    state_type state{t_pc*MEVFM3/TOPA, 0, 2}; // initial y is always 2
-    auto eos = EOSFromFile(t_EOS_filename);
-    TOV_eq<SEOS> tov(eos);
+    Py_intptr_t shape[1] = {Py_intptr_t(t_list.size())};
+    np::ndarray result = np::zeros(1, shape, np::dtype::get_builtin<int64_t>());
+    std::copy(t_list.begin(), t_list.end(), reinterpret_cast<int64_t*>(result.get_data()));
+    return result;
+}
 
-    list mass, radius, pressure, y;
-    CheckpointSaveAll observer(mass, radius, pressure, y);
-    try
+// steps that end on a breakpoint aim this fraction beyond it, such that they do not fall just short of it
+const double BREAKPOINT_OVERSHOOT = 1e-3;
+
+template<class System, class Observer, class Crossing>
+void IntegrateAcrossBreakpoints(System t_system, 
+                                state_type& t_state, 
+                                double t_r, 
+                                double t_dr,
+                                double t_abs_err,
+                                double t_rel_err,
+                                const std::vector<double>& t_breakpoints,
+                                Observer t_observer,
+                                Crossing t_crossing)
+{
+    /*
+    Same as integrate_adaptive with a controlled Cash-Karp stepper in radius, until the observer throws at the surface
+    Steps are shortened to end where the first variable (pressure or its log) reaches a breakpoint (ascending) of the EOS, 
+    such that no step straddles a kink of the EOS. A step straddling a kink is rejected repeatedly by the controller
+    The step after a breakpoint restarts with the size suggested by the controller before it was shortened
+    t_crossing(state, r, breakpoint) is called on the first state past every breakpoint, before the observer
+    */
+    using namespace boost::numeric::odeint;
+    auto stepper = make_controlled<error_stepper_type>(t_abs_err, t_rel_err);
+    const double r_end = 200.; // anything that is ridicuously large will work. This will break when surface is reached
+    // breakpoints below the current pressure are crossed in descending order
+    auto next = std::lower_bound(t_breakpoints.begin(), t_breakpoints.end(), t_state[0]);
+    state_type rate(t_state.size());
+    t_observer(t_state, t_r);
+    while(t_r < r_end)
     {
-        using namespace boost::numeric::odeint;
-        integrate_adaptive( make_controlled<error_stepper_type>( 1.0e-10 , 1.0e-7 ) , 
-                            tov , 
-                            state , 
-                            1e-5 ,    // initial radius (cannot be 0 as it is singular there 
-                            200.0 ,   // final radius (anything that is ridicuously large will work. This will break when surface is reached
-                            0.00001,  // initial step size (for reference only. It will be adaptively changed
-                            observer );
+        t_system(t_state, rate, t_r);
+        double dr = std::min(t_dr, r_end - t_r);
+        bool shortened = false;
+        if(next != t_breakpoints.begin() && rate[0] < 0)
+        {
+            // distance at which pressure reaches the breakpoint if it keeps falling at the current rate
+            double distance = (*(next - 1) - t_state[0])/rate[0]*(1 + BREAKPOINT_OVERSHOOT);
+            if(distance < dr)
+            {
+                dr = distance;
+                shortened = true;
+            }
+        }
+        if(stepper.try_step(t_system, t_state, rate, t_r, dr) == fail)
+        {
+            t_dr = dr;
+            continue;
+        }
+        // a short step ending on a breakpoint is accurate regardless, so its suggestion is not kept
+        if(!shortened)
+            t_dr = dr;
+        while(next != t_breakpoints.begin() && t_state[0] < *(next - 1))
+        {
+            --next;
+            t_crossing(t_state, t_r, *next);
+        }
+        t_observer(t_state, t_r);
     }
-    catch( const std::invalid_argument& e)
-    {}
-
-    return std::make_tuple(mass, radius, pressure, y);
 }
 
-p::tuple wrap_TidalLove_analysis(const std::string& t_EOS_filename, double t_pc)
+template<class System, class Observer>
+void IntegrateAcrossBreakpoints(System t_system, 
+                                state_type& t_state, 
+                                double t_r, 
+                                double t_dr,
+                                double t_abs_err,
+                                double t_rel_err,
+                                const std::vector<double>& t_breakpoints,
+                                Observer t_observer)
 {
-    auto result = TidalLove_analysis(t_EOS_filename, t_pc);
-    auto mass = std::get<0>(result);
-    auto radius = std::get<1>(result);
-    auto pressure = std::get<2>(result);
-    auto y = std::get<3>(result);
-    return p::make_tuple(wrap_to_ndarray(mass), wrap_to_ndarray(radius), wrap_to_ndarray(pressure), wrap_to_ndarray(y));
+    IntegrateAcrossBreakpoints(t_system, t_state, t_r, t_dr, t_abs_err, t_rel_err, t_breakpoints, t_observer, 
+                               [](state_type&, double, double) {});
 }
 
-p::tuple wrap_TidalLove_individual(const std::string& t_EOS_filename,
-                                   double t_pc, 
-                                   np::ndarray const & array,
-                                   double t_abs_err = 1.0e-5,
-                                   double t_rel_err = 1.0e-5,
-                                   double t_init_step = 1.0e-5)
+template<class EOS>
+class Envelope_eq
 {
-    
-    auto checkpoint = wrap_from_ndarray(array);
-    auto result = TidalLove_individual(t_EOS_filename, t_pc, checkpoint, t_abs_err, t_rel_err, t_init_step);
-    
-    // convert mass and radius into python array
-    auto M = std::get<0>(result);
-    auto R = std::get<1>(result);
-    auto dimlambda = std::get<2>(result);
-    auto mass = std::get<3>(result);
-    auto radius = std::get<4>(result);
-
-    return p::make_tuple(M, R, dimlambda, wrap_to_ndarray(mass), wrap_to_ndarray(radius));
+    /*
+    TOV_eq for three values of y and z at once, such that they share the same steps
+    state is (P, M, y0, y1, y2, z0, z1, z2, h, B)
+    */
+public:
+    Envelope_eq(const EOS& t_eos) : tov_(t_eos) {};
+
+    void operator() ( const state_type &x, state_type &dxdt, const double r)
+    {
+        state_type sub(6), rate(6);
+        for(int i = 0; i < 3; ++i)
+        {
+            sub = {x[0], x[1], x[2 + i], x[5 + i], x[8], x[9]};
+            tov_(sub, rate, r);
+            dxdt[2 + i] = rate[2];
+            dxdt[5 + i] = rate[3];
+        }
+        dxdt[0] = rate[0];
+        dxdt[1] = rate[1];
+        dxdt[8] = rate[4];
+        dxdt[9] = rate[5];
+    };
+private:
+    TOV_eq<EOS> tov_;
+};
+
+void Mobius(const double* t_x, const double* t_X, double* t_coefficients)
+{
+    /*
+    Coefficients (a, b, c) of X = (a x + b)/(c x + 1) that maps the three t_x onto t_X
+    Flow of a Riccati equation (y and z of TOV_eq) is always such a map
+    */
+    double m[3][3], rhs[3];
+    for(int i = 0; i < 3; ++i)
+    {
+        m[i][0] = t_x[i];
+        m[i][1] = 1;
+        m[i][2] = -t_x[i]*t_X[i];
+        rhs[i] = t_X[i];
+    }
+    auto det = [](double a[3][3])
+    {
+        return a[0][0]*(a[1][1]*a[2][2] - a[1][2]*a[2][1]) - a[0][1]*(a[1][0]*a[2][2] - a[1][2]*a[2][0]) 
+               + a[0][2]*(a[1][0]*a[2][1] - a[1][1]*a[2][0]);
+    };
+    double d = det(m);
+    for(int j = 0; j < 3; ++j)
+    {
+        double mj[3][3];
+        for(int i = 0; i < 3; ++i)
+            for(int k = 0; k < 3; ++k)
+                mj[i][k] = (k == j)? rhs[i] : m[i][k];
+        t_coefficients[j] = det(mj)/d;
+    }
+}
+
+class CrustEnvelope
+{
+    /*
+    Response of the envelope of a star, where pressure is below the matching pressure, to the state at the matching pressure
+    EOS of the envelope is the crust, which is the same for every EOS of a run. The envelope is integrated once 
+    for a grid of mass and compactness at the matching pressure, and every star only interpolates the result
+    Stored for every node are log(R/r), (M_R - M)/M, change of h, change of B over M for h = 0 at the matching pressure, 
+    y and z at the surface for three samples of them at the matching pressure, 
+    then log(r/r_m) and (M - M_m)/M_m at every checkpoint below the matching pressure
+    y and z are mapped by the Mobius transformation through the interpolated samples
+    Pressures are in MeV/fm3. Checkpoints must be in descending order
+    */
+public:
+    CrustEnvelope(const EOSTable& t_table,
+                  double t_matching_pressure,
+                  double t_surface_pressure,
+                  const std::vector<double>& t_checkpoints,
+                  double t_abs_err = 1e-8,
+                  double t_rel_err = 1e-8,
+                  int t_num_mass = 24,
+                  int t_num_compactness = 32) 
+        : matching_pressure_(t_matching_pressure), surface_pressure_(t_surface_pressure), 
+          num_mass_(t_num_mass), num_compactness_(t_num_compactness)
+    {
+        for(double checkpoint : t_checkpoints)
+            if(checkpoint < t_matching_pressure && checkpoint > t_surface_pressure)
+                checkpoints_.push_back(checkpoint);
+        num_values_ = 10 + 2*checkpoints_.size();
+        values_.resize(num_mass_*num_compactness_*num_values_);
+        for(int i = 0; i < num_mass_; ++i)
+            for(int j = 0; j < num_compactness_; ++j)
+                Respond(t_table.spline(), std::exp(LogMass(i)), std::exp(LogCompactness(j)), t_abs_err, t_rel_err, 
+                        &values_[(i*num_compactness_ + j)*num_values_]);
+    };
+
+    bool Apply(state_type& t_state, double t_r, list& t_mass, list& t_radius, double& t_R) const
+    {
+        /*
+        Replace the state at the matching pressure at radius t_r by the state at the surface, with surface radius t_R in km
+        Mass and radius (km) of checkpoints in the envelope are appended
+        Return false, and leave everything unchanged, if the state is outside of the grid
+        */
+        double M = t_state[1];
+        double u = (std::log(M) - LOG_MASS_RANGE[0])/(LOG_MASS_RANGE[1] - LOG_MASS_RANGE[0])*(num_mass_ - 1);
+        double v = (std::log(M/t_r) - LOG_COMPACTNESS_RANGE[0])/(LOG_COMPACTNESS_RANGE[1] - LOG_COMPACTNESS_RANGE[0])*(num_compactness_ - 1);
+        if(!(u >= 0 && u <= num_mass_ - 1 && v >= 0 && v <= num_compactness_ - 1))
+            return false;
+        // 4 point Lagrange interpolation in both directions
+        int i0 = std::min(std::max(int(u) - 1, 0), num_mass_ - 4), j0 = std::min(std::max(int(v) - 1, 0), num_compactness_ - 4);
+        double wu[4], wv[4];
+        Lagrange(u - i0, wu);
+        Lagrange(v - j0, wv);
+        std::vector<double> values(num_values_, 0.);
+        for(int i = 0; i < 4; ++i)
+            for(int j = 0; j < 4; ++j)
+            {
+                const double* node = &values_[((i0 + i)*num_compactness_ + j0 + j)*num_values_];
+                for(int k = 0; k < num_values_; ++k)
+                    values[k] += wu[i]*wv[j]*node[k];
+            }
+        for(double value : values)
+            if(std::isnan(value))
+                return false;
+
+        for(int k = 0; k < int(checkpoints_.size()); ++k)
+        {
+            t_radius.push_back(t_r*std::exp(values[10 + 2*k])*TOKM);
+            t_mass.push_back(M*(1 + values[11 + 2*k]));
+        }
+        double y = t_state[2], z = t_state[3], h = t_state[4];
+        t_R = t_r*std::exp(values[0])*TOKM;
+        t_state[0] = surface_pressure_*MEVFM3/TOPA;
+        t_state[1] = M*(1 + values[1]);
+        double y_map[3], z_map[3];
+        Mobius(Y_SAMPLES, &values[4], y_map);
+        Mobius(Z_SAMPLES, &values[7], z_map);
+        t_state[2] = (y_map[0]*y + y_map[1])/(y_map[2]*y + 1);
+        t_state[3] = (z_map[0]*z + z_map[1])/(z_map[2]*z + 1);
+        t_state[4] = h + values[2];
+        t_state[5] += M*std::exp(-h)*values[3];
+        return true;
+    };
+
+    // pressure (MeV/fm3) at which the envelope starts
+    double matching_pressure() const { return matching_pressure_; };
+    double surface_pressure() const { return surface_pressure_; };
+    // checkpoints (MeV/fm3) that are recorded by the envelope
+    const std::vector<double>& checkpoints() const { return checkpoints_; };
+
+private:
+    double LogMass(int t_i) const 
+    { return LOG_MASS_RANGE[0] + (LOG_MASS_RANGE[1] - LOG_MASS_RANGE[0])*t_i/(num_mass_ - 1); };
+    double LogCompactness(int t_j) const 
+    { return LOG_COMPACTNESS_RANGE[0] + (LOG_COMPACTNESS_RANGE[1] - LOG_COMPACTNESS_RANGE[0])*t_j/(num_compactness_ - 1); };
+
+    static void Lagrange(double t_x, double* t_weights)
+    {
+        // weights of nodes 0, 1, 2, 3 at position t_x
+        for(int i = 0; i < 4; ++i)
+        {
+            t_weights[i] = 1;
+            for(int j = 0; j < 4; ++j)
+                if(j != i)
+                    t_weights[i] *= (t_x - j)/(i - j);
+        }
+    };
+
+    void Respond(const SEOS& t_eos, double t_M, double t_C, double t_abs_err, double t_rel_err, double* t_values)
+    {
+        // integrate the envelope from mass t_M and compactness t_C at the matching pressure. Values are nan if it fails
+        double r0 = t_M/t_C;
+        std::fill(t_values, t_values + num_values_, std::numeric_limits<double>::quiet_NaN());
+        state_type state{matching_pressure_*MEVFM3/TOPA, t_M, Y_SAMPLES[0], Y_SAMPLES[1], Y_SAMPLES[2], 
+                          Z_SAMPLES[0], Z_SAMPLES[1], Z_SAMPLES[2], 0., 0.};
+        Envelope_eq<SEOS> envelope(t_eos);
+        state_type previous, previous_rate(state.size()), rate(state.size());
+        double previous_r = r0;
+        int index = 0;
+        bool surface = false;
+        auto observer = [&](const state_type& t_state, double t_r)
+        {
+            if(!previous.empty() && (t_state[0] < surface_pressure_*MEVFM3/TOPA || 
+                                     (index < int(checkpoints_.size()) && t_state[0] < checkpoints_[index]*MEVFM3/TOPA)))
+            {
+                envelope(previous, previous_rate, previous_r);
+                envelope(t_state, rate, t_r);
+                double h = t_r - previous_r;
+                auto Interpolate = [&](double t_target, state_type& t_result)
+                {
+                    double t = HermiteCrossing(h, previous[0], t_state[0], previous_rate[0], rate[0], t_target);
+                    for(int k = 0; k < int(t_result.size()); ++k)
+                        t_result[k] = Hermite(t, h, previous[k], t_state[k], previous_rate[k], rate[k]);
+                    return previous_r + t*h;
+                };
+                state_type point(state.size());
+                while(index < int(checkpoints_.size()) && t_state[0] < checkpoints_[index]*MEVFM3/TOPA)
+                {
+                    double r = Interpolate(checkpoints_[index]*MEVFM3/TOPA, point);
+                    t_values[10 + 2*index] = std::log(r/r0);
+                    t_values[11 + 2*index] = (point[1] - t_M)/t_M;
+                    ++index;
+                }
+                if(t_state[0] < surface_pressure_*MEVFM3/TOPA)
+                {
+                    double R = Interpolate(surface_pressure_*MEVFM3/TOPA, point);
+                    t_values[0] = std::log(R/r0);
+                    t_values[1] = (point[1] - t_M)/t_M;
+                    t_values[2] = point[8];
+                    t_values[3] = point[9]/t_M;
+                    std::copy(point.begin() + 2, point.begin() + 8, t_values + 4);
+                    surface = true;
+                    throw std::invalid_argument("Pressure is now negative");
+                }
+            }
+            previous = t_state;
+            previous_r = t_r;
+        };
+        try
+        {
+            IntegrateAcrossBreakpoints(envelope, state, r0, 1e-3*r0, t_abs_err, t_rel_err, t_eos.breakpoints(), observer);
+        }
+        catch( const std::invalid_argument& e)
+        {}
+        if(!surface)
+            std::fill(t_values, t_values + num_values_, std::numeric_limits<double>::quiet_NaN());
+    };
+
+    static constexpr double LOG_MASS_RANGE[2] = {-1.6094379124341003, 1.252762968495368}; // 0.2 to 3.5 solar mass
+    static constexpr double LOG_COMPACTNESS_RANGE[2] = {-4.605170185988091, -0.9675840262617056}; // 0.01 to 0.38
+    static constexpr double Y_SAMPLES[3] = {0.5, 1.5, 2.5};
+    static constexpr double Z_SAMPLES[3] = {0., 0.5, 1.};
+
+    double matching_pressure_, surface_pressure_;
+    int num_mass_, num_compactness_, num_values_;
+    std::vector<double> checkpoints_;
+    std::vector<double> values_;
+};
+
+constexpr double CrustEnvelope::LOG_MASS_RANGE[2];
+constexpr double CrustEnvelope::LOG_COMPACTNESS_RANGE[2];
+constexpr double CrustEnvelope::Y_SAMPLES[3];
+constexpr double CrustEnvelope::Z_SAMPLES[3];
+
+result_type TidalLove_individual(const SEOS& t_eos,
+                                                                    double t_pc,
+                                                                    double t_surface_pressure,
+                                                                    const std::vector<double>& t_checkpoints,
+                                                                    double t_abs_err = 1.0e-5,
+                                                                    double t_rel_err = 1.0e-5,
+                                                                    double t_init_step = 1.0e-6,
+                                                                    const CrustEnvelope* t_envelope = nullptr)
+{
+    /*
+    Input: EOS spline, central pressure, surface pressure, the checkpoint array
+    Return: mass, radius, lambda, mass in checkpoins, radius in checkpoints, moment of inertia, baryonic mass and solver work
+    With t_envelope, integration stops at its matching pressure and the envelope is interpolated from there instead
+    t_eos must have the same crust as the table of t_envelope
+    */
+    auto start = std::chrono::steady_clock::now();
+    WorkCounter work;
+    // centre is singular. Start from the series expansion at a radius where pressure has barely dropped
+    // the step is then already comparable to the scale on which the star changes
+    double Pc = t_pc*MEVFM3/TOPA;
+    double r0 = CentralRadius(t_eos, Pc);
+    state_type state = CentralSeries(t_eos, Pc, r0);
+    TOV_eq<SEOS> tov(t_eos, &work);
+
+    // envelope can only replace the integration if it records the same checkpoints and stops at the same surface
+    std::vector<double> breakpoints = t_eos.breakpoints(), checkpoints = t_checkpoints, envelope_checkpoints;
+    double matching_pressure = 0;
+    if(t_envelope)
+    {
+        matching_pressure = t_envelope->matching_pressure()*MEVFM3/TOPA;
+        for(double checkpoint : t_checkpoints)
+            if(checkpoint < t_envelope->matching_pressure() && checkpoint > t_surface_pressure)
+                envelope_checkpoints.push_back(checkpoint);
+        if(state[0] > matching_pressure && t_surface_pressure == t_envelope->surface_pressure() && 
+           envelope_checkpoints == t_envelope->checkpoints())
+        {
+            breakpoints.insert(std::lower_bound(breakpoints.begin(), breakpoints.end(), matching_pressure), matching_pressure);
+            checkpoints.erase(std::remove_if(checkpoints.begin(), checkpoints.end(), 
+                                             [&](double t_checkpoint) { return t_checkpoint < t_envelope->matching_pressure(); }), 
+                              checkpoints.end());
+        }
+        else
+            t_envelope = nullptr;
+    }
+
+    list mass, radius;
+    double R;
+    // derivatives for interpolation of checkpoints are not counted as work of the integrator
+    CheckpointState<TOV_eq<SEOS> > checkpoint_observer(TOV_eq<SEOS>(t_eos), checkpoints, mass, radius, R, t_surface_pressure);
+    state_type previous_state;
+    double previous_r = r0;
+    // observer is called once on the initial state and once after every accepted step
+    auto observer = [&](const state_type& t_state, double t_r)
+    {
+        ++work.accepted_steps;
+        checkpoint_observer(t_state, t_r);
+        previous_state = t_state;
+        previous_r = t_r;
+    };
+    // integration stops on the first state past the matching pressure
+    // state is then moved back to the matching pressure by Hermite interpolation within the step
+    struct EnvelopeReached {};
+    double matching_r = 0;
+    auto crossing = [&](state_type& t_state, double t_r, double t_breakpoint)
+    {
+        if(!t_envelope || t_breakpoint != matching_pressure)
+            return;
+        state_type start_state = previous_state;
+        double start_r = previous_r;
+        observer(t_state, t_r);
+        TOV_eq<SEOS> rate_eq(t_eos);
+        state_type rate(t_state.size()), start_rate(t_state.size());
+        rate_eq(start_state, start_rate, start_r);
+        rate_eq(t_state, rate, t_r);
+        double h = t_r - start_r;
+        double t = HermiteCrossing(h, start_state[0], t_state[0], start_rate[0], rate[0], matching_pressure);
+        for(int i = 0; i < int(t_state.size()); ++i)
+            t_state[i] = Hermite(t, h, start_state[i], t_state[i], start_rate[i], rate[i]);
+        matching_r = start_r + t*h;
+        throw EnvelopeReached();
+    };
+
+    try
+    {
+        // initial step size is for reference only. It will be adaptively changed
+        IntegrateAcrossBreakpoints(tov, state, r0, std::max(t_init_step, r0), t_abs_err, t_rel_err, breakpoints, observer, crossing);
+    }
+    catch( const std::invalid_argument& e)
+    {}
+    catch( const EnvelopeReached& e)
+    {
+        if(!t_envelope->Apply(state, matching_r, mass, radius, R))
+        {
+            // state is outside of the grid of the envelope. Integrate the envelope from the matching pressure instead
+            CheckpointState<TOV_eq<SEOS> > envelope_observer(TOV_eq<SEOS>(t_eos), envelope_checkpoints, mass, radius, R, t_surface_pressure);
+            try
+            {
+                IntegrateAcrossBreakpoints(tov, state, matching_r, previous_r - matching_r, t_abs_err, t_rel_err, t_eos.breakpoints(), 
+                                           [&](const state_type& t_state, double t_r)
+                                           {
+                                               ++work.accepted_steps;
+                                               envelope_observer(t_state, t_r);
+                                           });
+            }
+            catch( const std::invalid_argument& e)
+            {}
+            --work.accepted_steps;
+        }
+    }
+    --work.accepted_steps;
+
+
+    double r = R/TOKM;
+    double k2 = tov.GetK2(state, r);
+    double lambda = 2*k2*pow(r*TOKM*1e3, 5)/(3*G);
+    double dimlambda = lambda/pow(G, 4)/pow(state[1]*MODOT, 5)*pow(C, 10);
+
+    work.time = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return std::make_tuple(state[1], R, dimlambda, mass, radius, tov.GetMomentOfInertia(state, r), tov.GetBaryonMass(state), work);
+}
+
+result_type TidalLove_enthalpy(const EOSTable& t_table,
+                                                                  double t_pc,
+                                                                  double t_surface_pressure,
+                                                                  const std::vector<double>& t_checkpoints,
+                                                                  double t_abs_err = 1.0e-5,
+                                                                  double t_rel_err = 1.0e-5,
+                                                                  double t_init_step = 1.0e-6)
+{
+    /*
+    Same as TidalLove_individual, but integrates in pseudo-enthalpy from the centre to the surface
+    The interval is known beforehand, so integration stops at the surface and at every checkpoint exactly
+    Return: mass, radius, lambda, mass in checkpoins, radius in checkpoints, moment of inertia, baryonic mass and solver work
+    */
+    using namespace boost::numeric::odeint;
+    auto start = std::chrono::steady_clock::now();
+    WorkCounter work;
+    const SEOS& eos = t_table.spline();
+    const EnthalpyEOS& enthalpy = t_table.enthalpy();
+    double Pc = t_pc*MEVFM3/TOPA;
+    double Ec = eos(Pc);
+    double hc = enthalpy.enthalpy(eos, Pc);
+    double hs = enthalpy.enthalpy(eos, t_surface_pressure*MEVFM3/TOPA);
+
+    // centre is singular. Start slightly away from it with the leading order series
+    // r^2 = 6(hc - h)/(Ec + 3Pc), M = Ec r^3/3, y = 2
+    double h = hc - 1e-6*(hc - hs);
+    double r = sqrt(6*(hc - h)/(Ec + 3*Pc));
+    state_type state{r, Ec*r*r*r/3., 2, 0, hs, 0};
+    // dr/dh ~ 1/r near the centre. First step must not be larger than the distance to it
+    double init_step = std::min(t_init_step, hc - h);
+    TOV_enthalpy_eq<SEOS> tov(eos, enthalpy, &work);
+    auto stepper = make_controlled<error_stepper_type>(t_abs_err, t_rel_err);
+
+    // segments of EOS join at fixed values of enthalpy, so integration also restarts exactly there
+    std::vector<double> breakpoints;
+    for(auto breakpoint : eos.breakpoints())
+        breakpoints.push_back(enthalpy.enthalpy(eos, breakpoint));
+    // every interval continues with the step size suggested at the end of the previous one
+    double step = -init_step;
+    auto integrate_to = [&](double t_h)
+    {
+        while(h > t_h)
+        {
+            double dh = std::max(step, t_h - h);
+            bool shortened = dh > step;
+            if(stepper.try_step(tov, state, h, dh) == fail)
+            {
+                step = dh;
+                continue;
+            }
+            ++work.accepted_steps;
+            // a step shortened to end on the interval is accurate regardless, so its suggestion is not kept
+            if(!shortened)
+                step = dh;
+            // avoid a vanishing last step from rounding
+            if(h - t_h < 1e-12*std::abs(t_h))
+                h = t_h;
+        }
+    };
+    auto integrate = [&](double t_h)
+    {
+        for(auto hb = breakpoints.rbegin(); hb != breakpoints.rend(); ++hb)
+            if(*hb < h && *hb > t_h)
+                integrate_to(*hb);
+        integrate_to(t_h);
+    };
+
+    list mass, radius;
+    for(auto checkpoint : t_checkpoints)
+    {
+        // same as CheckpointState, checkpoints below the surface are never reached
+        if(checkpoint <= t_surface_pressure)
+            break;
+        double hcp = enthalpy.enthalpy(eos, checkpoint*MEVFM3/TOPA);
+        if(hcp < h)
+            integrate(hcp);
+        mass.push_back(state[1]);
+        radius.push_back(state[0]*TOKM);
+    }
+    if(hs < h)
+        integrate(hs);
+
+    double R = state[0];
+    // state[1] to state[3] are M, y and x, same as TOV_eq
+    double k2 = TOV_eq<SEOS>(eos).GetK2(state, R);
+    double lambda = 2*k2*pow(R*TOKM*1e3, 5)/(3*G);
+    double dimlambda = lambda/pow(G, 4)/pow(state[1]*MODOT, 5)*pow(C, 10);
+
+    work.time = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return std::make_tuple(state[1], R*TOKM, dimlambda, mass, radius, 
+                           TOV_eq<SEOS>::GetMomentOfInertia(state, R), 
+                           TOV_eq<SEOS>::GetBaryonMass(state), work);
+}
+
+double DimensionlessLambda(double t_M, double t_r, double t_y)
+{
+    // same as the end of TidalLove_individual, with radius in geometric unit
+    state_type state{0, t_M, t_y};
+    double k2 = TOV_eq<SEOS>(SEOS()).GetK2(state, t_r);
+    double lambda = 2*k2*pow(t_r*TOKM*1e3, 5)/(3*G);
+    return lambda/pow(G, 4)/pow(t_M*MODOT, 5)*pow(C, 10);
+}
+
+typedef std::tuple<double, double, double, list, list, list> sensitivity_type;
+
+sensitivity_type TidalLove_sensitivity(const EOSTable& t_table,
+                                       const std::vector<list>& t_perturbations,
+                                       double t_pc,
+                                       double t_surface_pressure,
+                                       double t_abs_err = 1.0e-5,
+                                       double t_rel_err = 1.0e-5,
+                                       double t_init_step = 1.0e-6)
+{
+    /*
+    Same star as TidalLove_individual, integrated together with its forward sensitivities
+    t_perturbations are changes of energy density (MeV/fm3) on every pressure of the table
+    Return: mass, radius, lambda and their derivatives with respect to log of central pressure followed by 
+    directional derivatives along every perturbation
+    */
+    const SEOS& eos = t_table.spline();
+    std::vector<double> pressure, energy_density;
+    for(int i = 0; i < t_table.size(); ++i)
+    {
+        pressure.push_back(t_table.pressure()[i]*MEVFM3/TOPA);
+        energy_density.push_back(t_table.energy_density()[i]*MEVFM3/TOJM3);
+    }
+    // every perturbation is rescaled to a relative change of order 1, such that tolerance of the sensitivities 
+    // is comparable to that of the star
+    int num = t_perturbations.size();
+    std::vector<SEOS> perturbations(num);
+    std::vector<double> scales(num, 1.);
+    for(int k = 0; k < num; ++k)
+    {
+        if(int(t_perturbations[k].size()) != t_table.size())
+            throw std::invalid_argument("Perturbation must have the same length as EOS table");
+        double largest = 0;
+        for(int i = 0; i < t_table.size(); ++i)
+            largest = std::max(largest, std::abs(t_perturbations[k][i]*MEVFM3/TOJM3)/energy_density[i]);
+        if(largest > 0)
+            scales[k] = 1./largest;
+        std::vector<double> perturbation;
+        for(int i = 0; i < t_table.size(); ++i)
+            perturbation.push_back(scales[k]*t_perturbations[k][i]*MEVFM3/TOJM3);
+        perturbations[k].set_points(pressure, perturbation);
+    }
+
+    state_type state(3*(num + 2), 0);
+    state[0] = log(t_pc*MEVFM3/TOPA);
+    state[2] = 2; // initial y is always 2
+    state[3] = 1; // derivative with respect to log(pc)
+    TOV_sensitivity_eq<SEOS> tov(eos, perturbations);
+
+    double log_surface = log(t_surface_pressure*MEVFM3/TOPA);
+    // initial radius cannot be 0 as it is singular there 
+    const double r_init = 1e-5;
+    double R = r_init;
+    auto observer = [&](const state_type& t_state, double t_r)
+    {
+        R = t_r;
+        if(t_state[0] < log_surface)
+            throw std::invalid_argument("Pressure is now below the surface pressure");
+    };
+    // dy/dr jumps where dE/dP of the EOS does. A perturbation that moves the crossing of a breakpoint by dr 
+    // then changes y by the jump times dr, see Hiskens and Pai, IEEE Trans. Circuits Syst. I 47, 204 (2000)
+    std::vector<double> log_breakpoints;
+    for(auto breakpoint : eos.breakpoints())
+        log_breakpoints.push_back(log(breakpoint));
+    auto crossing = [&](state_type& t_state, double t_r, double t_log_breakpoint)
+    {
+        state_type above(t_state), rate_above(t_state.size()), rate_below(t_state.size());
+        above[0] = t_log_breakpoint + 1e-12; // just inside the segment above the breakpoint
+        tov(above, rate_above, t_r);
+        tov(t_state, rate_below, t_r);
+        double jump = rate_above[2] - rate_below[2];
+        for(int i = 0; i <= num; ++i)
+        {
+            int j = 3*(i + 1);
+            t_state[j + 2] += jump*(-t_state[j]/rate_above[0]);
+        }
+    };
+    try
+    {
+        IntegrateAcrossBreakpoints(tov, state, r_init, t_init_step, t_abs_err, t_rel_err, log_breakpoints, observer, crossing);
+    }
+    catch( const std::invalid_argument& e)
+    {}
+
+    double M = state[1], y = state[2];
+    double lambda = DimensionlessLambda(M, R, y);
+    // partial derivatives of lambda on M, R and y by central difference
+    const double eps = 1e-6;
+    double dlambda_dM = (DimensionlessLambda(M*(1 + eps), R, y) - DimensionlessLambda(M*(1 - eps), R, y))/(2*eps*M);
+    double dlambda_dR = (DimensionlessLambda(M, R*(1 + eps), y) - DimensionlessLambda(M, R*(1 - eps), y))/(2*eps*R);
+    double dlambda_dy = (DimensionlessLambda(M, R, y*(1 + eps)) - DimensionlessLambda(M, R, y*(1 - eps)))/(2*eps*y);
+
+    // surface moves with the perturbation such that pressure stays at the surface pressure
+    state_type rate(state.size());
+    tov(state, rate, R);
+    list dmass, dradius, dlambda;
+    for(int i = 0; i <= num; ++i)
+    {
+        int j = 3*(i + 1);
+        double scale = (i == 0)? 1 : scales[i - 1];
+        double dR = -state[j]/rate[0];
+        double dM = state[j + 1] + rate[1]*dR;
+        double dy = state[j + 2] + rate[2]*dR;
+        dmass.push_back(dM/scale);
+        dradius.push_back(dR*TOKM/scale);
+        dlambda.push_back((dlambda_dM*dM + dlambda_dR*dR + dlambda_dy*dy)/scale);
+    }
+
+    return std::make_tuple(M, R*TOKM, lambda, dmass, dradius, dlambda);
+}
+
+std::tuple<list, list, list, list> TidalLove_analysis(const std::string& t_EOS_filename,
+                                                double t_pc)
+{
+    state_type state{t_pc*MEVFM3/TOPA, 0, 2, 0, 0, 0}; // initial y is always 2
+    auto eos = EOSFromFile(t_EOS_filename);
+    TOV_eq<SEOS> tov(eos);
+
+    list mass, radius, pressure, y;
+    CheckpointSaveAll observer(mass, radius, pressure, y);
+    try
+    {
+        using namespace boost::numeric::odeint;
+        integrate_adaptive( make_controlled<error_stepper_type>( 1.0e-10 , 1.0e-7 ) , 
+                            tov , 
+                            state , 
+                            1e-5 ,    // initial radius (cannot be 0 as it is singular there 
+                            200.0 ,   // final radius (anything that is ridicuously large will work. This will break when surface is reached
+                            0.00001,  // initial step size (for reference only. It will be adaptively changed
+                            observer );
+    }
+    catch( const std::invalid_argument& e)
+    {}
+
+    return std::make_tuple(mass, radius, pressure, y);
+}
+
+typedef std::tuple<list, list, list, list, list> profile_type;
+
+profile_type TidalLove_profile(const SEOS& t_eos,
+                               double t_pc,
+                               double t_surface_pressure,
+                               double t_abs_err = 1.0e-5,
+                               double t_rel_err = 1.0e-5,
+                               double t_init_step = 1.0e-6)
+{
+    /*
+    Input: EOS spline, central pressure and surface pressure
+    Return: radius (km), pressure and energy density (MeV/fm3), mass and y at the centre and after every accepted step
+    Integration is the same as TidalLove_individual, so the last point is where pressure falls below the surface
+    */
+    double Pc = t_pc*MEVFM3/TOPA;
+    double r0 = CentralRadius(t_eos, Pc);
+    state_type state = CentralSeries(t_eos, Pc, r0);
+    TOV_eq<SEOS> tov(t_eos);
+
+    list radius{0}, pressure{t_pc}, energy_density{t_eos(Pc)*TOJM3/MEVFM3}, mass{0}, y{2};
+    auto observer = [&](const state_type& t_state, double t_r)
+    {
+        double P = t_state[0]/MEVFM3*TOPA;
+        radius.push_back(t_r*TOKM);
+        pressure.push_back(P);
+        energy_density.push_back(t_eos(t_state[0])*TOJM3/MEVFM3);
+        mass.push_back(t_state[1]);
+        y.push_back(t_state[2]);
+        if(P < t_surface_pressure)
+            throw std::invalid_argument("Pressure is now negative");
+    };
+
+    try
+    {
+        IntegrateAcrossBreakpoints(tov, state, r0, std::max(t_init_step, r0), t_abs_err, t_rel_err, t_eos.breakpoints(), observer);
+    }
+    catch( const std::invalid_argument& e)
+    {}
+
+    return std::make_tuple(radius, pressure, energy_density, mass, y);
+}
+
+template<class Function>
+double BrentRoot(Function t_f, double t_a, double t_b, double t_fa, double t_fb, double t_xtol, int t_max_iter = 100)
+{
+    /*
+    Root of t_f between t_a and t_b by Brent's method. t_fa and t_fb are t_f at the ends and must differ in sign
+    Bracket is narrowed until it is shorter than about t_xtol
+    */
+    double a = t_a, b = t_b, c = t_b, fa = t_fa, fb = t_fb, fc = t_fb;
+    double d = b - a, e = d;
+    for(int i = 0; i < t_max_iter; ++i)
+    {
+        if((fb > 0) == (fc > 0))
+        {
+            c = a;
+            fc = fa;
+            d = e = b - a;
+        }
+        if(std::fabs(fc) < std::fabs(fb))
+        {
+            a = b; b = c; c = a;
+            fa = fb; fb = fc; fc = fa;
+        }
+        double tol = 2*std::numeric_limits<double>::epsilon()*std::fabs(b) + 0.5*t_xtol;
+        double m = 0.5*(c - b);
+        if(std::fabs(m) <= tol || fb == 0)
+            return b;
+        if(std::fabs(e) >= tol && std::fabs(fa) > std::fabs(fb))
+        {
+            // inverse quadratic interpolation, or secant if only two distinct points are known
+            double s = fb/fa, p, q;
+            if(a == c)
+            {
+                p = 2*m*s;
+                q = 1 - s;
+            }
+            else
+            {
+                double qa = fa/fc, r = fb/fc;
+                p = s*(2*m*qa*(qa - r) - (b - a)*(r - 1));
+                q = (qa - 1)*(r - 1)*(s - 1);
+            }
+            if(p > 0)
+                q = -q;
+            p = std::fabs(p);
+            if(2*p < std::min(3*m*q - std::fabs(tol*q), std::fabs(e*q)))
+            {
+                e = d;
+                d = p/q;
+            }
+            else
+                d = e = m;
+        }
+        else
+            d = e = m;
+        a = b;
+        fa = fb;
+        b += (std::fabs(d) > tol)? d : (m > 0? tol : -tol);
+        fb = t_f(b);
+    }
+    return b;
+}
+
+template<class Function>
+double BrentMinimize(Function t_f, double t_a, double t_b, double t_xtol, int t_max_iter = 100)
+{
+    /*
+    Minimum of t_f between t_a and t_b by Brent's method, i.e. golden section search with parabolic steps
+    Same stopping criterion as scipy.optimize.minimize_scalar(method='bounded') with xatol = t_xtol
+    */
+    const double golden = 0.5*(3 - std::sqrt(5.));
+    double a = t_a, b = t_b;
+    double x = a + golden*(b - a), w = x, v = x;
+    double fx = t_f(x), fw = fx, fv = fx;
+    double d = 0, e = 0;
+    for(int i = 0; i < t_max_iter; ++i)
+    {
+        double xm = 0.5*(a + b);
+        double tol1 = std::sqrt(std::numeric_limits<double>::epsilon())*std::fabs(x) + t_xtol/3;
+        double tol2 = 2*tol1;
+        if(std::fabs(x - xm) <= tol2 - 0.5*(b - a))
+            break;
+        bool golden_step = true;
+        if(std::fabs(e) > tol1)
+        {
+            // parabola through x, w and v
+            double r = (x - w)*(fx - fv);
+            double q = (x - v)*(fx - fw);
+            double p = (x - v)*q - (x - w)*r;
+            q = 2*(q - r);
+            if(q > 0)
+                p = -p;
+            else
+                q = -q;
+            if(std::fabs(p) < std::fabs(0.5*q*e) && p > q*(a - x) && p < q*(b - x))
+            {
+                e = d;
+                d = p/q;
+                if(x + d - a < tol2 || b - x - d < tol2)
+                    d = (xm >= x)? tol1 : -tol1;
+                golden_step = false;
+            }
+        }
+        if(golden_step)
+        {
+            e = (x >= xm)? a - x : b - x;
+            d = golden*e;
+        }
+        double u = x + ((std::fabs(d) >= tol1)? d : (d > 0? tol1 : -tol1));
+        double fu = t_f(u);
+        if(fu <= fx)
+        {
+            if(u >= x)
+                a = x;
+            else
+                b = x;
+            v = w; fv = fw;
+            w = x; fw = fx;
+            x = u; fx = fu;
+        }
+        else
+        {
+            if(u < x)
+                a = u;
+            else
+                b = u;
+            if(fu <= fw || w == x)
+            {
+                v = w; fv = fw;
+                w = u; fw = fu;
+            }
+            else if(fu <= fv || v == x || v == w)
+            {
+                v = u; fv = fu;
+            }
+        }
+    }
+    return x;
+}
+
+// kinds of jobs of TidalLove_batch
+const int JOB_CENTRAL_PRESSURE = 0;
+const int JOB_MASS = 1;
+const int JOB_MAX_MASS = 2;
+
+struct BatchSettings
+{
+    /*
+    Integrator tolerances (abs_err, rel_err, init_step) and root search settings of TidalLove_batch
+    Defaults of the root searches are those of TidalLoveWrapper.FindMassFamily
+    */
+    double surface_pressure = 1e-8;
+    std::vector<double> tolerance{1e-5, 1e-5, 1e-5};
+    std::vector<double> probe_tolerance{1e-4, 1e-4, 1e-5};
+    double pc_min = 1.;
+    int num_grid = 20;
+    double rtol = 1e-6;     // on log(pc) of target masses
+    double mass_tol = 1e-4; // on maximum mass (solar mass)
+};
+
+struct BatchResult
+{
+    /*
+    Result of one job and the central pressure (MeV/fm3) it was solved at
+    Work sums all integrations of the EOS since its previous result, successful or not
+    */
+    result_type result;
+    double pc;
+    int integrations;
+    double search_time; // wall time in seconds
+};
+
+class MassFamilySearch
+{
+    /*
+    Root searches on one EOS that share probes of M(pc), same as TidalLoveWrapper.FindMassFamily
+    M(pc) is tabulated on a log grid up to 0.95 of the last tabulated pressure when the first maximum or target mass is requested
+    Probes use the probe tolerance and no checkpoints. Solutions are integrated again with the production tolerance
+    */
+public:
+    MassFamilySearch(const EOSTable& t_table, const std::vector<double>& t_checkpoints, const BatchSettings& t_settings) 
+        : table_(t_table), checkpoints_(t_checkpoints), settings_(t_settings), 
+          pc_limit_(t_table.size() > 0? 0.95*t_table.pressure().back() : 0), 
+          start_(std::chrono::steady_clock::now()) {};
+
+    BatchResult Solve(int t_kind, double t_value)
+    {
+        double pc = std::numeric_limits<double>::quiet_NaN();
+        if(t_kind == JOB_CENTRAL_PRESSURE)
+            pc = t_value;
+        else if(t_kind == JOB_MASS)
+            pc = MassPressure(t_value);
+        else if(t_kind == JOB_MAX_MASS)
+            pc = MaxMassPressure();
+        return Final(pc);
+    }
+
+private:
+    result_type Integrate(double t_pc, bool t_probe)
+    {
+        const auto& tolerance = t_probe? settings_.probe_tolerance : settings_.tolerance;
+        auto result = TidalLove_individual(table_.spline(), t_pc, settings_.surface_pressure, t_probe? std::vector<double>() : checkpoints_, 
+                                           tolerance[0], tolerance[1], tolerance[2]);
+        const auto& work = std::get<7>(result);
+        work_.rhs_evaluations += work.rhs_evaluations;
+        work_.accepted_steps += work.accepted_steps;
+        work_.time += work.time;
+        ++integrations_;
+        return result;
+    }
+
+    double ProbeMass(double t_pc)
+    {
+        // integrations beyond valid range of EOS are stored as nan
+        if(!(t_pc > 0))
+            return std::numeric_limits<double>::quiet_NaN();
+        auto probe = probes_.find(t_pc);
+        if(probe != probes_.end())
+            return probe->second;
+        double mass = std::get<0>(Integrate(t_pc, true));
+        if(!(mass > 0))
+            mass = std::numeric_limits<double>::quiet_NaN();
+        probes_[t_pc] = mass;
+        return mass;
+    }
+
+    static int NanArgmax(const std::vector<double>& t_values)
+    {
+        // -1 if all values are nan
+        int index = -1;
+        for(int i = 0; i < int(t_values.size()); ++i)
+            if(!std::isnan(t_values[i]) && (index < 0 || t_values[i] > t_values[index]))
+                index = i;
+        return index;
+    }
+
+    double MaxMassPressure()
+    {
+        /*
+        Central pressure of the maximum mass, same as TidalLoveWrapper._MaxMassSearch on the grid of FindMassFamily
+        Also prepares the stable branch for MassPressure. nan if none of the grid points forms a NS
+        */
+        if(searched_)
+            return pc_mmax_;
+        searched_ = true;
+        if(!(pc_limit_ > 0))
+            return pc_mmax_;
+        double lower = std::log10(std::min(settings_.pc_min, 0.5*pc_limit_)), upper = std::log10(pc_limit_);
+        std::vector<double> grid, masses;
+        for(int i = 0; i < settings_.num_grid; ++i)
+        {
+            grid.push_back(std::pow(10., lower + (upper - lower)*i/(settings_.num_grid - 1)));
+            masses.push_back(ProbeMass(grid.back()));
+        }
+        int idx_max = NanArgmax(masses);
+        if(idx_max < 0)
+            return pc_mmax_;
+        // mass still increases at the lowest pressure. Extend the grid downward until the maximum is bracketed
+        while(idx_max == 0 && grid[0] > 1e-3)
+        {
+            grid.insert(grid.begin(), 0.5*grid[0]);
+            masses.insert(masses.begin(), ProbeMass(grid[0]));
+            idx_max = NanArgmax(masses);
+        }
+
+        if(idx_max == 0 || idx_max == int(grid.size()) - 1)
+            // maximum lies on the edge of valid range of EOS
+            pc_mmax_ = grid[idx_max];
+        else
+        {
+            // tolerance on log(pc) from the curvature of a parabola through the bracket, as M ~ Mmax - 0.5*|M''|dx^2
+            double x0 = std::log(grid[idx_max - 1]), x1 = std::log(grid[idx_max]), x2 = std::log(grid[idx_max + 1]);
+            double m0 = masses[idx_max - 1], m1 = masses[idx_max], m2 = masses[idx_max + 1];
+            double curvature = 2*((m2 - m1)/(x2 - x1) - (m1 - m0)/(x1 - x0))/(x2 - x0);
+            double xatol = (curvature < 0)? std::sqrt(2*settings_.mass_tol/std::fabs(curvature)) : 1e-3;
+            xatol = std::min(std::max(xatol, 1e-6), 0.1);
+            pc_mmax_ = std::exp(BrentMinimize([this](double x) { return -ProbeMass(std::exp(x)); }, x0, x2, xatol));
+            if(!(ProbeMass(pc_mmax_) > m1))
+                pc_mmax_ = grid[idx_max];
+        }
+        max_mass_ = ProbeMass(pc_mmax_);
+
+        // stable branch is where mass increases with central pressure up to the maximum
+        int idx_min = idx_max;
+        while(idx_min > 0 && masses[idx_min - 1] < masses[idx_min])
+            --idx_min;
+        for(int i = idx_min; i <= idx_max; ++i)
+            if(grid[i] < pc_mmax_)
+                branch_.push_back(grid[i]);
+        branch_.push_back(pc_mmax_);
+        branch_extendable_ = (idx_min == 0);
+        return pc_mmax_;
+    }
+
+    double MassPressure(double t_mass)
+    {
+        // central pressure of NS of mass t_mass on the stable branch, or nan if there is none
+        double nan = std::numeric_limits<double>::quiet_NaN();
+        MaxMassPressure();
+        if(!(t_mass <= max_mass_))
+            return nan;
+        // extend the branch to lower pressure if needed
+        while(ProbeMass(branch_[0]) > t_mass && branch_extendable_ && branch_[0] > 1e-3)
+        {
+            if(!(ProbeMass(0.5*branch_[0]) < ProbeMass(branch_[0])))
+                break;
+            branch_.insert(branch_.begin(), 0.5*branch_[0]);
+        }
+        int idx = 0;
+        while(idx < int(branch_.size()) && ProbeMass(branch_[idx]) < t_mass)
+            ++idx;
+        if(idx == 0 || idx == int(branch_.size()))
+            return nan;
+        double x = BrentRoot([this, t_mass](double x) { return ProbeMass(std::exp(x)) - t_mass; }, 
+                             std::log(branch_[idx - 1]), std::log(branch_[idx]), 
+                             ProbeMass(branch_[idx - 1]) - t_mass, ProbeMass(branch_[idx]) - t_mass, settings_.rtol);
+        return std::exp(x);
+    }
+
+    BatchResult Final(double t_pc)
+    {
+        // integrate converged central pressure with production tolerance
+        // solver work since the last result is assigned to this one, successful or not
+        double nan = std::numeric_limits<double>::quiet_NaN();
+        result_type result;
+        bool found = false;
+        if(!std::isnan(t_pc))
+        {
+            result = Integrate(t_pc, false);
+            found = std::get<0>(result) > 0;
+        }
+        if(!found)
+        {
+            list missing(checkpoints_.size(), nan);
+            result = std::make_tuple(nan, nan, nan, missing, missing, nan, nan, WorkCounter());
+            t_pc = nan;
+        }
+        std::get<7>(result) = work_;
+        auto now = std::chrono::steady_clock::now();
+        BatchResult batch_result{result, t_pc, integrations_, std::chrono::duration<double>(now - start_).count()};
+        work_ = WorkCounter();
+        integrations_ = 0;
+        start_ = now;
+        return batch_result;
+    }
+
+    const EOSTable& table_;
+    const std::vector<double>& checkpoints_;
+    const BatchSettings& settings_;
+    double pc_limit_;
+    std::map<double, double> probes_;
+    bool searched_ = false;
+    double pc_mmax_ = std::numeric_limits<double>::quiet_NaN();
+    double max_mass_ = std::numeric_limits<double>::quiet_NaN();
+    std::vector<double> branch_;
+    bool branch_extendable_ = false;
+    WorkCounter work_;
+    int integrations_ = 0;
+    std::chrono::steady_clock::time_point start_;
+};
+
+std::vector<BatchResult> TidalLove_batch(const std::vector<EOSTable>& t_tables,
+                                         const std::vector<std::vector<double> >& t_checkpoints,
+                                         const std::vector<int>& t_job_eos,
+                                         const std::vector<int>& t_job_kind,
+                                         const std::vector<double>& t_job_value,
+                                         const BatchSettings& t_settings)
+{
+    /*
+    Input: EOS tables, checkpoint pressures (MeV/fm3, descending) of each of them, and jobs
+    A job is the index of its EOS, its kind (JOB_CENTRAL_PRESSURE, JOB_MASS or JOB_MAX_MASS) and central pressure or target mass
+    Return: result of every job in the same order
+    Jobs of the same EOS share the probes of their root searches
+    */
+    std::vector<std::unique_ptr<MassFamilySearch> > searches(t_tables.size());
+    std::vector<BatchResult> results;
+    for(int i = 0; i < int(t_job_eos.size()); ++i)
+    {
+        int eos = t_job_eos[i];
+        if(!searches[eos])
+            searches[eos].reset(new MassFamilySearch(t_tables[eos], t_checkpoints[eos], t_settings));
+        results.push_back(searches[eos]->Solve(t_job_kind[i], t_job_value[i]));
+    }
+    return results;
+}
+
+p::tuple wrap_TidalLove_analysis(const std::string& t_EOS_filename, double t_pc)
+{
+    std::tuple<list, list, list, list> result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_analysis(t_EOS_filename, t_pc);
+    }
+    auto mass = std::get<0>(result);
+    auto radius = std::get<1>(result);
+    auto pressure = std::get<2>(result);
+    auto y = std::get<3>(result);
+    return p::make_tuple(wrap_to_ndarray(mass), wrap_to_ndarray(radius), wrap_to_ndarray(pressure), wrap_to_ndarray(y));
+}
+
+p::tuple wrap_result(const result_type& t_result)
+{
+    // convert mass and radius into python array
+    auto M = std::get<0>(t_result);
+    auto R = std::get<1>(t_result);
+    auto dimlambda = std::get<2>(t_result);
+    auto mass = std::get<3>(t_result);
+    auto radius = std::get<4>(t_result);
+    auto I = std::get<5>(t_result);
+    auto MB = std::get<6>(t_result);
+    auto work = std::get<7>(t_result);
+
+    p::dict work_dict;
+    work_dict["rhs_evaluations"] = work.rhs_evaluations;
+    work_dict["accepted_steps"] = work.accepted_steps;
+    work_dict["rejected_steps"] = work.rejected_steps();
+    work_dict["time"] = work.time;
+
+    return p::make_tuple(M, R, dimlambda, wrap_to_ndarray(mass), wrap_to_ndarray(radius), I, MB, work_dict);
+}
+
+p::tuple wrap_TidalLove_sensitivity_table(const EOSTable& t_table,
+                                          p::list const & t_perturbations,
+                                          double t_pc,
+                                          double t_surface_pressure,
+                                          double t_abs_err = 1.0e-5,
+                                          double t_rel_err = 1.0e-5,
+                                          double t_init_step = 1.0e-5)
+{
+    /*
+    Forward sensitivities of a star. t_perturbations is a list of arrays of changes of energy density on the table
+    */
+    std::vector<list> perturbations;
+    for(int i = 0; i < p::len(t_perturbations); ++i)
+        perturbations.push_back(wrap_from_ndarray(p::extract<np::ndarray>(t_perturbations[i])));
+    if(perturbations.size() > 0 && int(perturbations[0].size()) != t_table.size())
+    {
+        PyErr_SetString(PyExc_ValueError, "Perturbation must have the same length as EOS table");
+        p::throw_error_already_set();
+    }
+    sensitivity_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_sensitivity(t_table, perturbations, t_pc, t_surface_pressure, t_abs_err, t_rel_err, t_init_step);
+    }
+    return p::make_tuple(std::get<0>(result), std::get<1>(result), std::get<2>(result), 
+                         wrap_to_ndarray(std::get<3>(result)), wrap_to_ndarray(std::get<4>(result)), 
+                         wrap_to_ndarray(std::get<5>(result)));
+}
+
+p::tuple wrap_TidalLove_profile_table(const EOSTable& t_table,
+                                      double t_pc,
+                                      double t_surface_pressure,
+                                      double t_abs_err = 1.0e-5,
+                                      double t_rel_err = 1.0e-5,
+                                      double t_init_step = 1.0e-5)
+{
+    /*
+    Radial profile of a star from a single integration. Return arrays of radius, pressure, energy density, mass and y
+    */
+    profile_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_profile(t_table.spline(), t_pc, t_surface_pressure, t_abs_err, t_rel_err, t_init_step);
+    }
+    return p::make_tuple(wrap_to_ndarray(std::get<0>(result)), wrap_to_ndarray(std::get<1>(result)), 
+                         wrap_to_ndarray(std::get<2>(result)), wrap_to_ndarray(std::get<3>(result)), 
+                         wrap_to_ndarray(std::get<4>(result)));
+}
+
+p::tuple wrap_TidalLove_individual(const std::string& t_EOS_filename,
+                                   double t_pc, 
+                                   double t_max_energy,
+                                   double t_surface_pressure,
+                                   np::ndarray const & array,
+                                   double t_abs_err = 1.0e-5,
+                                   double t_rel_err = 1.0e-5,
+                                   double t_init_step = 1.0e-5)
+{
+    
+    auto checkpoint = wrap_from_ndarray(array);
+    result_type result;
+    {
+        ReleaseGIL release;
+        auto eos = EOSFromFile(t_EOS_filename, t_max_energy);
+        result = TidalLove_individual(eos, t_pc, t_surface_pressure, checkpoint, t_abs_err, t_rel_err, t_init_step);
+    }
+    return wrap_result(result);
+}
+
+p::tuple wrap_TidalLove_individual_array(np::ndarray const & t_energy_density,
+                                         np::ndarray const & t_pressure,
+                                         double t_pc, 
+                                         double t_max_energy,
+                                         double t_surface_pressure,
+                                         np::ndarray const & array,
+                                         double t_abs_err = 1.0e-5,
+                                         double t_rel_err = 1.0e-5,
+                                         double t_init_step = 1.0e-5)
+{
+    /*
+    Same as tidallove_individual, but EOS table is read from numpy array instead of a file
+    */
+    int size = t_energy_density.shape(0);
+    if (t_pressure.shape(0) != size)
+    {
+        PyErr_SetString(PyExc_ValueError, "Energy density and pressure must have the same length");
+        p::throw_error_already_set();
+    }
+    auto checkpoint = wrap_from_ndarray(array);
+    auto eos = EOSFromArray(wrap_view_ndarray(t_energy_density), wrap_view_ndarray(t_pressure), size, t_max_energy);
+    result_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_individual(eos, t_pc, t_surface_pressure, checkpoint, t_abs_err, t_rel_err, t_init_step);
+    }
+    return wrap_result(result);
+}
+ 
+boost::shared_ptr<EOSTable> wrap_make_EOSTable(np::ndarray const & t_energy_density,
+                                               np::ndarray const & t_pressure,
+                                               double t_max_energy)
+{
+    int size = t_energy_density.shape(0);
+    if (t_pressure.shape(0) != size)
+    {
+        PyErr_SetString(PyExc_ValueError, "Energy density and pressure must have the same length");
+        p::throw_error_already_set();
+    }
+    return boost::shared_ptr<EOSTable>(new EOSTable(wrap_view_ndarray(t_energy_density), wrap_view_ndarray(t_pressure), size, t_max_energy));
+}
+
+boost::shared_ptr<EOSTable> wrap_make_EOSTable_breakpoints(np::ndarray const & t_energy_density,
+                                                           np::ndarray const & t_pressure,
+                                                           double t_max_energy,
+                                                           np::ndarray const & t_breakpoints)
+{
+    /*
+    Same as wrap_make_EOSTable, with pressures (MeV/fm3) where segments of the EOS join
+    */
+    int size = t_energy_density.shape(0);
+    if (t_pressure.shape(0) != size)
+    {
+        PyErr_SetString(PyExc_ValueError, "Energy density and pressure must have the same length");
+        p::throw_error_already_set();
+    }
+    return boost::shared_ptr<EOSTable>(new EOSTable(wrap_view_ndarray(t_energy_density), wrap_view_ndarray(t_pressure), size, t_max_energy, 
+                                                    wrap_from_ndarray(t_breakpoints)));
+}
+
+np::ndarray wrap_EOSTable_energy_density(const EOSTable& t_table)
+{
+    return wrap_to_ndarray(t_table.energy_density());
+}
+
+np::ndarray wrap_EOSTable_pressure(const EOSTable& t_table)
+{
+    return wrap_to_ndarray(t_table.pressure());
+}
+
+np::ndarray wrap_EOSTable_breakpoints(const EOSTable& t_table)
+{
+    return wrap_to_ndarray(t_table.breakpoints());
+}
+
+struct EOSTable_pickle_suite : p::pickle_suite
+{
+    // table is already filtered, so no need to supply max energy again
+    static p::tuple getinitargs(const EOSTable& t_table)
+    {
+        return p::make_tuple(wrap_EOSTable_energy_density(t_table), 
+                             wrap_EOSTable_pressure(t_table), 
+                             std::numeric_limits<double>::infinity(),
+                             wrap_to_ndarray(t_table.breakpoints()));
+    }
+};
+
+p::tuple wrap_TidalLove_individual_table(const EOSTable& t_table,
+                                         double t_pc, 
+                                         double t_surface_pressure,
+                                         np::ndarray const & array,
+                                         double t_abs_err = 1.0e-5,
+                                         double t_rel_err = 1.0e-5,
+                                         double t_init_step = 1.0e-5)
+{
+    /*
+    Same as tidallove_individual, but with EOS spline that has been prepared beforehand
+    */
+    auto checkpoint = wrap_from_ndarray(array);
+    result_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_individual(t_table.spline(), t_pc, t_surface_pressure, checkpoint, t_abs_err, t_rel_err, t_init_step);
+    }
+    return wrap_result(result);
+}
+
+p::tuple wrap_TidalLove_envelope_table(const EOSTable& t_table,
+                                       const CrustEnvelope& t_envelope,
+                                       double t_pc, 
+                                       double t_surface_pressure,
+                                       np::ndarray const & array,
+                                       double t_abs_err = 1.0e-5,
+                                       double t_rel_err = 1.0e-5,
+                                       double t_init_step = 1.0e-5)
+{
+    /*
+    Same as tidallove_individual_table, but the envelope below the matching pressure is interpolated from t_envelope
+    */
+    auto checkpoint = wrap_from_ndarray(array);
+    result_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_individual(t_table.spline(), t_pc, t_surface_pressure, checkpoint, t_abs_err, t_rel_err, t_init_step, &t_envelope);
+    }
+    return wrap_result(result);
+}
+
+boost::shared_ptr<CrustEnvelope> wrap_make_CrustEnvelope(const EOSTable& t_table,
+                                                         double t_matching_pressure,
+                                                         double t_surface_pressure,
+                                                         np::ndarray const & t_checkpoints,
+                                                         double t_abs_err,
+                                                         double t_rel_err,
+                                                         int t_num_mass,
+                                                         int t_num_compactness)
+{
+    /*
+    Envelope below t_matching_pressure (MeV/fm3) of stars built on the crust of t_table
+    */
+    if(t_num_mass < 4 || t_num_compactness < 4)
+    {
+        PyErr_SetString(PyExc_ValueError, "Envelope needs at least 4 nodes in mass and compactness");
+        p::throw_error_already_set();
+    }
+    auto checkpoints = wrap_from_ndarray(t_checkpoints);
+    std::sort(checkpoints.begin(), checkpoints.end(), std::greater<double>());
+    ReleaseGIL release;
+    return boost::shared_ptr<CrustEnvelope>(new CrustEnvelope(t_table, t_matching_pressure, t_surface_pressure, checkpoints, 
+                                                              t_abs_err, t_rel_err, t_num_mass, t_num_compactness));
+}
+
+np::ndarray wrap_CrustEnvelope_checkpoints(const CrustEnvelope& t_envelope)
+{
+    return wrap_to_ndarray(t_envelope.checkpoints());
+}
+
+p::tuple wrap_TidalLove_enthalpy_table(const EOSTable& t_table,
+                                       double t_pc, 
+                                       double t_surface_pressure,
+                                       np::ndarray const & array,
+                                       double t_abs_err = 1.0e-5,
+                                       double t_rel_err = 1.0e-5,
+                                       double t_init_step = 1.0e-5)
+{
+    /*
+    Same as tidallove_individual_table, but integrates in pseudo-enthalpy instead of radius
+    */
+    auto checkpoint = wrap_from_ndarray(array);
+    result_type result;
+    {
+        ReleaseGIL release;
+        result = TidalLove_enthalpy(t_table, t_pc, t_surface_pressure, checkpoint, t_abs_err, t_rel_err, t_init_step);
+    }
+    return wrap_result(result);
 }
  
-BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_individual_overloads, wrap_TidalLove_individual, 3, 6)
+std::vector<int> wrap_offsets(np::ndarray const & t_offsets, int t_num_eos, int t_size, const char* t_message)
+{
+    // offsets of every EOS into a flat buffer of length t_size. Entry i and i + 1 enclose EOS i
+    auto offsets = wrap_from_index_ndarray(t_offsets);
+    bool valid = int(offsets.size()) == t_num_eos + 1 && offsets.front() == 0 && offsets.back() == t_size;
+    for(int i = 0; valid && i < t_num_eos; ++i)
+        valid = offsets[i] <= offsets[i + 1];
+    if(!valid)
+    {
+        PyErr_SetString(PyExc_ValueError, t_message);
+        p::throw_error_already_set();
+    }
+    return std::vector<int>(offsets.begin(), offsets.end());
+}
+
+std::vector<double> wrap_tolerance(p::tuple const & t_tolerance)
+{
+    // (abs_err, rel_err, init_step) of the integrator
+    if(p::len(t_tolerance) != 3)
+    {
+        PyErr_SetString(PyExc_ValueError, "Tolerance must be (abs_err, rel_err, init_step)");
+        p::throw_error_already_set();
+    }
+    return {p::extract<double>(t_tolerance[0]), p::extract<double>(t_tolerance[1]), p::extract<double>(t_tolerance[2])};
+}
+
+p::dict wrap_TidalLove_batch(np::ndarray const & t_offsets,
+                             np::ndarray const & t_energy_density,
+                             np::ndarray const & t_pressure,
+                             np::ndarray const & t_breakpoint_offsets,
+                             np::ndarray const & t_breakpoints,
+                             np::ndarray const & t_checkpoint_offsets,
+                             np::ndarray const & t_checkpoints,
+                             np::ndarray const & t_job_eos,
+                             np::ndarray const & t_job_kind,
+                             np::ndarray const & t_job_value,
+                             double t_surface_pressure,
+                             p::tuple const & t_tolerance,
+                             p::tuple const & t_probe_tolerance)
+{
+    /*
+    Solve jobs of many EOS in one call
+    EOS tables are ragged: EOS i is energy_density and pressure (MeV/fm3) between offsets[i] and offsets[i + 1],
+    likewise for its breakpoints (MeV/fm3) and its checkpoints (MeV/fm3, descending)
+    Tables must already be cut at the maximum valid energy density, as EOSTable.energy_density and EOSTable.pressure are
+    Offsets, and EOS index and kind of jobs are int64 arrays, all others are float64
+    Jobs are given by the EOS index, kind (0 for central pressure, 1 for target mass, 2 for maximum mass) and value 
+    (central pressure in MeV/fm3 or target mass in solar mass, ignored for maximum mass)
+    Return dict of arrays, one entry per job. Checkpoints of job i are between checkpoint_offsets[i] and [i + 1]
+    Offsets and counts of work are int64
+    */
+    int size = t_energy_density.shape(0);
+    if(t_pressure.shape(0) != size)
+    {
+        PyErr_SetString(PyExc_ValueError, "Energy density and pressure must have the same length");
+        p::throw_error_already_set();
+    }
+    int num_eos = int(t_offsets.shape(0)) - 1;
+    auto offsets = wrap_offsets(t_offsets, num_eos, size, "Offsets of EOS tables do not match their buffers");
+    auto breakpoints = wrap_from_ndarray(t_breakpoints);
+    auto breakpoint_offsets = wrap_offsets(t_breakpoint_offsets, num_eos, breakpoints.size(), 
+                                           "Offsets of breakpoints do not match the number of EOS or their buffer");
+    auto flat_checkpoints = wrap_from_ndarray(t_checkpoints);
+    auto checkpoint_offsets = wrap_offsets(t_checkpoint_offsets, num_eos, flat_checkpoints.size(), 
+                                           "Offsets of checkpoints do not match the number of EOS or their buffer");
+
+    auto job_eos_index = wrap_from_index_ndarray(t_job_eos);
+    auto job_kind_index = wrap_from_index_ndarray(t_job_kind);
+    auto job_value = wrap_from_ndarray(t_job_value);
+    if(job_kind_index.size() != job_eos_index.size() || job_value.size() != job_eos_index.size())
+    {
+        PyErr_SetString(PyExc_ValueError, "EOS index, kind and value of jobs must have the same length");
+        p::throw_error_already_set();
+    }
+    for(int i = 0; i < int(job_eos_index.size()); ++i)
+    {
+        if(job_eos_index[i] < 0 || job_eos_index[i] >= num_eos)
+        {
+            PyErr_SetString(PyExc_ValueError, "EOS index of job is out of range");
+            p::throw_error_already_set();
+        }
+        if(job_kind_index[i] < JOB_CENTRAL_PRESSURE || job_kind_index[i] > JOB_MAX_MASS)
+        {
+            PyErr_SetString(PyExc_ValueError, "Kind of job can only be 0 (central pressure), 1 (mass) or 2 (maximum mass)");
+            p::throw_error_already_set();
+        }
+    }
+    std::vector<int> job_eos(job_eos_index.begin(), job_eos_index.end()), job_kind(job_kind_index.begin(), job_kind_index.end());
+
+    BatchSettings settings;
+    settings.surface_pressure = t_surface_pressure;
+    settings.tolerance = wrap_tolerance(t_tolerance);
+    settings.probe_tolerance = wrap_tolerance(t_probe_tolerance);
+
+    const double* energy_density = wrap_view_ndarray(t_energy_density);
+    const double* pressure = wrap_view_ndarray(t_pressure);
+    std::vector<BatchResult> results;
+    {
+        ReleaseGIL release;
+        std::vector<EOSTable> tables;
+        std::vector<std::vector<double> > checkpoints;
+        for(int i = 0; i < num_eos; ++i)
+        {
+            tables.emplace_back(energy_density + offsets[i], pressure + offsets[i], offsets[i + 1] - offsets[i], 
+                                std::numeric_limits<double>::infinity(),
+                                std::vector<double>(breakpoints.begin() + breakpoint_offsets[i], breakpoints.begin() + breakpoint_offsets[i + 1]));
+            checkpoints.emplace_back(flat_checkpoints.begin() + checkpoint_offsets[i], flat_checkpoints.begin() + checkpoint_offsets[i + 1]);
+        }
+        results = TidalLove_batch(tables, checkpoints, job_eos, job_kind, job_value, settings);
+    }
+
+    list mass, radius, dimlambda, pc, I, MB, cp_mass, cp_radius, time, search_time;
+    std::vector<int64_t> result_offsets{0}, integrations, rhs_evaluations, accepted_steps, rejected_steps;
+    for(const auto& batch_result : results)
+    {
+        const auto& result = batch_result.result;
+        mass.push_back(std::get<0>(result));
+        radius.push_back(std::get<1>(result));
+        dimlambda.push_back(std::get<2>(result));
+        pc.push_back(batch_result.pc);
+        I.push_back(std::get<5>(result));
+        MB.push_back(std::get<6>(result));
+        cp_mass.insert(cp_mass.end(), std::get<3>(result).begin(), std::get<3>(result).end());
+        cp_radius.insert(cp_radius.end(), std::get<4>(result).begin(), std::get<4>(result).end());
+        result_offsets.push_back(cp_mass.size());
+        const auto& work = std::get<7>(result);
+        integrations.push_back(batch_result.integrations);
+        rhs_evaluations.push_back(work.rhs_evaluations);
+        accepted_steps.push_back(work.accepted_steps);
+        rejected_steps.push_back(work.rejected_steps());
+        time.push_back(work.time);
+        search_time.push_back(batch_result.search_time);
+    }
+
+    p::dict ans;
+    ans["mass"] = wrap_to_ndarray(mass);
+    ans["radius"] = wrap_to_ndarray(radius);
+    ans["lambda"] = wrap_to_ndarray(dimlambda);
+    ans["pc"] = wrap_to_ndarray(pc);
+    ans["moment_of_inertia"] = wrap_to_ndarray(I);
+    ans["baryon_mass"] = wrap_to_ndarray(MB);
+    ans["checkpoint_offsets"] = wrap_to_index_ndarray(result_offsets);
+    ans["checkpoint_mass"] = wrap_to_ndarray(cp_mass);
+    ans["checkpoint_radius"] = wrap_to_ndarray(cp_radius);
+    ans["integrations"] = wrap_to_index_ndarray(integrations);
+    ans["rhs_evaluations"] = wrap_to_index_ndarray(rhs_evaluations);
+    ans["accepted_steps"] = wrap_to_index_ndarray(accepted_steps);
+    ans["rejected_steps"] = wrap_to_index_ndarray(rejected_steps);
+    ans["time"] = wrap_to_ndarray(time);
+    ans["search_time"] = wrap_to_ndarray(search_time);
+    return ans;
+}
+ 
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_individual_overloads, wrap_TidalLove_individual, 5, 8)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_individual_array_overloads, wrap_TidalLove_individual_array, 6, 9)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_individual_table_overloads, wrap_TidalLove_individual_table, 4, 7)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_enthalpy_table_overloads, wrap_TidalLove_enthalpy_table, 4, 7)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_envelope_table_overloads, wrap_TidalLove_envelope_table, 5, 8)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_sensitivity_table_overloads, wrap_TidalLove_sensitivity_table, 4, 7)
+BOOST_PYTHON_FUNCTION_OVERLOADS(wrap_TidalLove_profile_table_overloads, wrap_TidalLove_profile_table, 3, 6)
 
 BOOST_PYTHON_MODULE(TidalLove_CPP)
 {
     np::initialize(); // have to put this in any module that uses Boost.NumPy
     p::def("tidallove_individual", wrap_TidalLove_individual, wrap_TidalLove_individual_overloads());
+    p::def("tidallove_individual_array", wrap_TidalLove_individual_array, wrap_TidalLove_individual_array_overloads());
+    p::def("tidallove_individual_table", wrap_TidalLove_individual_table, wrap_TidalLove_individual_table_overloads());
+    p::def("tidallove_enthalpy_table", wrap_TidalLove_enthalpy_table, wrap_TidalLove_enthalpy_table_overloads());
+    p::def("tidallove_envelope_table", wrap_TidalLove_envelope_table, wrap_TidalLove_envelope_table_overloads());
+    p::def("tidallove_sensitivity_table", wrap_TidalLove_sensitivity_table, wrap_TidalLove_sensitivity_table_overloads());
+    p::def("tidallove_profile_table", wrap_TidalLove_profile_table, wrap_TidalLove_profile_table_overloads());
+    p::def("tidallove_batch", wrap_TidalLove_batch);
+
+    p::class_<EOSTable, boost::shared_ptr<EOSTable> >("EOSTable", p::no_init)
+        .def("__init__", p::make_constructor(&wrap_make_EOSTable))
+        .def("__init__", p::make_constructor(&wrap_make_EOSTable_breakpoints))
+        .def("__len__", &EOSTable::size)
+        .add_property("energy_density", &wrap_EOSTable_energy_density)
+        .add_property("pressure", &wrap_EOSTable_pressure)
+        .add_property("breakpoints", &wrap_EOSTable_breakpoints)
+        .def_pickle(EOSTable_pickle_suite());
+    p::class_<CrustEnvelope, boost::shared_ptr<CrustEnvelope>, boost::noncopyable>("CrustEnvelope", p::no_init)
+        .def("__init__", p::make_constructor(&wrap_make_CrustEnvelope))
+        .add_property("matching_pressure", &CrustEnvelope::matching_pressure)
+        .add_property("surface_pressure", &CrustEnvelope::surface_pressure)
+        .add_property("checkpoints", &wrap_CrustEnvelope_checkpoints);
     p::def("tidallove_analysis", wrap_TidalLove_analysis);
 }                                         
 
@@ -0,0 +1,357 @@
+import numpy as np
+import time
+from scipy.interpolate import CubicSpline
+
+"""
+Pure numpy counterpart of TidalLove_CPP.cxx
+Solves the same TOV + tidal y(r) equations (PhysRevC.87.015806) with Cash-Karp RK45
+Many stars are advanced together as array lanes, each lane has its own step size and EOS
+Lanes are masked out once they reach the surface
+"""
+
+MEVFM3 = 1.60217646e32    # in J/m3 --> a converter from (MeV/fm3)
+TOPA = 4.4173085e36       # Pressure units in Pascal
+TOKM = 1.47671618         # Kilometers
+TOJM3 = 4.4173085e36      # Joules/m3
+G = 6.67408e-11           # gravitational constant
+MODOT = 1.989e30          # Mass of sun in kg
+C = 299792458.            # speed of light in m/s
+
+# Cash-Karp tableau
+CK_A = [[],
+        [1/5.],
+        [3/40., 9/40.],
+        [3/10., -9/10., 6/5.],
+        [-11/54., 5/2., -70/27., 35/27.],
+        [1631/55296., 175/512., 575/13824., 44275/110592., 253/4096.]]
+CK_C = [0.2, 0.3, 0.6, 1., 7/8.]
+CK_B = [37/378., 0., 250/621., 125/594., 0., 512/1771.]
+CK_BERR = [37/378. - 2825/27648., 0., 250/621. - 18575/48384., 125/594. - 13525/55296., -277/14336., 512/1771. - 1/4.]
+
+
+class EOSTable:
+
+    def __init__(self, energy_density, pressure, max_energy=np.inf):
+        """
+        Unit converted and monotonicity filtered EOS, same as EOSTable in the native extension
+        energy_density and pressure are in MeV/fm3
+        """
+        energy_density = np.asarray(energy_density, dtype=np.float64)
+        pressure = np.asarray(pressure, dtype=np.float64)
+        valid = ~(np.isnan(energy_density) | np.isnan(pressure)) & (energy_density <= max_energy)
+        energy_density = energy_density[valid]
+        pressure = pressure[valid]
+        # make sure that pressure is increasing
+        increasing = pressure > np.maximum.accumulate(np.concatenate([[-np.inf], pressure[:-1]]))
+        self.energy_density = energy_density[increasing]
+        self.pressure = pressure[increasing]
+
+        # natural cubic spline of energy density as a function of pressure in geometric unit
+        # f(x) = a*(x-x_i)^3 + b*(x-x_i)^2 + c*(x-x_i) + y_i
+        self.x = self.pressure*MEVFM3/TOPA
+        self.y = self.energy_density*MEVFM3/TOJM3
+        spl = CubicSpline(self.x, self.y, bc_type='natural')
+        self.a, self.b, self.c = spl.c[0], spl.c[1], spl.c[2]
+        # slope at the last point for linear extrapolation
+        h = self.x[-1] - self.x[-2]
+        self.c_end = self.c[-1] + h*(2*self.b[-1] + 3*self.a[-1]*h)
+
+    def __len__(self):
+        return self.x.shape[0]
+
+
+class EOSTableSet:
+
+    def __init__(self, tables):
+        """
+        Store splines of any number of EOSTable in flat arrays so they can be evaluated together
+        Lanes look up their own table through a key of log pressure shifted by table index
+        """
+        self.tables = list(tables)
+        sizes = np.array([len(table) for table in self.tables])
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.x = np.concatenate([table.x for table in self.tables])
+        self.y = np.concatenate([table.y for table in self.tables])
+        # pad segment coefficients such that index of knot and segment agree
+        # last knot of each table uses linear extrapolation
+        self.a = np.concatenate([np.append(table.a, 0) for table in self.tables])
+        self.b = np.concatenate([np.append(table.b, 0) for table in self.tables])
+        self.c = np.concatenate([np.append(table.c, table.c_end) for table in self.tables])
+
+        self.log_xmin = np.log(np.array([table.x[0] for table in self.tables]))
+        span = np.log(np.array([table.x[-1] for table in self.tables])) - self.log_xmin
+        self.span = span
+        self.key_size = np.ceil(span.max()) + 1
+        table_index = np.repeat(np.arange(len(self.tables)), sizes)
+        self.keys = self._Key(self.x, table_index)
+
+    def _Key(self, x, index):
+        log_x = np.log(np.maximum(x, 1e-300)) - self.log_xmin[index]
+        return index*self.key_size + np.clip(log_x, 0, self.span[index])
+
+    def Evaluate(self, pressure, index):
+        """
+        Return energy density and its derivative with respect to pressure (geometric unit)
+        index selects the table of each lane
+        """
+        first = self.offsets[index]
+        last = self.offsets[index + 1] - 1
+        knot = np.searchsorted(self.keys, self._Key(pressure, index), side='right') - 1
+        knot = np.clip(knot, first, last)
+        h = pressure - self.x[knot]
+        # below the table extrapolate linearly with slope of the first segment (natural spline)
+        below = pressure < self.x[first]
+        h_cubic = np.where(below, 0, h)
+        energy = self.y[knot] + h*(self.c[knot] + h_cubic*(self.b[knot] + h_cubic*self.a[knot]))
+        denergy = self.c[knot] + h_cubic*(2*self.b[knot] + 3*h_cubic*self.a[knot])
+        return energy, denergy
+
+
+def TOV_eq(state, r, eos_set, index):
+    P, M, y, z, h, B = state
+    E, dEdP = eos_set.Evaluate(P, index)
+    r3 = r*r*r
+    dP = -(E + P)*(M + r3*P)/(r*(r - 2.*M))
+    dM = r*r*E
+
+    # this notation folloes PhysRevC.87.015806
+    # the part above this line solves TOV equation
+    # the part below calculate tidal Love number k2
+    F_r = (r - r3*(E - P))/(r - 2*M)
+    Q_r_part1 = r*(5*E + 9*P + (E + P)*dEdP - 6./(r*r))/(r - 2*M)
+    Q_r_part2 = (M + r3*P)/(r*r*(1 - 2*M/r))
+    Q_r = Q_r_part1 - 4*Q_r_part2*Q_r_part2
+    dy = -(y*y + y*F_r + r*r*Q_r)/r
+
+    # frame dragging as z = d ln(omega)/d ln(r), pseudo-enthalpy relative to the centre 
+    # and baryonic mass without the surface normalization, same as TOV_eq in TidalLove_CPP.cxx
+    dz = -z*(z + 3)/r + r*r*(E + P)*(z + 4)/(r - 2*M)
+    dh = -(M + r3*P)/(r*(r - 2.*M))
+    dB = r*r*(E + P)*np.exp(-h)/np.sqrt(1 - 2*M/r)
+
+    dxdt = np.array([dP, dM, dy, dz, dh, dB])
+    dxdt[:, P < 0] = 0
+    return dxdt
+
+
+# relative change of pressure at which integration starts away from the centre
+CENTRAL_PRESSURE_DROP = 1e-3
+
+def CentralRadius(Pc, eos_set, index):
+    # radius at which pressure has dropped by CENTRAL_PRESSURE_DROP according to CentralSeries
+    Ec, _ = eos_set.Evaluate(Pc, index)
+    return np.sqrt(6*CENTRAL_PRESSURE_DROP*Pc/((Ec + Pc)*(Ec + 3*Pc)))
+
+
+def CentralSeries(Pc, r, eos_set, index):
+    """
+    Taylor expansion of the state of TOV_eq about the centre, same as CentralSeries in TidalLove_CPP.cxx
+    """
+    Ec, E1 = eos_set.Evaluate(Pc, index)
+    r2 = r*r
+    r3 = r2*r
+    P2 = -(Ec + Pc)*(Ec + 3*Pc)/6.
+    return np.array([Pc + P2*r2,
+                     Ec*r3/3. + E1*P2*r3*r2/5.,
+                     2 - (Ec/3. + 11*Pc + (Ec + Pc)*E1)*r2/7.,
+                     4*(Ec + Pc)*r2/5.,
+                     -(Ec + 3*Pc)*r2/6.,
+                     (Ec + Pc)*r3/3.])
+
+
+def Hermite(t, h, y0, y1, d0, d1):
+    # cubic Hermite interpolation at fraction t of an interval of length h, same as Hermite in TidalLove_CPP.cxx
+    t2 = t*t
+    t3 = t2*t
+    return (2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*h*d0 + (-2*t3 + 3*t2)*y1 + (t3 - t2)*h*d1
+
+
+def HermiteCrossing(h, y0, y1, d0, d1, target, iterations=20):
+    """
+    Fraction of the interval at which the Hermite interpolant reaches target, with y0 > target >= y1
+    Newton iterations are kept inside the bracket by bisection, same as HermiteCrossing in TidalLove_CPP.cxx
+    """
+    lower = np.zeros_like(y0)
+    upper = np.ones_like(y0)
+    t = (y0 - target)/(y0 - y1)
+    for _ in range(iterations):
+        f = Hermite(t, h, y0, y1, d0, d1) - target
+        lower = np.where(f > 0, t, lower)
+        upper = np.where(f > 0, upper, t)
+        t2 = t*t
+        dfdt = (6*t2 - 6*t)*y0 + (3*t2 - 4*t + 1)*h*d0 + (-6*t2 + 6*t)*y1 + (3*t2 - 2*t)*h*d1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = t - f/dfdt
+        t = np.where((step > lower) & (step < upper), step, 0.5*(lower + upper))
+    return t
+
+
+def GetLambda(mass, radius, yR):
+    """
+    Dimensionless tidal deformability from mass (solar mass), radius (km) and y at the surface
+    """
+    R = radius/TOKM
+    Rs = 2*mass
+    Rs_R = Rs/R
+    Rs_R2 = Rs_R*Rs_R
+
+    part1 = 1./20.*np.power(Rs_R, 5)*np.power(1 - Rs_R, 2)*(2 - yR + (yR - 1)*Rs_R)
+    part2 = Rs_R*(6. - 3.*yR + 3.*Rs*(5*yR - 8.)/(2.*R))
+    part3 = 1./4.*Rs_R*Rs_R2*(26. - 22.*yR + (Rs_R)*(3*yR - 2) + Rs_R2*(1 + yR))
+    part4 = 3*(1 - Rs_R)*(1 - Rs_R)*(2 - yR + (yR - 1)*Rs_R)*np.log(1 - Rs_R)
+    k2 = part1/(part2 + part3 + part4)
+    lambda_ = 2*k2*np.power(radius*1e3, 5)/(3*G)
+    return lambda_/np.power(G, 4)/np.power(mass*MODOT, 5)*np.power(C, 10)
+
+
+def GetMomentOfInertia(radius, zR):
+    """
+    Moment of inertia (solar mass km^2) from radius (km) and d ln(omega)/d ln(r) at the surface
+    """
+    R = radius/TOKM
+    return R*R*R*zR/(6 + 2*zR)*TOKM*TOKM
+
+
+def TidalLoveProfile(eos_set, pc, eos_index=0, surface_pressure=1e-8, 
+                     abs_err=1e-5, rel_err=1e-5, init_step=1e-5, max_steps=100000):
+    """
+    Radial profile of a star with central pressure pc (MeV/fm3), same as tidallove_profile_table
+    Return: radius (km), pressure and energy density (MeV/fm3), mass and y at the centre and after every accepted step
+    """
+    # pressure, mass and y at the centre
+    steps = [(np.zeros(1), np.array([[pc], [0.], [2.]]))]
+    def Record(lanes, r, state):
+        if lanes.shape[0] > 0:
+            steps.append((r*TOKM, state[:3]/np.array([[MEVFM3/TOPA], [1.], [1.]])))
+
+    TidalLoveBatch(eos_set, [pc], [eos_index], surface_pressure, None, abs_err, rel_err, init_step, max_steps, observer=Record)
+    radius = np.concatenate([r for r, _ in steps])
+    pressure, mass, y = np.concatenate([state for _, state in steps], axis=1)
+    energy_density = eos_set.Evaluate(pressure*MEVFM3/TOPA, np.full(pressure.shape, eos_index))[0]*TOJM3/MEVFM3
+    return radius, pressure, energy_density, mass, y
+
+
+def TidalLoveBatch(eos_set, pc, eos_index=None, surface_pressure=1e-8, checkpoints=None,
+                   abs_err=1e-5, rel_err=1e-5, init_step=1e-5, max_steps=100000, observer=None):
+    """
+    Integrate one star per element of pc (MeV/fm3)
+    eos_index selects the table of eos_set used by each star (default: first table for all)
+    checkpoints are pressures in descending order, either common to all stars or one row per star
+    Return: mass, radius, lambda, mass in checkpoints, radius in checkpoints, moment of inertia, baryonic mass and solver work
+    checkpoints that are not reached are filled with nan
+    solver work has the same keys as the native backend with one entry per star. Wall time of the batch is shared equally
+    observer(lanes, r, state) is called on the initial state and after every accepted step with the lanes that moved
+    """
+    start = time.perf_counter()
+    pc = np.atleast_1d(np.asarray(pc, dtype=np.float64))
+    num = pc.shape[0]
+    if eos_index is None:
+        eos_index = np.zeros(num, dtype=int)
+    eos_index = np.broadcast_to(np.asarray(eos_index, dtype=int), (num,))
+    checkpoints = np.asarray([] if checkpoints is None else checkpoints, dtype=np.float64)
+    if checkpoints.ndim < 2:
+        checkpoints = np.broadcast_to(checkpoints, (num, checkpoints.shape[0]))
+    num_checkpoints = checkpoints.shape[1]
+
+    # centre is singular. Start from the series expansion at a radius where pressure has barely dropped
+    Pc = pc*MEVFM3/TOPA
+    r = CentralRadius(Pc, eos_set, eos_index)
+    state = CentralSeries(Pc, r, eos_set, eos_index)
+    r_end = 200.
+    h = np.maximum(init_step, r)
+    radius = r*TOKM
+    checkpoint_index = np.zeros(num, dtype=int)
+    checkpoint_mass = np.full((num, num_checkpoints), np.nan)
+    checkpoint_radius = np.full((num, num_checkpoints), np.nan)
+    active = np.ones(num, dtype=bool)
+    accepted = np.zeros(num, dtype=int)
+    rejected = np.zeros(num, dtype=int)
+
+    def Observe(lanes, previous=None):
+        """
+        same as CheckpointState: stop at the surface, otherwise record every checkpoint crossed in the step
+        previous is the state, radius and derivative at the start of the step of each lane. 
+        Crossings are then located by Hermite interpolation, otherwise they are recorded at the current point
+        """
+        radius[lanes] = r[lanes]*TOKM
+        pressure = state[0, lanes]/MEVFM3*TOPA
+        surface = (pressure < surface_pressure) | (r[lanes] >= r_end)
+        active[lanes[surface]] = False
+
+        lanes = lanes[~surface]
+        pressure = pressure[~surface]
+        pending = checkpoint_index[lanes] < num_checkpoints
+        crossed = pending.copy()
+        crossed[pending] = pressure[pending] < checkpoints[lanes[pending], checkpoint_index[lanes[pending]]]
+        if not np.any(crossed):
+            return
+        if previous is not None:
+            x0, r0, d0 = (val[..., ~surface][..., crossed] for val in previous)
+        lanes = lanes[crossed]
+        pressure = pressure[crossed]
+        if previous is not None:
+            # derivatives for interpolation of checkpoints are not counted as work of the integrator
+            d1 = TOV_eq(state[:, lanes], r[lanes], eos_set, eos_index[lanes])
+            step = r[lanes] - r0
+
+        # a step can cross more than one checkpoint
+        row = np.arange(lanes.shape[0])
+        while row.shape[0] > 0:
+            index = checkpoint_index[lanes[row]]
+            if previous is None:
+                checkpoint_mass[lanes[row], index] = state[1, lanes[row]]
+                checkpoint_radius[lanes[row], index] = radius[lanes[row]]
+            else:
+                target = checkpoints[lanes[row], index]*MEVFM3/TOPA
+                t = HermiteCrossing(step[row], x0[0, row], state[0, lanes[row]], d0[0, row], d1[0, row], target)
+                checkpoint_mass[lanes[row], index] = Hermite(t, step[row], x0[1, row], state[1, lanes[row]], d0[1, row], d1[1, row])
+                checkpoint_radius[lanes[row], index] = (r0[row] + t*step[row])*TOKM
+            checkpoint_index[lanes[row]] += 1
+            row = row[checkpoint_index[lanes[row]] < num_checkpoints]
+            row = row[pressure[row] < checkpoints[lanes[row], checkpoint_index[lanes[row]]]]
+
+    Observe(np.arange(num))
+    if observer is not None:
+        observer(np.arange(num), r, state)
+    for _ in range(max_steps):
+        lanes = np.nonzero(active)[0]
+        if lanes.shape[0] == 0:
+            break
+        x = state[:, lanes]
+        t = r[lanes]
+        dt = np.minimum(h[lanes], r_end - t)
+        index = eos_index[lanes]
+
+        k = [TOV_eq(x, t, eos_set, index)]
+        for stage in range(1, 6):
+            xs = x + dt*sum(coeff*k[i] for i, coeff in enumerate(CK_A[stage]))
+            k.append(TOV_eq(xs, t + CK_C[stage - 1]*dt, eos_set, index))
+        x_new = x + dt*sum(coeff*ki for coeff, ki in zip(CK_B, k) if coeff != 0)
+        x_err = dt*sum(coeff*ki for coeff, ki in zip(CK_BERR, k) if coeff != 0)
+
+        # same error estimate and step size control as odeint controlled_runge_kutta
+        err = np.max(np.abs(x_err)/(abs_err + rel_err*(np.abs(x) + np.abs(dt)*np.abs(k[0]))), axis=0)
+        accept = err <= 1
+        shrink = np.maximum(0.9*np.power(np.maximum(err, 1e-300), -1./3.), 0.2)
+        grow = np.where(err < 0.5, 0.9*np.power(np.maximum(err, np.power(5., -5)), -1./5.), 1.)
+        h[lanes] = np.where(accept, dt*grow, dt*shrink)
+
+        acc = lanes[accept]
+        accepted[acc] += 1
+        rejected[lanes[~accept]] += 1
+        state[:, acc] = x_new[:, accept]
+        r[acc] = t[accept] + dt[accept]
+        Observe(acc, (x[:, accept], t[accept], k[0][:, accept]))
+        if observer is not None:
+            observer(acc, r, state)
+
+    mass = state[1]
+    with np.errstate(all='ignore'):
+        lambda_ = GetLambda(mass, radius, state[2])
+        inertia = GetMomentOfInertia(radius, state[3])
+    # baryon mass is taken as the chemical potential at the surface
+    baryon_mass = state[5]*np.exp(state[4])
+    work = {'rhs_evaluations': 6*(accepted + rejected), 'accepted_steps': accepted, 'rejected_steps': rejected,
+            'time': np.full(num, (time.perf_counter() - start)/max(num, 1))}
+    return mass, radius, lambda_, checkpoint_mass, checkpoint_radius, inertia, baryon_mass, work
+
@@ -1,11 +1,18 @@
-import tempfile
-import TidalLove.TidalLove_individual as tidal
+try:
+    import TidalLove.TidalLove_individual as tidal
+except ImportError:
+    # compiled extension is optional, numpy integrator is used instead
+    tidal = None
+import TidalLove.TidalLoveNumpy as tidal_numpy
 from decimal import Decimal
 import autograd.numpy as np
 import scipy.optimize as opt
 import math
+import time
 import logging
-from copy import copy
+from copy import copy, deepcopy
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing_logging import install_mp_handler
 
 logger = logging.getLogger(__name__)
@@ -15,6 +22,10 @@ import Utilities.Utilities as utl
 import Utilities.SkyrmeEOS as sky 
 from Utilities.Constants import *
 
+MemoInfo = namedtuple('MemoInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+# rough estimates of TidalLoveWrapper.PreScreen
+PreScreenResult = namedtuple('PreScreenResult', ['MaxMass', 'Radius', 'Lambda', 'PCentral'])
+
 class TidalLoveResult:
 
     def __init__(self, num_checkpoints=0):
@@ -23,16 +34,52 @@ class TidalLoveResult:
         self.DensCentral = np.nan
         self.Radius = np.nan
         self.Lambda = np.nan
+        self.MomentOfInertia = np.nan # in solar mass km^2
+        self.BaryonMass = np.nan
         self.Checkpoint_mass = [np.nan]*num_checkpoints
         self.Checkpoint_radius = [np.nan]*num_checkpoints
         self.Checkpoint_dens = [np.nan]*num_checkpoints
+        # work of all integrations that led to this result
+        self.Integrations = 0
+        self.RHSEvaluations = 0
+        self.AcceptedSteps = 0
+        self.RejectedSteps = 0
+        self.IntegrationTime = 0. # wall time spent in the integrator in seconds
+        self.SearchTime = 0. # wall time including root finding in seconds
+        # derivatives (mass, radius, lambda) with respect to EOS parameters, filled by TidalLoveWrapper.Sensitivity
+        self.Sensitivity = {}
+
+    def SetWork(self, works, search_time):
+        """
+        works is a list of solver work returned by the integrator, one for each integration
+        """
+        self.Integrations = len(works)
+        self.RHSEvaluations = int(sum(work['rhs_evaluations'] for work in works))
+        self.AcceptedSteps = int(sum(work['accepted_steps'] for work in works))
+        self.RejectedSteps = int(sum(work['rejected_steps'] for work in works))
+        self.IntegrationTime = float(sum(work['time'] for work in works))
+        self.SearchTime = search_time
 
     def ToDict(self):
         dictionary = {'Mass' : self.mass,
                       'PCentral' : self.PCentral,
                       'DensCentral' : self.DensCentral,
                       'R' : self.Radius,
-                      'Lambda' : self.Lambda}
+                      'Lambda' : self.Lambda,
+                      'I' : self.MomentOfInertia,
+                      'MBaryon' : self.BaryonMass,
+                      'BindingEnergy' : self.BaryonMass - self.mass,
+                      'Integrations' : self.Integrations,
+                      'RHSEvaluations' : self.RHSEvaluations,
+                      'AcceptedSteps' : self.AcceptedSteps,
+                      'RejectedSteps' : self.RejectedSteps,
+                      'IntegrationTime' : self.IntegrationTime,
+                      'SearchTime' : self.SearchTime}
+        for name, (dmass, dradius, dlambda) in self.Sensitivity.items():
+            # no '/' in column names, which PyTables cannot use as natural names
+            dictionary['dMass_d%s' % name] = dmass
+            dictionary['dR_d%s' % name] = dradius
+            dictionary['dLambda_d%s' % name] = dlambda
         for index, (cp_mass, cp_radius, cp_dens) in enumerate(zip(self.Checkpoint_mass, self.Checkpoint_radius, self.Checkpoint_dens)):
             dictionary['RadiusCheckpoint%d' % index] = cp_radius
             dictionary['MassCheckpoint%d' % index] = cp_mass
@@ -46,19 +93,58 @@ class TidalLoveResult:
 class TidalLoveWrapper:
 
 
-    def __init__(self, eos, name=None):
+    def __init__(self, eos, name=None, eos_table=None, backend=None, formulation='radius', num_threads=1, memo_size=1024, 
+                 envelope_pressure=None):
         """
-        Print the selected EOS into a file for the tidallove script to run
+        Sample the selected EOS into arrays and compile them into an EOSTable
+        The table is built once and shared by all integrations of this EOS
+        A previously built (e.g. unpickled) eos_table can be supplied to skip sampling
+        EOS is only printed into a file when name is supplied (for debugging)
+        backend can be 'native' (compiled extension) or 'numpy'. Default is native if it is installed
+        formulation can be 'radius' or 'enthalpy'. The latter integrates in pseudo-enthalpy from centre to surface 
+        and is only available with the native backend
+        num_threads > 1 integrates central pressures of a batch (e.g. grids of FindMaxMass and FindMassFamily) concurrently 
+        with the native backend, which releases the GIL during integration
+        Results of Calculate and CalculateBatch are memoized for the last memo_size central pressures (0 disables it)
+        envelope_pressure (MeV/fm3) stops integration there and interpolates the rest of the crust from a CrustEnvelope, 
+        which is computed once per process for every crust. Only used by the native backend in radius formulation
         """
+        if backend is None:
+            backend = 'numpy' if tidal is None else 'native'
+        if backend not in ('native', 'numpy'):
+            raise ValueError('Unknown backend %s. It can only be native or numpy' % backend)
+        if formulation not in ('radius', 'enthalpy'):
+            raise ValueError('Unknown formulation %s. It can only be radius or enthalpy' % formulation)
+        if formulation == 'enthalpy' and backend != 'native':
+            raise ValueError('Enthalpy formulation is only implemented in the native backend')
+        self.backend = backend
+        self.formulation = formulation
+        self.num_threads = num_threads
+        self._executor = None
         self.eos = eos
-        if name is None:
-            logger.debug('Write EOS into temp file')
-            self.output = tempfile.NamedTemporaryFile('w')
-        else:
+        self.output = None
+        if name is not None:
             logger.debug('Write EOS into file %s' % name)
             self.output = open(name, 'w')
-        eos.ToFileStream(self.output)
+            eos.ToFileStream(self.output)
         self.max_energy, self.max_pressure = eos.GetMaxDef()
+        self._log_pressure_table = None
+        if eos_table is None:
+            energy_density, pressure, density = eos.GetTable()
+            self._BuildDensityInverse(energy_density, pressure, density)
+            table_args = (np.ascontiguousarray(energy_density, dtype=np.float64), 
+                          np.ascontiguousarray(pressure, dtype=np.float64), 
+                          float(self.max_energy))
+            if self.backend == 'numpy':
+                eos_table = tidal_numpy.EOSTable(*table_args)
+            else:
+                # native spline is split where segments of EOS join, and integration steps end there
+                breakpoints = np.array(eos.GetPressure(np.array(eos.GetBreakpoints(), dtype=np.float64), 0), dtype=np.float64)
+                breakpoints = breakpoints[np.isfinite(breakpoints) & (breakpoints > 0)]
+                eos_table = tidal.EOSTable(*table_args, np.ascontiguousarray(breakpoints))
+        self.eos_table = eos_table
+        if self.backend == 'numpy':
+            self._eos_set = tidal_numpy.EOSTableSet([eos_table])
         logger.debug('EOS is valid up till energy = %f, pressure = %f' % (self.max_energy, self.max_pressure))
         # pressure needs to be expressed as pascal for pc
         #self.max_pressure# /= 3.62704e-5
@@ -67,6 +153,22 @@ class TidalLoveWrapper:
         self._checkpoint = [self.surface_pressure]
         self._named_density_checkpoint = []
         self._density_checkpoint = []
+        self.num_integrations = 0 # integrations used by the last FindMass, FindMaxMass, FindMassFamily, FindMassContinuation, MRCurve or PreScreen
+        # (abs_err, rel_err, init_step) of the integrator
+        # exploratory probes of root searches only need mass and use the loose tolerance
+        # the converged central pressure is integrated again with the production tolerance
+        self.tolerance = (1e-5, 1e-5, 1e-5)
+        self.probe_tolerance = (1e-4, 1e-4, 1e-5)
+        self._ResetWork()
+        # least recently used results. Central pressures closer than memo_quantum in log are the same entry
+        # it must stay below the tolerance of every root finder on central pressure
+        self.memo_size = memo_size
+        self.memo_quantum = 1e-12
+        self._memo = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.envelope_pressure = envelope_pressure
+        self._envelope = None
 
     def __enter__(self):
         return self
@@ -82,13 +184,8 @@ class TidalLoveWrapper:
     def checkpoint(self, value):
         # checkpoint list must be in desending order
         value.sort(reverse=True)
-        self._density_checkpoint = []
-        for pre in value:
-            try:
-                self._density_checkpoint.append(opt.newton(lambda rho: self.eos.GetPressure(rho, 0) - pre, x0=self.eos.rho0, 
-                                                           fprime=lambda x: self.eos.GetdPressure(x, 0)))
-            except Exception:
-                self._density_checkpoint.append(0)
+        density = self.DensityFromPressure(value)
+        self._density_checkpoint = np.where(np.isnan(density), 0, density).tolist()
         self._checkpoint = value
 
     @property
@@ -113,76 +210,755 @@ class TidalLoveWrapper:
         self.density_checkpoint = [val[1] for val in value]
 
 
-    def Calculate(self, pc):
-        # return order
-        # m r lambda_ checkpt_m checkpt_r
-        self.ans = TidalLoveResult(len(self.density_checkpoint))
-        ans = tidal.tidallove_individual(self.output.name, 
-                                         pc, self.max_energy, self.surface_pressure, np.array(self.checkpoint), )
-        #if(len(ans[4]) > 0):
-        if ans[0] > 0:
-            self.ans.mass = ans[0]
-            self.ans.Radius = ans[1] 
-            self.ans.Lambda = ans[2]
-            self.ans.Checkpoint_mass = ans[3]
-            self.ans.Checkpoint_radius = ans[4]
+    def _Integrate(self, pcs, probe=False):
+        # return order for each central pressure
+        # m r lambda_ checkpt_m checkpt_r I m_baryon work
+        checkpoint = np.array(self.checkpoint, dtype=np.float64)
+        abs_err, rel_err, init_step = self.probe_tolerance if probe else self.tolerance
+        if self.backend == 'numpy':
+            ans = tidal_numpy.TidalLoveBatch(self._eos_set, pcs, surface_pressure=self.surface_pressure, 
+                                             checkpoints=checkpoint, abs_err=abs_err, rel_err=rel_err, 
+                                             init_step=init_step)
+            works = [{key: value[index] for key, value in ans[-1].items()} for index in range(len(pcs))]
+            ans = list(zip(*ans[:-1], works))
         else:
+            integrator = tidal.tidallove_enthalpy_table if self.formulation == 'enthalpy' else tidal.tidallove_individual_table
+            envelope = self._Envelope()
+            def Integrate(pc):
+                if envelope is not None:
+                    return tidal.tidallove_envelope_table(self.eos_table, envelope, pc, self.surface_pressure, checkpoint, 
+                                                          abs_err, rel_err, init_step)
+                return integrator(self.eos_table, pc, self.surface_pressure, checkpoint, abs_err, rel_err, init_step)
+            if self.num_threads > 1 and len(pcs) > 1:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+                ans = list(self._executor.map(Integrate, pcs))
+            else:
+                ans = [Integrate(pc) for pc in pcs]
+        self._work.extend(result[7] for result in ans)
+        return ans
+
+    def _Envelope(self):
+        # envelope for the current surface pressure and checkpoints, or None if it is not used
+        if self.envelope_pressure is None or self.backend != 'native' or self.formulation != 'radius':
+            return None
+        settings = (self.envelope_pressure, self.surface_pressure, tuple(self.checkpoint))
+        if self._envelope is None or self._envelope[0] != settings:
+            self._envelope = (settings, SharedEnvelope(self.eos_table, *settings))
+        return self._envelope[1]
+
+    def _ResetWork(self):
+        # solver work is accumulated from here until the next result of a root search
+        self._work = []
+        self._work_start = time.perf_counter()
+
+    def _ToResult(self, ans):
+        result = TidalLoveResult(len(self.density_checkpoint))
+        result.mass = ans[0]
+        result.Radius = ans[1] 
+        result.Lambda = ans[2]
+        result.Checkpoint_mass = ans[3]
+        result.Checkpoint_radius = ans[4]
+        result.MomentOfInertia = ans[5]
+        result.BaryonMass = ans[6]
+        result.SetWork([ans[7]], ans[7]['time'])
+        return result
+
+    def _MemoSettings(self, probe):
+        # everything other than central pressure that changes the result
+        return (self.probe_tolerance if probe else self.tolerance, tuple(self.checkpoint), self.surface_pressure, 
+                self._Envelope() is not None and self.envelope_pressure)
+
+    def _MemoKey(self, pc, probe):
+        return (int(round(math.log(pc)/self.memo_quantum)) if pc > 0 else pc,) + self._MemoSettings(probe)
+
+    def _MemoGet(self, key):
+        # copy of the memoized result, which costs no integration. None if it is not memoized
+        if key not in self._memo:
+            self.memo_misses += 1
+            return None
+        self.memo_hits += 1
+        self._memo.move_to_end(key)
+        result = deepcopy(self._memo[key][1])
+        result.SetWork([], 0.)
+        return result
+
+    def _MemoPut(self, key, pc, result):
+        if self.memo_size <= 0:
+            return
+        self._memo[key] = (pc, deepcopy(result))
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    def MemoInfo(self):
+        """
+        Hit and miss statistics of the memo, same as functools.lru_cache
+        """
+        return MemoInfo(self.memo_hits, self.memo_misses, self.memo_size, len(self._memo))
+
+    def ClearMemo(self):
+        self._memo.clear()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def _MemoInterpolate(self, mass, probe=True):
+        """
+        Central pressure at which mass is reached, interpolated in log(pc) between neighbouring memoized results 
+        where mass increases with central pressure
+        Return interpolated central pressure and the memoized one that is closer in mass, or None if mass is not bracketed
+        """
+        settings = self._MemoSettings(probe)
+        points = sorted((pc, result.mass) for key, (pc, result) in self._memo.items() 
+                        if key[1:] == settings and not result.IsNan())
+        for (pc0, m0), (pc1, m1) in zip(points[:-1], points[1:]):
+            if m0 < mass <= m1:
+                x = math.log(pc0) + (mass - m0)/(m1 - m0)*(math.log(pc1) - math.log(pc0))
+                return math.exp(x), (pc0 if mass - m0 < m1 - mass else pc1)
+        return None
+
+    def Calculate(self, pc, probe=False):
+        """
+        Calculate NS with central pressure pc
+        probe=True integrates with self.probe_tolerance, which is only accurate enough for mass
+        """
+        key = self._MemoKey(pc, probe)
+        result = self._MemoGet(key)
+        if result is None:
+            ans = self._Integrate([pc], probe)[0]
+            result = self._ToResult(ans) if ans[0] > 0 else TidalLoveResult(len(self.density_checkpoint))
+            self._MemoPut(key, pc, result)
+        self.ans = result
+        #if(len(ans[4]) > 0):
+        if self.ans.IsNan():
             raise RuntimeError('Calculated mass smaller than zero. EOS exceed its valid range at pc = %f, maxp = %f' % (pc, self.max_pressure))
 
         return self.ans
 
-    def FindMaxMass(self, central_pressure0=10, disp=False, *args):
+    def CalculateBatch(self, pcs, probe=False):
+        """
+        Calculate NS for a list of central pressures
+        numpy backend integrates all of them together
+        Central pressures beyond valid range of the EOS gives nan results instead of raising
+        """
+        keys = [self._MemoKey(pc, probe) for pc in pcs]
+        results = [self._MemoGet(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if len(missing) == 0:
+            return results
+        for index, ans in zip(missing, self._Integrate([pcs[index] for index in missing], probe)):
+            if ans[0] > 0:
+                results[index] = self._ToResult(ans)
+            else:
+                logger.debug('Calculated mass smaller than zero. EOS exceed its valid range at pc = %f, maxp = %f' % (pcs[index], self.max_pressure))
+                results[index] = TidalLoveResult(len(self.density_checkpoint))
+            self._MemoPut(keys[index], pcs[index], results[index])
+        return results
+
+    def FindMaxMass(self, central_pressure0=10, disp=False, mass_tol=1e-4, num_grid=8, *args):
+        """
+        Maximum mass from a coarse log grid of central pressure between central_pressure0 and the valid limit of EOS
+        The heaviest grid point and its neighbours bracket the maximum, which is refined with Brent's method 
+        until mass is accurate to about mass_tol (solar mass)
+        Number of integrations used is stored in self.num_integrations
+        """
         if central_pressure0 > self.max_pressure:
             logger.warning('Default pressure %g exceed max. valid pressure %.3f. Will ignore default pressure' % (central_pressure0, self.max_pressure))
             central_pressure0 = 0.7*self.max_pressure
-        # try finding the maximum mass
-        pc = np.nan
-        while central_pressure0 < self.max_pressure:
+        self._ResetWork()
+        cache = {}
+        pc_grid = np.logspace(np.log10(central_pressure0), np.log10(0.95*self.max_pressure), num_grid)
+        cache.update(zip(pc_grid, self.CalculateBatch(pc_grid, probe=True)))
+        pc = self._MaxMassSearch(cache, pc_grid, mass_tol)
+        self.ans = self._FinalResult(pc)
+        self.num_integrations = self.ans.Integrations
+        logger.debug('%d integrations were used to find max mass' % self.num_integrations)
+        return copy(self.ans)
+
+    def _CachedCalculate(self, cache, pc):
+        # integrations beyond valid range of EOS are stored as nan results
+        if pc not in cache:
             try:
-                pc = opt.minimize(lambda x: -1e6*self.Calculate(float(x)).mass, 
-                                  x0=np.array([central_pressure0]), 
-                                  bounds=((0.01, 0.95*self.max_pressure),), 
-                                  options={'eps':0.1, 'ftol':1e-3})
-                pc = pc['x'][0]
-            except Exception as error:
-                central_pressure0 = central_pressure0*2
-                logger.exception('Failed to find max mass with central_pressure %f' % central_pressure0)
-            else:
-                break
-        # infer central density from central pressure
-        try:
-            DensCentralMax = opt.newton(lambda x: self.eos.GetPressure(x, 0) - pc, x0=5*0.16,
-                                        fprime=lambda x: self.eos.GetdPressure(x, 0)) 
-        except Exception as error:
-            logger.exception('Cannot find central density for mass %g' % self.ans['mass'])
-            DensCentralMax = np.nan
+                cache[pc] = self.Calculate(pc, probe=True)
+            except RuntimeError:
+                cache[pc] = TidalLoveResult(len(self.density_checkpoint))
+        return cache[pc]
 
-        self.ans.PCentral = pc
-        self.ans.DensCentral = DensCentralMax
-        return copy(self.ans)
+    def _MaxMassSearch(self, cache, pc_grid, mass_tol):
+        """
+        Central pressure of the maximum mass given M(pc) on an ascending pc_grid stored in cache
+        Return nan if none of the grid points forms a NS
+        """
+        pc_grid = list(pc_grid)
+        mass_grid = [self._CachedCalculate(cache, pc).mass for pc in pc_grid]
+        if np.all(np.isnan(mass_grid)):
+            logger.error('No NS can be formed with central pressure between %g and %g' % (pc_grid[0], pc_grid[-1]))
+            return np.nan
+        idx_max = np.nanargmax(mass_grid)
+        # mass still increases at the lowest pressure. Extend the grid downward until the maximum is bracketed
+        while idx_max == 0 and pc_grid[0] > 1e-3:
+            pc_grid.insert(0, 0.5*pc_grid[0])
+            mass_grid.insert(0, self._CachedCalculate(cache, pc_grid[0]).mass)
+            idx_max = np.nanargmax(mass_grid)
+        # same at the highest pressure if the grid ends before the valid limit of EOS
+        # grids from logspace can end a rounding error below the limit, which must not be probed again
+        pc_limit = 0.95*self.max_pressure
+        while idx_max == len(pc_grid) - 1 and pc_grid[-1] < (1 - 1e-9)*pc_limit:
+            pc_grid.append(min(2*pc_grid[-1], pc_limit))
+            mass_grid.append(self._CachedCalculate(cache, pc_grid[-1]).mass)
+            idx_max = np.nanargmax(mass_grid)
+        if idx_max == 0 or idx_max == len(pc_grid) - 1:
+            # maximum lies on the edge of valid range of EOS
+            return pc_grid[idx_max]
+
+        # tolerance on log(pc) from the curvature of a parabola through the bracket, as M ~ Mmax - 0.5*|M''|dx^2
+        x = np.log(pc_grid[idx_max - 1:idx_max + 2])
+        m = mass_grid[idx_max - 1:idx_max + 2]
+        curvature = 2*((m[2] - m[1])/(x[2] - x[1]) - (m[1] - m[0])/(x[1] - x[0]))/(x[2] - x[0])
+        xatol = np.sqrt(2*mass_tol/abs(curvature)) if curvature < 0 else 1e-3
+        xatol = min(max(xatol, 1e-6), 0.1)
+        pc = np.exp(opt.minimize_scalar(lambda x: -self._CachedCalculate(cache, np.exp(x)).mass, bounds=(x[0], x[2]), 
+                                        method='bounded', options={'xatol': xatol}).x)
+        if not self._CachedCalculate(cache, pc).mass > mass_grid[idx_max]:
+            pc = pc_grid[idx_max]
+        return pc
 
     def FindMass(self, central_pressure0=10, mass=1.4, *args, **kwargs):
         if central_pressure0 > self.max_pressure:
             logger.warning('Default pressure %g exceed max. valid pressure %.3f. Will ignore default pressure' % (central_pressure0, self.max_pressure))
             central_pressure0 = 0.7*self.max_pressure
+        # secant steps cannot resolve central pressure beyond the accuracy of probes
+        kwargs.setdefault('rtol', 1e-4)
+        # start from memoized neighbours if they bracket the mass
+        bracket = self._MemoInterpolate(mass) if 'x1' not in kwargs else None
+        if bracket is not None:
+            central_pressure0, kwargs['x1'] = bracket
+        self._ResetWork()
         try:
-            pc = opt.newton(lambda x: self.Calculate(x).mass - mass, 
+            pc = opt.newton(lambda x: self.Calculate(x, probe=True).mass - mass, 
                             x0=central_pressure0, *args, **kwargs)
         except Exception as error:
             logger.exception('Failed to find NS mass %g' % mass)
             pc = np.nan
 
-        try:
-            DensCentral = opt.newton(lambda x: self.eos.GetPressure(x, 0) - pc, x0=1.5*0.16,
-                                     fprime=lambda x: self.eos.GetdPressure(x, 0)) 
-        except Exception as error:
-            logger.exception('Cannot find central density for mass %g' % mass)
-            DensCentral = np.nan
-
-        self.ans.PCentral = pc
-        self.ans.DensCentral = DensCentral
+        self.ans = self._FinalResult(pc)
+        self.num_integrations = self.ans.Integrations
         return copy(self.ans)
 
+    def FindMassFamily(self, masses, pc_min=1., num_grid=20, rtol=1e-6, mass_tol=1e-4, pc_guess=None, num_guess_grid=6):
+        """
+        Find NS of all requested masses and the maximum mass from one sweep of central pressure
+        M(pc) is tabulated once on a log grid, and every target is refined inside its own bracket on that grid
+        pc_guess are central pressures expected near the solutions (e.g. those of a similar EOS). 
+        The sweep then only covers num_guess_grid points around them and is extended if solutions lie outside
+        Return result of the maximum mass and a list of results ordered as masses
+        Solver work of the sweep and the maximum mass search is assigned to the maximum mass result
+        """
+        self._ResetWork()
+        cache = {}
+        def Integrate(pc):
+            return self._CachedCalculate(cache, pc)
+
+        pc_max = 0.95*self.max_pressure
+        pc_guess = [] if pc_guess is None else [pc for pc in pc_guess if 0 < pc < pc_max]
+        if len(pc_guess) > 0:
+            pc_grid = np.logspace(np.log10(0.8*min(pc_guess)), np.log10(min(1.25*max(pc_guess), pc_max)), num_guess_grid)
+        else:
+            pc_grid = np.logspace(np.log10(min(pc_min, 0.5*pc_max)), np.log10(pc_max), num_grid)
+        cache.update(zip(pc_grid, self.CalculateBatch(pc_grid, probe=True)))
+        mass_grid = np.array([Integrate(pc).mass for pc in pc_grid])
+        if np.all(np.isnan(mass_grid)):
+            logger.error('No NS can be formed with central pressure between %g and %g' % (pc_grid[0], pc_grid[-1]))
+            return TidalLoveResult(len(self.density_checkpoint)), [TidalLoveResult(len(self.density_checkpoint)) for mass in masses]
+
+        idx_max = np.nanargmax(mass_grid)
+        pc_mmax = self._MaxMassSearch(cache, pc_grid, mass_tol)
+        max_result = self._FinalResult(pc_mmax)
+
+        # stable branch is where mass increases with central pressure up to the maximum
+        idx_min = idx_max
+        while idx_min > 0 and mass_grid[idx_min - 1] < mass_grid[idx_min]:
+            idx_min -= 1
+        branch = sorted([pc for pc in pc_grid[idx_min:idx_max + 1] if pc < pc_mmax] + [pc_mmax])
+
+        results = []
+        for mass in masses:
+            if not mass <= max_result.mass:
+                logger.debug('Mass %g exceeds maximum mass %g' % (mass, max_result.mass))
+                results.append(self._FinalResult(np.nan))
+                continue
+            # extend the branch to lower pressure if needed
+            while Integrate(branch[0]).mass > mass and idx_min == 0 and branch[0] > 1e-3:
+                if not Integrate(0.5*branch[0]).mass < Integrate(branch[0]).mass:
+                    break
+                branch.insert(0, 0.5*branch[0])
+            branch_mass = np.array([Integrate(pc).mass for pc in branch])
+            idx = np.searchsorted(branch_mass, mass)
+            if idx == 0 or idx == len(branch):
+                logger.error('Failed to find NS mass %g' % mass)
+                results.append(self._FinalResult(np.nan))
+                continue
+            pc = opt.brentq(lambda x: Integrate(x).mass - mass, branch[idx - 1], branch[idx], rtol=rtol)
+            results.append(self._FinalResult(pc))
+
+        self.num_integrations = sum(result.Integrations for result in results + [max_result])
+        logger.debug('%d integrations were used to find %d masses' % (self.num_integrations, len(masses)))
+        return max_result, results
+
+    def FindMassContinuation(self, masses, central_pressure0=10, rtol=1e-4, max_iter=20):
+        """
+        Find NS of all requested masses by continuation in ascending order of mass
+        Root search of each mass starts from central pressure of the previous one, with a secant step of log(pc)
+        from dM/dlog(pc) of the previous solution. Falls back to bracketing if a step leaves the stable branch
+        Return a list of results ordered as masses and a list of number of integrations used for each of them
+        """
+        self._ResetWork()
+        if central_pressure0 > self.max_pressure:
+            logger.warning('Default pressure %g exceed max. valid pressure %.3f. Will ignore default pressure' % (central_pressure0, self.max_pressure))
+            central_pressure0 = 0.7*self.max_pressure
+        results = [TidalLoveResult(len(self.density_checkpoint)) for mass in masses]
+        iterations = [0]*len(masses)
+        # (log(pc), mass) of the previous solution and slope dM/dlog(pc) there
+        previous = None
+        slope = None
+        for index in np.argsort(masses):
+            mass = masses[index]
+            points = []
+            def Integrate(x):
+                pc = np.exp(x)
+                if pc > self.max_pressure:
+                    point = (x, np.nan)
+                else:
+                    try:
+                        point = (x, self.Calculate(pc, probe=True).mass)
+                    except RuntimeError:
+                        point = (x, np.nan)
+                points.append(point)
+                return point
+
+            if previous is None:
+                x0, m0 = Integrate(np.log(central_pressure0))
+                x1, m1 = Integrate(x0 + 0.1)
+                if m1 > m0:
+                    slope = (m1 - m0)/(x1 - x0)
+                    x0, m0 = x1, m1
+            else:
+                x0, m0 = previous
+
+            # secant iterations on log(pc). slope must stay positive on the stable branch
+            x = m = np.nan
+            while slope is not None and slope > 0 and len(points) < max_iter:
+                x1, m1 = Integrate(x0 + (mass - m0)/slope)
+                if not m1 > 0 or (m1 > m0) != (x1 > x0):
+                    break
+                if abs(x1 - x0) < rtol:
+                    x, m = x1, m1
+                    break
+                # small step that does not get closer to the target is limited by noise of the probes
+                if abs(x1 - x0) < 1e-2 and abs(m1 - mass) >= abs(m0 - mass):
+                    x, m = x0, m0
+                    break
+                # slope from tiny steps is dominated by noise of the probes and is not kept
+                if abs(x1 - x0) > 1e-2:
+                    slope = (m1 - m0)/(x1 - x0)
+                x0, m0 = x1, m1
+            if np.isnan(x):
+                logger.debug('Secant steps left the stable branch for mass %g. Switch to bracketing' % mass)
+                x, m, slope = self._BracketMass(mass, points if previous is None else points + [previous], Integrate, rtol)
+
+            iterations[index] = len(points)
+            if np.isnan(x):
+                logger.error('Failed to find NS mass %g' % mass)
+                results[index] = self._FinalResult(np.nan)
+                continue
+            previous = (x, m)
+            results[index] = self._FinalResult(np.exp(x))
+
+        self.num_integrations = sum(result.Integrations for result in results)
+        logger.debug('%d integrations were used to find %d masses' % (self.num_integrations, len(masses)))
+        return results, iterations
+
+    def _BracketMass(self, mass, points, Integrate, rtol):
+        """
+        Bracket mass on the stable branch, starting from the evaluated (log(pc), mass) points, and refine it with brentq
+        Return log(pc), mass and dM/dlog(pc) at the solution, or nan if mass is not on the stable branch
+        """
+        points = sorted([point for point in points if point[1] > 0])
+        lower = [point for point in points if point[1] < mass]
+        upper = [point for point in points if point[1] >= mass]
+        if len(lower) == 0:
+            # all points are heavier than the target. Step down until mass is below it
+            x, m = points[0] if len(points) > 0 else Integrate(np.log(0.7*self.max_pressure))
+            while not m < mass and x > np.log(1e-3):
+                x, m = Integrate(x - np.log(2))
+            if not m < mass:
+                return np.nan, np.nan, None
+            lower = [(x, m)]
+        # the heaviest lower point has the largest pc below the maximum mass
+        low = max(lower, key=lambda point: point[1])
+        upper = [point for point in upper if point[0] > low[0]]
+        if len(upper) > 0:
+            high = min(upper, key=lambda point: point[0])
+        else:
+            # step up until mass exceeds the target. Target is above the maximum mass if mass starts to decrease
+            high = low
+            while True:
+                x, m = Integrate(high[0] + np.log(2))
+                if not m > high[1]:
+                    return np.nan, np.nan, None
+                if m >= mass:
+                    high = (x, m)
+                    break
+                low = high = (x, m)
+        x = opt.brentq(lambda x: Integrate(x)[1] - mass, low[0], high[0], xtol=rtol)
+        # mass at x equals the target within the tolerance of brentq
+        return x, mass, (high[1] - low[1])/(high[0] - low[0])
+
+    def _FinalResult(self, pc):
+        # integrate converged central pressure with production tolerance
+        # solver work since the last result is assigned to this one, successful or not
+        result = TidalLoveResult(len(self.density_checkpoint))
+        if not np.isnan(pc):
+            try:
+                result = self.Calculate(pc)
+            except Exception as error:
+                logger.exception('Cannot calculate NS with central pressure %g' % pc)
+        if not result.IsNan():
+            # infer central density from central pressure
+            try:
+                result.DensCentral = self.DensityFromPressure(pc)
+            except Exception as error:
+                logger.exception('Cannot find central density for mass %g' % result.mass)
+                result.DensCentral = np.nan
+            result.PCentral = pc
+        result.SetWork(self._work, time.perf_counter() - self._work_start)
+        self._ResetWork()
+        return result
+
+    def MRCurve(self, pc_min=1., num_grid=5, tol=5e-3, mass_tol=1e-3, max_integrations=60):
+        """
+        Mass-radius-lambda curve of NS with central pressure from pc_min up to the maximum mass
+        Starts from a coarse log grid of central pressure and bisects intervals in log(pc) where the curve bends,
+        i.e. where a straight segment in the M-R plane, scaled by the extent of the curve, deviates from it by more than tol
+        Near the heaviest point, the interval that contains the maximum of a parabola through it and its neighbours is bisected
+        until that maximum exceeds the heaviest mass by less than mass_tol (solar mass), 
+        and intervals next to it are bisected until their masses are within 10*mass_tol of it
+        Points beyond the maximum mass only locate the turning point and are not returned
+        Return list of results (with PCentral) on the stable branch ordered by central pressure
+        Number of integrations used is stored in self.num_integrations
+        """
+        pc_max = 0.95*self.max_pressure
+        pcs = np.logspace(np.log10(min(pc_min, 0.5*pc_max)), np.log10(pc_max), num_grid)
+        points = []
+        num_integrations = 0
+        while len(pcs) > 0 and num_integrations < max_integrations:
+            pcs = pcs[:max_integrations - num_integrations]
+            for pc, result in zip(pcs, self.CalculateBatch(pcs)):
+                if not result.IsNan():
+                    result.PCentral = pc
+                    points.append(result)
+            num_integrations += len(pcs)
+            points.sort(key=lambda result: result.PCentral)
+            if len(points) < 3:
+                break
+            mass = np.array([result.mass for result in points])
+            # points past the first maximum are unstable. Only the one after it is kept to bracket the maximum
+            idx_max = np.argmax(mass)
+            decrease = np.nonzero(np.diff(mass) < 0)[0]
+            if len(decrease) > 0:
+                idx_max = decrease[0]
+            points = points[:idx_max + 2]
+            mass = mass[:idx_max + 2]
+            if len(points) < 3:
+                break
+            radius = np.array([result.Radius for result in points])
+            x = np.log([result.PCentral for result in points])
+
+            # turning angle of the scaled curve at every interior point
+            scale = np.array([np.ptp(radius[:idx_max + 1]), np.ptp(mass[:idx_max + 1])])
+            scale[~(scale > 0)] = 1
+            segment = np.stack([np.diff(radius), np.diff(mass)], axis=1)/scale
+            length = np.linalg.norm(segment, axis=1)
+            angle = np.zeros(len(points))
+            cosine = np.sum(segment[1:]*segment[:-1], axis=1)/np.maximum(length[1:]*length[:-1], 1e-300)
+            angle[1:-1] = np.arccos(np.clip(cosine, -1, 1))
+            # deviation of a chord from an arc that turns by the average angle at its ends
+            deviation = length*(angle[:-1] + angle[1:])/16
+            refine = deviation > tol
+            # maximum of a parabola through the heaviest point and its neighbours. The interval that contains it is bisected
+            # the heaviest point can also be the last one if the maximum lies within the last interval
+            begin = min(max(idx_max - 1, 0), len(points) - 3)
+            a, b, c = np.polyfit(x[begin:begin + 3], mass[begin:begin + 3], 2)
+            if a < 0 and x[begin] < -b/(2*a) < x[begin + 2] and c - b*b/(4*a) - mass[idx_max] > mass_tol:
+                refine[begin if -b/(2*a) < x[begin + 1] else begin + 1] = True
+            if 0 < idx_max < len(points) - 1:
+                # parabola is only trusted once the neighbours are within 10*mass_tol of the heaviest point
+                refine[idx_max - 1:idx_max + 1] |= mass[idx_max] - mass[[idx_max - 1, idx_max + 1]] > 10*mass_tol
+            pcs = np.exp(0.5*(x[:-1] + x[1:])[refine])
+
+        self.num_integrations = num_integrations
+        mass = [result.mass for result in points]
+        return points[:int(np.argmax(mass)) + 1] if len(points) > 0 else []
+
+    def PreScreen(self, mass=1.4, pc_min=1., num_grid=20, stride=2):
+        """
+        Rough maximum mass, and radius and lambda at mass, from probes on every stride-th point of the log grid of 
+        central pressure that FindMassFamily sweeps with the same pc_min and num_grid
+        Probes are memoized, so FindMassFamily without pc_guess does not integrate them again
+        Maximum mass is the top of a parabola in log(pc) through the heaviest probe and its neighbours
+        Radius and log(lambda) are interpolated quadratically in mass on the stable branch. They are nan if mass is not bracketed
+        PCentral is the central pressure of the heaviest probe on the stable branch
+        Meant to reject EOS far from any constraint before solving them precisely
+        Number of integrations used is stored in self.num_integrations
+        """
+        self._ResetWork()
+        pc_max = 0.95*self.max_pressure
+        # grid is thinned from its upper end such that the valid limit of EOS is always probed
+        pc_grid = np.logspace(np.log10(min(pc_min, 0.5*pc_max)), np.log10(pc_max), num_grid)[::-1][::stride][::-1]
+        points = [(pc, result) for pc, result in zip(pc_grid, self.CalculateBatch(pc_grid, probe=True)) if not result.IsNan()]
+        self.num_integrations = len(self._work)
+        if len(points) == 0:
+            return PreScreenResult(np.nan, np.nan, np.nan, np.nan)
+        x = np.log([pc for pc, result in points])
+        masses = np.array([result.mass for pc, result in points])
+        # stable branch ends at the first maximum
+        idx_max = np.argmax(masses)
+        decrease = np.nonzero(np.diff(masses) < 0)[0]
+        if len(decrease) > 0:
+            idx_max = decrease[0]
+        max_mass = masses[idx_max]
+        if 0 < idx_max < len(points) - 1:
+            a, b, c = np.polyfit(x[idx_max - 1:idx_max + 2], masses[idx_max - 1:idx_max + 2], 2)
+            if a < 0:
+                max_mass = max(max_mass, c - b*b/(4*a))
+
+        radius, tidal_lambda = np.nan, np.nan
+        idx = np.searchsorted(masses[:idx_max + 1], mass)
+        if 0 < idx <= idx_max:
+            begin = max(min(idx - 2, idx_max - 2), 0)
+            end = min(begin + 3, idx_max + 1)
+            branch = [result for pc, result in points[begin:end]]
+            degree = len(branch) - 1
+            branch_mass = [result.mass for result in branch]
+            radius = np.polyval(np.polyfit(branch_mass, [result.Radius for result in branch], degree), mass)
+            tidal_lambda = np.exp(np.polyval(np.polyfit(branch_mass, np.log([result.Lambda for result in branch]), degree), mass))
+        return PreScreenResult(max_mass, radius, tidal_lambda, points[idx_max][0])
+
+    def NanResult(self):
+        """
+        Nan result that carries the solver work since the last result, e.g. of PreScreen for EOS that are not solved
+        """
+        return self._FinalResult(np.nan)
+
+    def Profile(self, pc):
+        """
+        Radial structure of NS with central pressure pc from a single integration
+        Return dict of arrays at the centre and after every accepted step: radius (km), pressure and energy_density (MeV/fm3),
+        density (fm-3) of symmetric matter from the tabulated inverse of EOS, mass (solar mass) and y
+        """
+        abs_err, rel_err, init_step = self.tolerance
+        if self.backend == 'numpy':
+            profile = tidal_numpy.TidalLoveProfile(self._eos_set, pc, 0, self.surface_pressure, abs_err, rel_err, init_step)
+        else:
+            profile = tidal.tidallove_profile_table(self.eos_table, pc, self.surface_pressure, abs_err, rel_err, init_step)
+        radius, pressure, energy_density, mass, y = profile
+        return {'radius': radius, 'pressure': pressure, 'energy_density': energy_density,
+                'density': self.DensityFromPressure(pressure), 'mass': mass, 'y': y}
+
+    def CalculateSensitivity(self, pc, perturbations):
+        """
+        Derivatives of mass, radius and lambda of NS with central pressure pc from one integration of the forward sensitivity equations
+        perturbations maps names to changes of energy density (MeV/fm3) on every pressure of self.eos_table, 
+        usually derivatives of energy density with respect to an EOS parameter at fixed pressure
+        as returned by Utilities.EOSCreator.EnergyDensitySensitivity
+        Return dict of name to (dM, dR, dLambda) at fixed central pressure. 
+        Derivatives with respect to log of central pressure are stored as 'logPCentral'
+        Only available with the native backend
+        """
+        if self.backend != 'native':
+            raise ValueError('Sensitivity is only implemented in the native backend')
+        names = list(perturbations)
+        abs_err, rel_err, init_step = self.tolerance
+        ans = tidal.tidallove_sensitivity_table(self.eos_table, 
+                                                [np.ascontiguousarray(perturbations[name], dtype=np.float64) for name in names],
+                                                pc, self.surface_pressure, abs_err, rel_err, init_step)
+        return {name: (ans[3][index], ans[4][index], ans[5][index]) for index, name in enumerate(['logPCentral'] + names)}
+
+    def Sensitivity(self, result, perturbations, fixed_mass=True):
+        """
+        Fill result.Sensitivity with derivatives of its mass, radius and lambda with respect to every perturbation
+        With fixed_mass, radius and lambda are differentiated along the EOS family at the mass of result, 
+        i.e. central pressure follows the perturbation to keep mass unchanged
+        Otherwise central pressure is fixed. For the maximum mass this is also the derivative of the maximum mass itself
+        """
+        if result.IsNan():
+            # same entries as a valid result such that every row of the output has the same columns
+            result.Sensitivity.update({name: (np.nan, np.nan, np.nan) for name in perturbations})
+            return result.Sensitivity
+        derivatives = self.CalculateSensitivity(result.PCentral, perturbations)
+        dmass_dpc, dradius_dpc, dlambda_dpc = derivatives.pop('logPCentral')
+        for name, (dmass, dradius, dlambda) in derivatives.items():
+            if fixed_mass:
+                dlogpc = -dmass/dmass_dpc
+                dmass, dradius, dlambda = 0., dradius + dradius_dpc*dlogpc, dlambda + dlambda_dpc*dlogpc
+            result.Sensitivity[name] = (dmass, dradius, dlambda)
+        return result.Sensitivity
+
+    def EnergyDensityDifference(self, eos):
+        """
+        Energy density of another EOS minus that of this EOS at every pressure of self.eos_table (MeV/fm3)
+        Energy density of the other EOS is interpolated in log-log scale. Pressure beyond its table gives 0
+        """
+        energy_density, pressure, _ = eos.GetTable()
+        valid = (energy_density > 0) & (pressure > 0)
+        energy_density, pressure = energy_density[valid], pressure[valid]
+        # same as _BuildDensityInverse, table ends where pressure stops increasing
+        increasing = np.diff(pressure) > 0
+        end = len(pressure) if np.all(increasing) else np.argmax(~increasing) + 1
+        energy_density, pressure = energy_density[:end], pressure[:end]
+        table_pressure = np.array(self.eos_table.pressure)
+        other = np.exp(np.interp(np.log(table_pressure), np.log(pressure), np.log(energy_density), left=np.nan, right=np.nan))
+        difference = other - np.array(self.eos_table.energy_density)
+        return np.where(np.isnan(difference), 0., difference)
+
+    def _BuildDensityInverse(self, energy_density, pressure, density):
+        # tabulated log(density) vs log(pressure), up to the first point where pressure stops increasing
+        valid = (energy_density <= self.max_energy) & (pressure > 0)
+        pressure = pressure[valid]
+        density = density[valid]
+        increasing = np.diff(pressure) > 0
+        end = len(pressure) if np.all(increasing) else np.argmax(~increasing) + 1
+        self._log_pressure_table = np.log(pressure[:end])
+        self._log_density_table = np.log(density[:end])
+
+    def DensityFromPressure(self, pressure):
+        """
+        Density of symmetric matter (pfrac = 0) at which EOS reaches pressure
+        Interpolates the tabulated inverse in log-log scale and polishes the result with one Newton step
+        Pressure outside of the table gives nan
+        """
+        if self._log_pressure_table is None:
+            self._BuildDensityInverse(*self.eos.GetTable())
+        scalar = np.ndim(pressure) == 0
+        pressure = np.atleast_1d(np.array(pressure, dtype=np.float64))
+        log_density = np.interp(np.log(pressure), self._log_pressure_table, self._log_density_table, 
+                                left=np.nan, right=np.nan)
+        density = np.exp(log_density)
+        found = ~np.isnan(density)
+        # Newton step is discarded if it moves further than interpolation error can possibly be
+        polished = density[found] - (self.eos.GetPressure(density[found], 0) - pressure[found])/self.eos.GetdPressure(density[found], 0)
+        density[found] = np.where(np.abs(polished - density[found]) < 1e-2*density[found], polished, density[found])
+        return density[0] if scalar else density
+
     def Close(self):
-        self.output.close()
+        if self.output is not None:
+            self.output.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
     
+
+
+# crust envelopes of this process. Every EOS with the same crust shares one
+_shared_envelope = OrderedDict()
+
+def SharedEnvelope(eos_table, matching_pressure, surface_pressure, checkpoints, maxsize=8):
+    """
+    CrustEnvelope of eos_table below matching_pressure (MeV/fm3). It is computed on first use and shared afterwards 
+    by every table whose crust, i.e. the entries and breakpoints below matching_pressure, is the same
+    Return None if the table has no crust below matching_pressure
+    """
+    pressure = np.asarray(eos_table.pressure)
+    crust = pressure <= matching_pressure
+    if not np.any(crust):
+        return None
+    breakpoints = np.asarray(eos_table.breakpoints)
+    checkpoints = [checkpoint for checkpoint in checkpoints if surface_pressure < checkpoint < matching_pressure]
+    key = (matching_pressure, surface_pressure, tuple(sorted(checkpoints, reverse=True)),
+           np.asarray(eos_table.energy_density)[crust].tobytes(), pressure[crust].tobytes(), 
+           breakpoints[breakpoints <= matching_pressure].tobytes())
+    if key not in _shared_envelope:
+        logger.debug('Compute crust envelope below pressure %g' % matching_pressure)
+        _shared_envelope[key] = tidal.CrustEnvelope(eos_table, matching_pressure, surface_pressure, 
+                                                    np.array(checkpoints, dtype=np.float64), 1e-8, 1e-8, 24, 32)
+        while len(_shared_envelope) > maxsize:
+            _shared_envelope.popitem(last=False)
+    _shared_envelope.move_to_end(key)
+    return _shared_envelope[key]
+
+
+# kinds of jobs of tidal.tidallove_batch
+JOB_CENTRAL_PRESSURE = 0
+JOB_MASS = 1
+JOB_MAX_MASS = 2
+
+def FindMassFamilyBatch(wrappers, masses):
+    """
+    Same as TidalLoveWrapper.FindMassFamily for every wrapper, solved in a single call of the native extension
+    Tables of all EOS are packed into ragged buffers, and every root search runs in C++ without returning to python
+    Checkpoints of each wrapper are used. Integrator settings must be the same for all of them
+    Only available with the native backend in radius formulation. Crust envelopes are not used
+    Return a list with (result of the maximum mass, list of results ordered as masses) for each wrapper
+    """
+    for tidal_love in wrappers:
+        if tidal_love.backend != 'native' or tidal_love.formulation != 'radius':
+            raise ValueError('Batch of EOS is only implemented in the native backend with radius formulation')
+    settings = set((tidal_love.surface_pressure, tuple(tidal_love.tolerance), tuple(tidal_love.probe_tolerance)) for tidal_love in wrappers)
+    if len(settings) > 1:
+        raise ValueError('Integrator settings of all EOS in a batch must be the same')
+    if len(wrappers) == 0:
+        return []
+    surface_pressure, tolerance, probe_tolerance = settings.pop()
+
+    def Ragged(arrays):
+        # offsets and flat buffer. Array i is flat[offsets[i]:offsets[i + 1]]
+        offsets = np.cumsum([0] + [len(array) for array in arrays]).astype(np.int64)
+        flat = np.concatenate([np.zeros(0)] + [np.asarray(array, dtype=np.float64) for array in arrays])
+        return np.ascontiguousarray(offsets), np.ascontiguousarray(flat)
+
+    tables = [tidal_love.eos_table for tidal_love in wrappers]
+    offsets, energy_density = Ragged([table.energy_density for table in tables])
+    _, pressure = Ragged([table.pressure for table in tables])
+    breakpoint_offsets, breakpoints = Ragged([table.breakpoints for table in tables])
+    checkpoint_offsets, checkpoints = Ragged([tidal_love.checkpoint for tidal_love in wrappers])
+    jobs = [job for index in range(len(wrappers)) 
+            for job in [(index, JOB_MAX_MASS, np.nan)] + [(index, JOB_MASS, mass) for mass in masses]]
+    job_eos, job_kind, job_value = zip(*jobs)
+    job_eos, job_kind = [np.ascontiguousarray(column, dtype=np.int64) for column in [job_eos, job_kind]]
+    job_value = np.ascontiguousarray(job_value, dtype=np.float64)
+    ans = tidal.tidallove_batch(offsets, energy_density, pressure, breakpoint_offsets, breakpoints, 
+                                checkpoint_offsets, checkpoints, job_eos, job_kind, job_value, 
+                                surface_pressure, tolerance, probe_tolerance)
+
+    results = []
+    for job_index, (index, kind, value) in enumerate(jobs):
+        tidal_love = wrappers[index]
+        result = TidalLoveResult(len(tidal_love.density_checkpoint))
+        if ans['mass'][job_index] > 0:
+            begin, end = ans['checkpoint_offsets'][job_index:job_index + 2]
+            result.mass = ans['mass'][job_index]
+            result.Radius = ans['radius'][job_index]
+            result.Lambda = ans['lambda'][job_index]
+            result.Checkpoint_mass = ans['checkpoint_mass'][begin:end].tolist()
+            result.Checkpoint_radius = ans['checkpoint_radius'][begin:end].tolist()
+            result.MomentOfInertia = ans['moment_of_inertia'][job_index]
+            result.BaryonMass = ans['baryon_mass'][job_index]
+            result.PCentral = ans['pc'][job_index]
+            try:
+                result.DensCentral = tidal_love.DensityFromPressure(result.PCentral)
+            except Exception as error:
+                logger.exception('Cannot find central density for mass %g' % result.mass)
+        result.Integrations = int(ans['integrations'][job_index])
+        result.RHSEvaluations = int(ans['rhs_evaluations'][job_index])
+        result.AcceptedSteps = int(ans['accepted_steps'][job_index])
+        result.RejectedSteps = int(ans['rejected_steps'][job_index])
+        result.IntegrationTime = float(ans['time'][job_index])
+        result.SearchTime = float(ans['search_time'][job_index])
+        results.append(result)
+
+    families = []
+    for index, tidal_love in enumerate(wrappers):
+        family = results[index*(len(masses) + 1):(index + 1)*(len(masses) + 1)]
+        tidal_love.num_integrations = sum(result.Integrations for result in family)
+        families.append((family[0], family[1:]))
+    return families
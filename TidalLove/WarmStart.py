@@ -0,0 +1,81 @@
+import numpy as np
+
+"""
+Initial guesses of central pressure for root searches of an EOS from the nearest previously solved EOS
+Parameter sets are compared after scaling every parameter by its spread among the stored ones
+Storage is a ring buffer of fixed size, so memory stays bounded however many EOS are solved
+"""
+
+class WarmStartIndex:
+
+
+    def __init__(self, names, num_solutions, maxsize=20000):
+        """
+        names are the numerical EOS parameters used as coordinates of the index
+        num_solutions is the number of central pressures stored per EOS (e.g. maximum mass and every target mass)
+        """
+        self.names = list(names)
+        self.maxsize = maxsize
+        self._parameters = np.empty((maxsize, len(self.names)))
+        self._solutions = np.empty((maxsize, num_solutions))
+        self._size = 0
+        self._next = 0
+        # integrations of root searches with and without a guess, such that savings can be estimated
+        self.cold = [0, 0] # number of searches, total integrations
+        self.warm = [0, 0]
+
+    def __len__(self):
+        return self._size
+
+    def _Coordinates(self, parameters):
+        return np.array([parameters[name] for name in self.names], dtype=np.float64)
+
+    def Guess(self, parameters):
+        """
+        Central pressures solved for the nearest stored EOS, or None if the index is empty
+        Entries can be nan if the nearest EOS has no solution for them
+        """
+        if self._size == 0:
+            return None
+        stored = self._parameters[:self._size]
+        scale = np.std(stored, axis=0)
+        scale[~(scale > 0)] = 1
+        distance = np.sum(np.square((stored - self._Coordinates(parameters))/scale), axis=1)
+        return self._solutions[np.argmin(distance)].tolist()
+
+    def Add(self, parameters, solutions, integrations=None, warm=False):
+        """
+        Store central pressures solved for an EOS. The oldest entry is replaced once the index is full
+        integrations used by the search are counted towards warm or cold starts
+        """
+        solutions = np.array(solutions, dtype=np.float64)
+        if np.any(np.isfinite(solutions)):
+            self._parameters[self._next] = self._Coordinates(parameters)
+            self._solutions[self._next] = solutions
+            self._next = (self._next + 1) % self.maxsize
+            self._size = min(self._size + 1, self.maxsize)
+        if integrations is not None:
+            counter = self.warm if warm else self.cold
+            counter[0] += 1
+            counter[1] += integrations
+
+    def SavedIntegrations(self):
+        """
+        Integrations saved by warm starts, estimated from the average number used by cold starts
+        """
+        if self.cold[0] == 0:
+            return 0.
+        return self.warm[0]*self.cold[1]/self.cold[0] - self.warm[1]
+
+
+# one index per process, shared by all EOS solved in it
+_shared_index = {}
+
+def SharedIndex(names, num_solutions, maxsize=20000):
+    """
+    Index of this process for the given parameters and number of solutions. It is created on first use
+    """
+    key = (tuple(names), num_solutions, maxsize)
+    if key not in _shared_index:
+        _shared_index[key] = WarmStartIndex(names, num_solutions, maxsize)
+    return _shared_index[key]
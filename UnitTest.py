@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
 import unittest
+import pickle
+from scipy.interpolate import PchipInterpolator
 
 from TidalLove import TidalLoveWrapper as wrapper
-from Utilities.EOSCreator import EOSCreator
+from TidalLove import WarmStart
+import BinaryDeformability
+import AddWeight
+from Utilities.EOSCreator import EOSCreator, EnergyDensitySensitivity
 import UnitTestData as data
 
 class TestEOS(unittest.TestCase):
@@ -42,14 +47,19 @@ class TestEOS(unittest.TestCase):
         self.assertAlmostEqual(energy_crust_frac, 0, delta=1e-5)
         self.assertAlmostEqual(pressure_crust_frac, 0, delta=5e-3)
 
-    def CompareDeformability(self, eos, target_max_mass, target_radius, target_lambda):
-        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+    def CompareDeformability(self, eos, target_max_mass, target_radius, target_lambda, **kwargs):
+        with wrapper.TidalLoveWrapper(eos, **kwargs) as tidal_love:
             result = tidal_love.FindMaxMass()
             # allow for 1 percent error
             self.assertAlmostEqual((result.mass - target_max_mass)/target_max_mass, 0, delta=1e-2)
             result = tidal_love.FindMass(1.4)
             self.assertAlmostEqual((result.Radius - target_radius)/target_radius, 0, delta=1e-2)
             self.assertAlmostEqual((result.Lambda - target_lambda)/target_lambda, 0, delta=1e-2)
+            # moment of inertia from the universal relation of Lattimer and Schutz, ApJ 629, 979 (2005)
+            compactness = result.mass*1.4767/result.Radius
+            inertia = 0.237*result.mass*result.Radius**2*(1 + 2.844*compactness + 18.91*compactness**4)
+            self.assertAlmostEqual((result.MomentOfInertia - inertia)/inertia, 0, delta=0.1)
+            self.assertGreater(result.BaryonMass, result.mass)
 
 
     def test_EOS(self):
@@ -64,6 +74,17 @@ class TestEOS(unittest.TestCase):
         with self.subTest(MaxMass=1):
             self.CompareDeformability(eos, data.EOSMaxMass['mass'], data.EOS1_4Mass['Radius'], data.EOS1_4Mass['Lambda'])
 
+    def test_EOSMaxDef(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        n, energy, pressure = eos.GetGrid()
+        # EOS increases monotonically up to 10rho0, so its valid range ends next to the upper end of the grid
+        max_energy, max_pressure = eos.GetMaxDef()
+        self.assertAlmostEqual(n[-1], 10*0.16)
+        self.assertAlmostEqual(max_pressure/eos.GetPressure(10*0.16, 0), 1, delta=1e-3)
+        self.assertAlmostEqual(max_energy/eos.GetEnergyDensity(10*0.16, 0), 1, delta=1e-3)
+
     def test_EOS2Poly(self):
         eos, density_list, _ = self.creator.Factory(EOSType='EOS2Poly', 
                                                     Backbone_kwargs=self.eos_kwargs,
@@ -75,6 +96,308 @@ class TestEOS(unittest.TestCase):
         with self.subTest(MaxMass=1):
             self.CompareDeformability(eos, data.EOS2PolyMaxMass['mass'], data.EOS2Poly1_4Mass['Radius'], data.EOS2Poly1_4Mass['Lambda'])
 
+    def test_EOS2PolyNumpy(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='EOS2Poly', 
+                                                    Backbone_kwargs=self.eos_kwargs,
+                                                    Transform_kwargs=data.EOSTransKwargs)
+        self.CompareDeformability(eos, data.EOS2PolyMaxMass['mass'], data.EOS2Poly1_4Mass['Radius'], data.EOS2Poly1_4Mass['Lambda'], backend='numpy')
+
+    def test_EOS2PolyEnthalpy(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='EOS2Poly', 
+                                                    Backbone_kwargs=self.eos_kwargs,
+                                                    Transform_kwargs=data.EOSTransKwargs)
+        self.CompareDeformability(eos, data.EOS2PolyMaxMass['mass'], data.EOS2Poly1_4Mass['Radius'], data.EOS2Poly1_4Mass['Lambda'], formulation='enthalpy')
+
+    def test_MetaSoundContinuation(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            results, iterations = tidal_love.FindMassContinuation([1.6, 1.2, 1.4])
+            result = results[2]
+            self.assertAlmostEqual(result.mass, 1.4, delta=1e-3)
+            self.assertAlmostEqual((result.Radius - data.Meta1_4Mass['Radius'])/data.Meta1_4Mass['Radius'], 0, delta=1e-2)
+            self.assertAlmostEqual((result.Lambda - data.Meta1_4Mass['Lambda'])/data.Meta1_4Mass['Lambda'], 0, delta=1e-2)
+            self.assertEqual(len(iterations), 3)
+            # every probe of a target and its final integration are counted towards it
+            self.assertEqual([result.Integrations for result in results], [num + 1 for num in iterations])
+            work = result.ToDict()
+            self.assertGreater(work['RHSEvaluations'], 6*work['Integrations'])
+            self.assertGreaterEqual(work['SearchTime'], work['IntegrationTime'])
+
+    def test_MetaSoundThreads(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        results = []
+        for num_threads in [1, 4]:
+            with wrapper.TidalLoveWrapper(eos, num_threads=num_threads) as tidal_love:
+                max_result, mass_results = tidal_love.FindMassFamily([1.2, 1.4])
+                results.append([result.Lambda for result in [max_result] + mass_results])
+        # threads only change the order of integrations, not their results
+        self.assertEqual(results[0], results[1])
+
+    def test_MetaSoundMemo(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos, memo_size=4) as tidal_love:
+            result = tidal_love.FindMaxMass()
+            self.assertEqual(tidal_love.MemoInfo().currsize, 4)
+            memoized = tidal_love.Calculate(result.PCentral)
+            self.assertEqual(memoized.Integrations, 0)
+            self.assertEqual(memoized.mass, result.mass)
+            self.assertEqual(tidal_love.MemoInfo().hits, 1)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            first = tidal_love.FindMass(mass=1.4)
+            # second search starts from memoized neighbours
+            second = tidal_love.FindMass(mass=1.45)
+            self.assertLess(second.Integrations, first.Integrations)
+            self.assertAlmostEqual(second.mass, 1.45, delta=1e-3)
+
+    def test_MetaSoundMemoNumpy(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos, backend='numpy') as tidal_love:
+            first = tidal_love.CalculateBatch([10., 100.])
+            # every central pressure is memoized, so nothing is integrated
+            second = tidal_love.CalculateBatch([10., 100.])
+            self.assertEqual([result.mass for result in second], [result.mass for result in first])
+            first = tidal_love.FindMaxMass()
+            second = tidal_love.FindMaxMass()
+            self.assertEqual(second.mass, first.mass)
+
+    def test_MetaSoundSensitivity(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            result = tidal_love.FindMass(mass=1.4)
+            perturbations = EnergyDensitySensitivity(tidal_love, 'MetaSound', data.MetaKwargs, data.MetaTransKwargs, ['Lsym'], rel_step=1e-2)
+            _, dradius, dlambda = tidal_love.Sensitivity(result, perturbations)['Lsym']
+            self.assertEqual(result.ToDict()['dR_dLsym'], dradius)
+        # compare with finite difference of 1.4 solar mass NS with the same step
+        # transition densities of EOS also depend on Lsym, so derivatives are not smooth beyond that step
+        step = 1e-2*abs(data.MetaKwargs['Lsym'])
+        radius, lambda_ = [], []
+        for sign in [1, -1]:
+            kwargs = {**data.MetaKwargs, 'Lsym': data.MetaKwargs['Lsym'] + sign*step}
+            eos, _, _ = self.creator.Factory(EOSType='MetaSound', Backbone_kwargs=kwargs, Transform_kwargs=data.MetaTransKwargs)
+            with wrapper.TidalLoveWrapper(eos, formulation='enthalpy') as tidal_love:
+                tidal_love.tolerance = tidal_love.probe_tolerance = (1e-9, 1e-9, 1e-6)
+                result = tidal_love.FindMass(mass=1.4, rtol=1e-10)
+                radius.append(result.Radius)
+                lambda_.append(result.Lambda)
+        self.assertAlmostEqual(dradius/((radius[0] - radius[1])/(2*step)) - 1, 0, delta=2e-2)
+        self.assertAlmostEqual(dlambda/((lambda_[0] - lambda_[1])/(2*step)) - 1, 0, delta=2e-2)
+
+    def test_MetaSoundCheckpoint(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        for backend in [None, 'numpy']:
+            checkpoints = []
+            for tolerance in [(1e-10, 1e-10, 1e-6), (1e-4, 1e-4, 1e-5)]:
+                with wrapper.TidalLoveWrapper(eos, backend=backend) as tidal_love:
+                    tidal_love.density_checkpoint = [0.32, 0.16, 0.04, 1e-3]
+                    tidal_love.tolerance = tolerance
+                    result = tidal_love.Calculate(100.)
+                    checkpoints.append(result.Checkpoint_mass + result.Checkpoint_radius)
+            # checkpoints are interpolated within a step, so loose tolerance stays close to the converged values
+            with self.subTest(backend=backend):
+                np.testing.assert_allclose(checkpoints[1], checkpoints[0], rtol=1e-3)
+
+    def test_MetaSoundWarmStart(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        index = WarmStart.WarmStartIndex(['Lsym', 'Ksym'], 3, maxsize=2)
+        masses = [1.2, 1.4]
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            max_result, results = tidal_love.FindMassFamily(masses)
+            cold = tidal_love.num_integrations
+        index.Add(data.MetaKwargs, [result.PCentral for result in [max_result] + results], cold)
+        for scale in [1, 0.3, 3]:
+            pc_guess = [scale*pc for pc in index.Guess({'Lsym': 0, 'Ksym': 0})]
+            with wrapper.TidalLoveWrapper(eos) as tidal_love:
+                warm_max_result, warm_results = tidal_love.FindMassFamily(masses, pc_guess=pc_guess)
+            index.Add(data.MetaKwargs, [result.PCentral for result in [warm_max_result] + warm_results],
+                      tidal_love.num_integrations, warm=True)
+            # guesses far from the solutions only cost more integrations
+            with self.subTest(scale=scale):
+                self.assertAlmostEqual(warm_max_result.mass, max_result.mass, delta=1e-4)
+                for result, mass in zip(warm_results, masses):
+                    self.assertAlmostEqual(result.mass, mass, delta=1e-3)
+                if scale == 1:
+                    self.assertGreater(index.SavedIntegrations(), 0)
+        # oldest entries are replaced
+        self.assertEqual(len(index), 2)
+
+    def test_MetaSoundBreakpoints(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            table = tidal_love.eos_table
+            np.testing.assert_allclose(table.breakpoints, eos.GetPressure(np.array([0.02103, 0.0701, 0.59935]), 0), rtol=1e-3)
+            np.testing.assert_array_equal(pickle.loads(pickle.dumps(table)).breakpoints, table.breakpoints)
+            result = tidal_love.Calculate(1000.)
+        smooth_table = type(table)(table.energy_density, table.pressure, np.inf)
+        with wrapper.TidalLoveWrapper(eos, eos_table=smooth_table) as tidal_love:
+            smooth_result = tidal_love.Calculate(1000.)
+        # controller no longer rejects steps across the kink of the speed of sound
+        self.assertLess(result.RejectedSteps, smooth_result.RejectedSteps)
+        self.assertAlmostEqual(result.mass, smooth_result.mass, delta=1e-4)
+
+    def test_MetaSoundBatch(self):
+        wrappers = []
+        for speed_of_sound in [0.9, 0.99]:
+            eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                        Backbone_kwargs=data.MetaKwargs,
+                                                        Transform_kwargs={**data.MetaTransKwargs, 'SpeedOfSound': speed_of_sound})
+            tidal_love = wrapper.TidalLoveWrapper(eos)
+            tidal_love.density_checkpoint = list(density_list)
+            wrappers.append(tidal_love)
+        masses = [1.4, 3.5]
+        families = wrapper.FindMassFamilyBatch(wrappers, masses)
+        for index, (tidal_love, (max_result, results)) in enumerate(zip(wrappers, families)):
+            ref_max_result, ref_results = tidal_love.FindMassFamily(masses)
+            with self.subTest(eos=index):
+                # same root searches as in python
+                for result, ref_result in zip([max_result, results[0]], [ref_max_result, ref_results[0]]):
+                    for name in ['mass', 'Radius', 'Lambda', 'PCentral', 'DensCentral', 'Integrations']:
+                        self.assertAlmostEqual(getattr(result, name), getattr(ref_result, name), delta=1e-3*abs(getattr(ref_result, name)))
+                    np.testing.assert_allclose(result.Checkpoint_mass, ref_result.Checkpoint_mass, rtol=1e-4)
+                # heavier than the maximum mass
+                self.assertTrue(results[1].IsNan())
+                self.assertEqual(results[1].Integrations, ref_results[1].Integrations)
+        # offsets, EOS indices and kinds of jobs are int64
+        table = wrappers[0].eos_table
+        size = len(table.energy_density)
+        buffers = [np.array([0, size]), np.ascontiguousarray(table.energy_density, dtype=np.float64),
+                   np.ascontiguousarray(table.pressure, dtype=np.float64), np.array([0, 0]), np.zeros(0), np.array([0, 0]), np.zeros(0)]
+        settings = (wrappers[0].surface_pressure, tuple(wrappers[0].tolerance), tuple(wrappers[0].probe_tolerance))
+        ans = wrapper.tidal.tidallove_batch(*buffers, np.array([0]), np.array([wrapper.JOB_MASS]), np.array([1.4]), *settings)
+        self.assertEqual(ans['checkpoint_offsets'].dtype, np.int64)
+        self.assertAlmostEqual(ans['mass'][0], 1.4, delta=1e-3)
+        self.assertRaises(TypeError, wrapper.tidal.tidallove_batch, *buffers, np.array([0]), np.array([1.]), np.array([1.4]), *settings)
+        for tidal_love in wrappers:
+            tidal_love.Close()
+        with wrapper.TidalLoveWrapper(eos, backend='numpy') as tidal_love:
+            self.assertRaises(ValueError, wrapper.FindMassFamilyBatch, [tidal_love], masses)
+
+    def test_MetaSoundMRCurve(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            curve = tidal_love.MRCurve()
+            # a third of the 50 fixed central pressures that used to be integrated
+            self.assertLessEqual(tidal_love.num_integrations, 20)
+            max_result = tidal_love.FindMaxMass()
+        mass = np.array([result.mass for result in curve])
+        # curve ends at the maximum mass
+        self.assertTrue(np.all(np.diff(mass) > 0))
+        self.assertAlmostEqual(mass[-1], max_result.mass, delta=1e-3)
+        self.assertAlmostEqual(np.interp(1.4, mass, [result.Radius for result in curve]), data.Meta1_4Mass['Radius'], delta=0.05)
+
+    def test_MetaSoundPreScreen(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            estimate = tidal_love.PreScreen()
+            self.assertEqual(tidal_love.num_integrations, 10)
+            max_result, results = tidal_love.FindMassFamily([1.4])
+            # probes of the pre-screen are not integrated again
+            self.assertGreaterEqual(tidal_love.MemoInfo().hits, 10)
+        self.assertAlmostEqual(estimate.MaxMass, max_result.mass, delta=0.05)
+        self.assertAlmostEqual(estimate.Radius, results[0].Radius, delta=0.01*results[0].Radius)
+        self.assertAlmostEqual(estimate.Lambda, results[0].Lambda, delta=0.1*results[0].Lambda)
+        # heaviest probe is a neighbour of the maximum mass on the grid
+        self.assertLess(abs(np.log(estimate.PCentral/max_result.PCentral)), 1)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            # lighter than every probe, so radius and lambda are unknown
+            light = tidal_love.PreScreen(mass=0.05)
+            skipped = tidal_love.NanResult()
+        self.assertTrue(np.isnan(light.Radius) and np.isnan(light.Lambda))
+        self.assertEqual(skipped.Integrations, 10)
+        self.assertGreater(skipped.RHSEvaluations, 0)
+        # unknown estimates do not reject EOS, but a known one outside of the range does
+        estimate = {('MaxMass', 'Mass'): light.MaxMass, ('Mass1.4', 'Lambda'): light.Lambda, ('Mass1.4', 'R'): light.Radius}
+        self.assertFalse(AddWeight.Reasonable(estimate))
+        self.assertTrue(AddWeight.Reasonable(estimate, ignore_nan=True))
+        estimate[('MaxMass', 'Mass')] = 1.5
+        self.assertFalse(AddWeight.Reasonable(estimate, ignore_nan=True))
+
+    def test_MetaSoundEnvelope(self):
+        envelopes = []
+        for speed_of_sound in [0.9, 0.99]:
+            eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                        Backbone_kwargs=data.MetaKwargs,
+                                                        Transform_kwargs={**data.MetaTransKwargs, 'SpeedOfSound': speed_of_sound})
+            density_list = list(density_list) + [3.4e-4]
+            with wrapper.TidalLoveWrapper(eos) as tidal_love, wrapper.TidalLoveWrapper(eos, envelope_pressure=1e-2) as envelope_love:
+                tidal_love.density_checkpoint = list(density_list)
+                envelope_love.density_checkpoint = list(density_list)
+                envelopes.append(envelope_love._Envelope())
+                for pc in [10., 100., 1000.]:
+                    ref_result = tidal_love.Calculate(pc)
+                    result = envelope_love.Calculate(pc)
+                    with self.subTest(speed_of_sound=speed_of_sound, pc=pc):
+                        for name in ['mass', 'Radius', 'Lambda', 'MomentOfInertia', 'BaryonMass']:
+                            self.assertAlmostEqual(getattr(result, name), getattr(ref_result, name), delta=1e-3*abs(getattr(ref_result, name)))
+                        np.testing.assert_allclose(result.Checkpoint_mass, ref_result.Checkpoint_mass, rtol=1e-4)
+                        np.testing.assert_allclose(result.Checkpoint_radius, ref_result.Checkpoint_radius, rtol=1e-3)
+                        # the crust is not integrated
+                        self.assertLess(result.RHSEvaluations, 0.8*ref_result.RHSEvaluations)
+        # both EOS have the same crust
+        self.assertIs(envelopes[0], envelopes[1])
+
+    def test_MetaSoundEnvelopeFamily(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        density_list = list(density_list) + [3.4e-4]
+        masses = [1.2, 1.4, 2.]
+        # same search as production runs, with and without the envelope
+        with wrapper.TidalLoveWrapper(eos) as tidal_love, wrapper.TidalLoveWrapper(eos, envelope_pressure=1e-2) as envelope_love:
+            tidal_love.density_checkpoint = list(density_list)
+            envelope_love.density_checkpoint = list(density_list)
+            ref_max_result, ref_results = tidal_love.FindMassFamily(masses)
+            max_result, results = envelope_love.FindMassFamily(masses)
+        for mass, result, ref_result in zip(['MaxMass'] + masses, [max_result] + results, [ref_max_result] + ref_results):
+            with self.subTest(mass=mass):
+                self.assertAlmostEqual(result.mass, ref_result.mass, delta=2e-4)
+                for name in ['Radius', 'Lambda', 'MomentOfInertia', 'BaryonMass']:
+                    self.assertAlmostEqual(getattr(result, name), getattr(ref_result, name), delta=2e-3*abs(getattr(ref_result, name)))
+                np.testing.assert_allclose(result.Checkpoint_radius, ref_result.Checkpoint_radius, rtol=2e-3)
+
+    def test_MetaSoundProfile(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        for backend in [None, 'numpy']:
+            with wrapper.TidalLoveWrapper(eos, backend=backend) as tidal_love:
+                result = tidal_love.Calculate(100.)
+                profile = tidal_love.Profile(100.)
+            with self.subTest(backend=backend):
+                # profile ends at the same surface as the star
+                self.assertAlmostEqual(profile['radius'][-1], result.Radius, delta=1e-6)
+                self.assertAlmostEqual(profile['mass'][-1], result.mass, delta=1e-6)
+                self.assertTrue(np.all(np.diff(profile['pressure']) < 0))
+                np.testing.assert_allclose(eos.GetPressure(profile['density'][:5], 0), profile['pressure'][:5], rtol=1e-5)
+
+    def test_MetaSoundDensityFromPressure(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            density = np.array([0.01, 0.16, 0.5, 1.])
+            new_density = tidal_love.DensityFromPressure(eos.GetPressure(density, 0))
+            np.testing.assert_allclose(new_density, density, rtol=1e-5)
+
     def test_MetaSound(self):
         eos, density_list, _ = self.creator.Factory(EOSType='MetaSound', 
                                                     Backbone_kwargs=data.MetaKwargs,
@@ -86,6 +409,40 @@ class TestEOS(unittest.TestCase):
         with self.subTest(MaxMass=1):
             self.CompareDeformability(eos, data.MetaMaxMass['mass'], data.Meta1_4Mass['Radius'], data.Meta1_4Mass['Lambda'])
 
+    def test_MetaSoundBinaryLambdaTilde(self):
+        eos, density_list, _ = self.creator.Factory(EOSType='MetaSound',
+                                                    Backbone_kwargs=data.MetaKwargs,
+                                                    Transform_kwargs=data.MetaTransKwargs)
+        masses = [0.8, 1., 1.2, 1.3, 1.4, 1.6, 1.8, 2.]
+        m1, m2 = BinaryDeformability.ComponentMasses(BinaryDeformability.GW170817ChirpMass, 1.)
+        with wrapper.TidalLoveWrapper(eos) as tidal_love:
+            max_result, results = tidal_love.FindMassFamily(masses)
+            ref_result = tidal_love.FindMass(mass=m1)
+        row = {('MaxMass', key): value for key, value in max_result.ToDict().items()}
+        for mass, result in zip(masses, results):
+            row.update({('Mass%g' % mass, key): value for key, value in result.ToDict().items()})
+        result_table = pd.DataFrame([row])
+        result_table.columns = pd.MultiIndex.from_tuples(result_table.columns)
+
+        # same as scipy PCHIP on the stored nodes
+        mass, tidal_lambda = BinaryDeformability.MassLambdaNodes(result_table)
+        valid = np.isfinite(mass[0])
+        x_new = np.linspace(0.9, 1.9, 11)
+        np.testing.assert_allclose(BinaryDeformability.MonotoneInterpolate(mass, np.log(tidal_lambda), x_new)[0],
+                                   PchipInterpolator(mass[0, valid], np.log(tidal_lambda[0, valid]))(x_new), rtol=1e-12)
+
+        # equal mass binary is Lambda of a single NS
+        lambda_tilde = BinaryDeformability.BinaryLambdaTilde(result_table, mass_ratios=[1.])
+        self.assertAlmostEqual(lambda_tilde['LambdaTilde(q=1)'].iloc[0]/ref_result.Lambda, 1, delta=0.01)
+
+        # binaries heavier than the maximum mass are nan
+        result_table[('MaxMass', 'Mass')] = 0.9*m1
+        for mass in masses:
+            if mass > 0.9*m1:
+                result_table[('Mass%g' % mass, 'Lambda')] = np.nan
+        lambda_tilde = BinaryDeformability.BinaryLambdaTilde(result_table)
+        self.assertTrue(lambda_tilde.isnull().values.all())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -71,8 +71,10 @@ def NuclearEOSFactory(EOSType, kwargs):
 def AdjustPoly(eos, MaxMass):
     def FixMaxMass(pressure):
         eos.eos_list[-1].ChangeFinalPressure(7*0.16, pressure)
+        eos.ResetGrid()
         with wrapper.TidalLoveWrapper(eos) as tidal_love:
-            result = tidal_love.FindMaxMass()
+            # mass must be resolved well below the tolerance of newton's method
+            result = tidal_love.FindMaxMass(mass_tol=1e-5)
             pc = result.PCentral
             max_m = result.mass
             if np.isnan(max_m): 
@@ -82,6 +84,26 @@ def AdjustPoly(eos, MaxMass):
     PressureHigh = opt.newton(FixMaxMass, x0=500, rtol=0.0001, tol=0.0001)
     return PressureHigh
 
+def EnergyDensitySensitivity(tidal_love, EOSType, Backbone_kwargs, Transform_kwargs, parameters, rel_step=1e-2):
+    """
+    Derivative of energy density at fixed pressure with respect to parameters of the nuclear EOS, 
+    on every pressure of the table of tidal_love, for use with TidalLoveWrapper.Sensitivity
+    Derivatives are central differences of EOS rebuilt with parameter +- rel_step*|parameter| (or rel_step if it is 0)
+    No TOV equation is solved, unless the EOS type adjusts its polytrope to the maximum mass
+    Return dict of parameter name to derivatives
+    """
+    perturbations = {}
+    for name in parameters:
+        step = rel_step*abs(Backbone_kwargs[name]) if Backbone_kwargs[name] != 0 else rel_step
+        difference = []
+        for sign in [1, -1]:
+            kwargs = dict(Backbone_kwargs)
+            kwargs[name] = kwargs[name] + sign*step
+            eos, _, _ = EOSCreator().Factory(EOSType=EOSType, Backbone_kwargs=kwargs, Transform_kwargs=Transform_kwargs)
+            difference.append(tidal_love.EnergyDensityDifference(eos))
+        perturbations[name] = (difference[0] - difference[1])/(2*step)
+    return perturbations
+
 class EOSCreator:
 
     def __init__(self):
@@ -70,6 +70,76 @@ class EOS:
             self.ToFileStream(file_)
             yield file_
 
+    def GetTable(self):
+        """
+        Return energy density, pressure and density sampled on the grid used by the TOV solver
+        Entries that cannot be evaluated are dropped
+        """
+        n, energy, pressure = self.GetGrid()
+        valid = ~(np.isnan(energy) | np.isnan(pressure))
+        return energy[valid], pressure[valid], n[valid]
+
+    def GetGrid(self, tol=1e-4, min_width=1e-5, num_initial=200):
+        """
+        Density, energy density and pressure (pfrac = 0) sampled adaptively between 1e-10 fm-3 and 10rho0
+        An interval in log(density) is halved while log(energy density) or log(pressure) 
+        at its middle deviates from linear interpolation by more than tol, or until it is narrower than min_width
+        Densities from GetBreakpoints are always included, and the last interval is refined down to min_width
+        The grid is evaluated once and cached. Call ResetGrid if the EOS is modified afterwards
+        """
+        if getattr(self, '_grid', None) is not None:
+            return self._grid
+        log_n = np.linspace(np.log(1e-10), np.log(10*0.16), num_initial)
+        breakpoints = [point for point in self.GetBreakpoints() if 1e-10 < point < 10*0.16]
+        log_n = np.unique(np.concatenate([log_n, np.log(np.array(breakpoints, dtype=float))]))
+        energy, pressure = self._EvaluateGrid(log_n)
+
+        active = np.ones(log_n.shape[0] - 1, dtype=bool)
+        while np.any(active):
+            lower = np.nonzero(active)[0]
+            mid = 0.5*(log_n[lower] + log_n[lower + 1])
+            mid_energy, mid_pressure = self._EvaluateGrid(mid)
+            log_e, log_p = self._LogGrid(energy, pressure)
+            mid_log_e, mid_log_p = self._LogGrid(mid_energy, mid_pressure)
+            err = np.maximum(np.abs(mid_log_e - 0.5*(log_e[lower] + log_e[lower + 1])), 
+                             np.abs(mid_log_p - 0.5*(log_p[lower] + log_p[lower + 1])))
+            # intervals that are invalid all along cannot be resolved any better
+            all_invalid = np.isnan(mid_log_p) & np.isnan(log_p[lower]) & np.isnan(log_p[lower + 1])
+            # the last interval is always refined, such that the point before the upper end lies next to it as on a uniform grid
+            refine = (~(err <= tol) & ~all_invalid | (lower == log_n.shape[0] - 2)) & (0.5*(log_n[lower + 1] - log_n[lower]) > min_width)
+
+            # both halves of a refined interval are tested again in the next pass
+            log_n = np.insert(log_n, lower + 1, mid)
+            energy = np.insert(energy, lower + 1, mid_energy)
+            pressure = np.insert(pressure, lower + 1, mid_pressure)
+            active = np.zeros(log_n.shape[0] - 1, dtype=bool)
+            new_lower = lower + np.arange(lower.shape[0])
+            active[new_lower[refine]] = True
+            active[new_lower[refine] + 1] = True
+
+        self._grid = (np.exp(log_n), energy, pressure)
+        return self._grid
+
+    def _EvaluateGrid(self, log_n):
+        n = np.exp(log_n)
+        return np.array(self.GetEnergyDensity(n, 0.), dtype=float), np.array(self.GetPressure(n, 0.), dtype=float)
+
+    @staticmethod
+    def _LogGrid(energy, pressure):
+        # nan where either energy density or pressure is not positive
+        valid = (energy > 0) & (pressure > 0)
+        with np.errstate(all='ignore'):
+            return np.where(valid, np.log(energy), np.nan), np.where(valid, np.log(pressure), np.nan)
+
+    def GetBreakpoints(self):
+        """
+        Densities at which EOS is not smooth. Override if the EOS is built from segments
+        """
+        return []
+
+    def ResetGrid(self):
+        self._grid = None
+
     def ToFileStream(self, filestream):
         #print header
         filestream.write(" ========================================================\n")
@@ -78,23 +148,15 @@ class EOS:
         filestream.write(" ========================================================\n")
         # the last 2 column (n and eps) is actually not used in the program
         # therefore eps column will always be zero
-        n = np.concatenate([np.logspace(np.log(1e-10), np.log(3.76e-4), 2000, base=np.exp(1)), 
-                            np.linspace(3.77e-4, 10*0.16, 18000)])
-        energy = self.GetEnergyDensity(n, 0.)
-        pressure = self.GetPressure(n, 0.)
-
+        energy, pressure, n = self.GetTable()
 
         for density, e, p in zip(n, energy, pressure):
-            if(not math.isnan(e) and not math.isnan(p)):
-                filestream.write("   %.5e   %.5e   %.5e   0.0000e+0\n" % (Decimal(e), Decimal(p), Decimal(density)))
+            filestream.write("   %.5e   %.5e   %.5e   0.0000e+0\n" % (Decimal(e), Decimal(p), Decimal(density)))
         filestream.flush()
 
     def GetMaxDef(self):
         # return the maximum energy at which the EOS is still monotonically increasing
-        n = np.concatenate([np.logspace(np.log(1e-10), np.log(3.76e-4), 2000, base=np.exp(1)),
-                            np.linspace(3.77e-4, 10*0.16, 18000)])
-        energy = self.GetEnergyDensity(n, 0.)
-        pressure = self.GetPressure(n, 0.)
+        n, energy, pressure = self.GetGrid()
 
         ediff = np.diff(energy) 
         pdiff = np.diff(pressure)
@@ -193,6 +255,10 @@ class EOSConnect(EOS):
     def _Interval(self, rho):
         return [(rho > interval[0]) & (rho <= interval[1]) for interval in self.intervals]
 
+    def GetBreakpoints(self):
+        # segments join at the edges of the intervals
+        return sorted(set(edge for interval in self.intervals for edge in interval))
+
 """
 Connection EOS
 Used only to connect 2 EOS from below and above